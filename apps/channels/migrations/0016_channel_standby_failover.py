@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2025-04-10 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dispatcharr_channels', '0015_recording_custom_properties'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='channel',
+            name='standby_failover',
+            field=models.BooleanField(default=False, help_text='Keep the next alternate stream warm so the proxy can fail over without a gap'),
+        ),
+    ]
@@ -255,6 +255,11 @@ class Channel(models.Model):
 
     uuid = models.UUIDField(default=uuid.uuid4, editable=False, unique=True, db_index=True)
 
+    standby_failover = models.BooleanField(
+        default=False,
+        help_text="Keep the next alternate stream warm so the proxy can fail over without a gap"
+    )
+
     def clean(self):
         # Enforce unique channel_number within a given group
         existing = Channel.objects.filter(
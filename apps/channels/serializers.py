@@ -172,6 +172,7 @@ class ChannelSerializer(serializers.ModelSerializer):
             'uuid',
             'logo',
             'logo_id',
+            'standby_failover',
         ]
 
     def get_streams(self, obj):
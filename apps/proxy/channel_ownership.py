@@ -0,0 +1,49 @@
+"""
+Channel ownership leases shared by the TS and HLS proxies.
+
+One worker fetches each channel. It holds a lease - a Redis key naming its
+worker ID, with a TTL - that it renews while it runs, and other workers take
+over once the lease expires. Renewing and releasing check the key still names
+this worker and apply the change in the same transaction, so a lease another
+worker has just taken is never extended or deleted.
+"""
+
+from redis.exceptions import WatchError
+
+
+def owner(redis_client, lock_key):
+    """Get the worker ID holding a lease, or None"""
+    current = redis_client.get(lock_key)
+    return current.decode('utf-8') if current else None
+
+
+def claim(redis_client, lock_key, worker_id, ttl):
+    """Take a free lease. Returns True if this worker now holds it."""
+    return bool(redis_client.set(lock_key, worker_id, nx=True, ex=ttl))
+
+
+def renew(redis_client, lock_key, worker_id, ttl):
+    """Extend a lease this worker holds. Returns False if another worker holds it (or nobody does)."""
+    return _if_held(redis_client, lock_key, worker_id, lambda pipe: pipe.expire(lock_key, ttl))
+
+
+def release(redis_client, lock_key, worker_id):
+    """Give up a lease this worker holds. Returns False if another worker holds it (or nobody does)."""
+    return _if_held(redis_client, lock_key, worker_id, lambda pipe: pipe.delete(lock_key))
+
+
+def _if_held(redis_client, lock_key, worker_id, command):
+    """Queue command in a transaction that only runs if the lease is still worker_id's"""
+    with redis_client.pipeline() as pipe:
+        try:
+            pipe.watch(lock_key)
+            current = pipe.get(lock_key)
+            if not current or current.decode('utf-8') != worker_id:
+                return False
+            pipe.multi()
+            command(pipe)
+            pipe.execute()
+            return True
+        except WatchError:
+            # The lease changed hands between the check and the command
+            return False
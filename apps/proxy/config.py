@@ -11,6 +11,11 @@ class BaseConfig:
     BUFFER_CHUNK_SIZE = 188 * 1361  # ~256KB
     # Redis settings
     REDIS_CHUNK_TTL = 60  # Number in seconds - Chunks expire after 1 minute
+    # Upstream connection pool shared by every stream in a worker
+    UPSTREAM_POOL_MAXSIZE = 32  # Idle keep-alive connections kept per provider host
+    UPSTREAM_MAX_RETRIES = 3  # Auto-retries for failed upstream connects
+    UPSTREAM_DNS_TTL = 60  # Seconds a resolved provider address is reused (0 disables the cache)
+    UPSTREAM_SESSION_IDLE_TIMEOUT = 300  # Close a provider host's pooled session after this many seconds unused
 
 class HLSConfig(BaseConfig):
     MIN_SEGMENTS = 12
@@ -24,19 +29,67 @@ class HLSConfig(BaseConfig):
     INITIAL_BUFFER_SECONDS = 25.0
     MAX_INITIAL_SEGMENTS = 10
     BUFFER_READY_TIMEOUT = 30.0
+    SEGMENT_DOWNLOAD_WORKERS = 4  # Segments of one channel downloaded in parallel
+    PUBLISH_CADENCE_SAMPLES = 8  # Segment publish intervals averaged to time playlist reloads
+    BLOCKING_RELOAD = True  # Use LL-HLS blocking playlist reload when the upstream advertises it
+    SEGMENT_TTL = 120  # Seconds segments and channel state live in Redis without being refreshed
+    OWNERSHIP_TTL = 30  # Seconds the fetching worker's lock lasts between renewals
 
 class TSConfig(BaseConfig):
     """Configuration settings for TS proxy"""
 
     # Buffer settings
-    INITIAL_BEHIND_CHUNKS = 4  # How many chunks behind to start a client (4 chunks = ~1MB)
+    # Chunks behind live a client starts at, and chunks the owner buffers before the channel is ready.
+    # Counted in chunks, so the time depends on chunk sizing: ~1s at CHUNK_TARGET_SECONDS, but only
+    # ~48KB (a fraction of a second) while FAST_START_CHUNK_SIZE chunks are in use
+    INITIAL_BEHIND_CHUNKS = 4
+    JOIN_AT_KEYFRAME = True    # Start new clients at the latest keyframe with PAT/PMT prepended
+    JOIN_MAX_BEHIND_SECONDS = 10.0  # Fall back to INITIAL_BEHIND_CHUNKS if the keyframe is older than this (covers long GOPs)
     CHUNK_BATCH_SIZE = 5       # How many chunks to fetch in one batch
     KEEPALIVE_INTERVAL = 0.5   # Seconds between keepalive packets when at buffer head
+    LOCAL_BUFFER_CHUNKS = 64   # Recent chunks the owner worker keeps in memory (~16s of stream with adaptive chunks, up to ~64MB at MAX_BUFFER_CHUNK_SIZE)
+    SHARED_MEMORY_RING = False  # Also publish chunks in a shared memory ring for workers on the same host
+    SHARED_MEMORY_RING_SLOTS = 32  # Chunks kept in each channel's shared memory ring (slots sized from its chunk size)
+    CHUNK_WAIT_TIMEOUT = 1.0   # Max seconds a client blocks waiting for a new chunk before rechecking state
+    CHANNEL_STATE_POLL_INTERVAL = 1.0  # Seconds between Redis reconciliations of channel/client stop flags per worker
+
+    # Adaptive chunk sizing - pick BUFFER_CHUNK_SIZE per channel from the measured ingest bitrate
+    ADAPTIVE_CHUNK_SIZE = True
+    CHUNK_TARGET_SECONDS = 0.25        # Aim for this much stream time per Redis chunk
+    MIN_BUFFER_CHUNK_SIZE = 188 * 87   # ~16KB floor so very low bitrates don't flood Redis with tiny keys
+    MAX_BUFFER_CHUNK_SIZE = 188 * 5577 # ~1MB ceiling for UHD streams
+    CHUNK_RESIZE_THRESHOLD = 0.25      # Only resize when the ideal size differs by more than this fraction
+    BITRATE_SAMPLE_INTERVAL = 1.0      # Seconds between ingest bitrate samples
+    TS_INSPECTION = True               # Count CC errors, null packets and PCR intervals on ingested chunks
+
+    # Fast start - small chunks from a PAT/keyframe boundary right after channel init
+    FAST_START_ENABLED = True
+    FAST_START_SECONDS = 5              # How long to keep small chunks after startup
+    FAST_START_CHUNK_SIZE = 188 * 64    # ~12KB chunks during fast start
+    FAST_START_MAX_SEEK_BYTES = 188 * 4096  # Max data held back looking for a keyframe
+    FAST_START_SEEK_TIMEOUT = 2.0       # Max seconds to hold data back looking for a keyframe
+
+    # Transcoder output is read with one readinto() of up to this size per readiness event
+    TRANSCODE_READ_SIZE = 188 * 1024    # ~188KB
+    TRANSCODE_READ_TIMEOUT = 1.0        # Max seconds to wait for transcoder output before rechecking state
+
+    # Renditions - extra outputs transcoded from the channel's single upstream connection
+    MAX_RENDITIONS = 3                  # Renditions (besides passthrough) a channel may run at once
+    RENDITION_IDLE_TIMEOUT = 30         # Stop a rendition after this many seconds without clients
+    RENDITION_QUEUE_CHUNKS = 256        # Upstream reads queued per rendition before dropping (~2MB)
+
+    # Standby failover - channels flagged standby_failover keep their next alternate stream warm
+    STANDBY_MODE = "hold"               # hold: keep it open, reading and discarding; probe: check it periodically
+    STANDBY_PROBE_INTERVAL = 30         # Seconds between checks in probe mode
+    STANDBY_PROBE_BYTES = 188 * 64      # Data a probe must read (with a TS sync) to count as alive
+    STANDBY_STALE_SECONDS = 10          # Don't switch to a held standby that has been silent this long
+    STANDBY_RETRY_INTERVAL = 30         # Seconds before replacing a standby that failed
 
     # Streaming settings
     TARGET_BITRATE = 8000000   # Target bitrate (8 Mbps)
     STREAM_TIMEOUT = 10        # Disconnect after this many seconds of no data
     HEALTH_CHECK_INTERVAL = 5  # Check stream health every N seconds
+    TELEMETRY_FLUSH_INTERVAL = 1.0  # Seconds between coalesced last-data/byte-count/health writes to Redis
 
     # Resource management
     CLEANUP_INTERVAL = 60  # Check for inactive channels every 60 seconds
@@ -45,9 +98,16 @@ class TSConfig(BaseConfig):
     # Client tracking settings
     CLIENT_RECORD_TTL = 5  # How long client records persist in Redis (seconds). Client will be considered MIA after this time.
     CLEANUP_CHECK_INTERVAL = 1  # How often to check for disconnected clients (seconds)
+    CHANNEL_REGISTRY_TTL = 30  # Seconds without a heartbeat before a channel drops out of the registry
+    STATS_FULL_SNAPSHOT_INTERVAL = 30  # Seconds between full channel stats snapshots on the updates feed (deltas in between)
     CHANNEL_INIT_GRACE_PERIOD = 5  # How long to wait for first client after initialization (seconds)
     CLIENT_HEARTBEAT_INTERVAL = 1  # How often to send client heartbeats (seconds)
     GHOST_CLIENT_MULTIPLIER = 5.0  # How many heartbeat intervals before client considered ghost (5 would mean 5 secondsif heartbeat interval is 1)
+    CLIENT_STATS_FLUSH_INTERVAL = 2  # How often the heartbeat thread writes batched client stats to Redis (seconds)
+    CLIENT_RATE_SMOOTHING = 5.0  # Time constant (seconds) for the client current rate moving average
+    CLIENT_LAG_POLICY = "skip_to_keyframe"  # Slow clients: skip_to_keyframe, live_edge or disconnect
+    CLIENT_MAX_LAG_SECONDS = 15  # Apply the lag policy when a client falls this far behind live
+    CLIENT_MAX_LAG_BYTES = 32 * 1024 * 1024  # ...or this many buffered bytes behind the head
 
     # TS packets are 188 bytes
     # Make chunk size a multiple of TS packet size for perfect alignment
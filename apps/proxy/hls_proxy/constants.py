@@ -0,0 +1,20 @@
+"""
+Constants used by the HLS proxy.
+"""
+
+# Channel metadata field names stored in Redis
+class ChannelMetadataField:
+    URL = "url"
+    USER_AGENT = "user_agent"
+    OWNER = "owner"
+    INIT_TIME = "init_time"
+
+    # Playlist state published by the owner for every worker's manifests
+    TARGET_DURATION = "target_duration"
+    MANIFEST_VERSION = "manifest_version"
+    BUFFER_READY = "buffer_ready"
+
+    # Packet-level stream quality over the verified segments
+    STREAM_CC_ERRORS = "stream_cc_errors"
+    STREAM_NULL_RATIO = "stream_null_ratio"
+    STREAM_PCR_INTERVAL_MAX = "stream_pcr_interval_max"
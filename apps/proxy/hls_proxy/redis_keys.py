@@ -0,0 +1,41 @@
+"""
+Defines Redis key patterns used by the HLS proxy.
+Segments and playlist state live in Redis so every worker can serve a channel
+that only one worker fetches.
+"""
+
+class RedisKeys:
+    @staticmethod
+    def channel_metadata(channel_id):
+        """Key for channel metadata hash (URL, user agent, playlist info)"""
+        return f"hls_proxy:channel:{channel_id}:metadata"
+
+    @staticmethod
+    def channel_owner(channel_id):
+        """Key for storing the worker ID that fetches the channel"""
+        return f"hls_proxy:channel:{channel_id}:owner"
+
+    @staticmethod
+    def segment(channel_id, sequence):
+        """Key for a segment's data"""
+        return f"hls_proxy:channel:{channel_id}:segment:{sequence}"
+
+    @staticmethod
+    def segment_index(channel_id):
+        """Key for the sorted set of buffered segment sequence numbers"""
+        return f"hls_proxy:channel:{channel_id}:segments"
+
+    @staticmethod
+    def segment_info(channel_id):
+        """Key for the hash of segment sequence -> duration and discontinuity flag"""
+        return f"hls_proxy:channel:{channel_id}:segment_info"
+
+    @staticmethod
+    def manifest(channel_id):
+        """Key for the hash holding the rendered manifest and its version"""
+        return f"hls_proxy:channel:{channel_id}:manifest"
+
+    @staticmethod
+    def clients(channel_id):
+        """Key for the hash of client IP -> last activity time"""
+        return f"hls_proxy:channel:{channel_id}:clients"
@@ -12,98 +12,257 @@ import threading
 import logging
 import m3u8
 import time
-from urllib.parse import urlparse, urljoin
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse, urljoin, parse_qsl, urlencode
 import argparse
 from typing import Optional, Dict, List, Set, Deque
+import socket
 import sys
 import os
 from apps.proxy.config import HLSConfig as Config
-
-# Global state management
-manifest_buffer = None  # Stores current manifest content
-segment_buffers = {}   # Maps sequence numbers to segment data
-buffer_lock = threading.Lock()  # Synchronizes access to buffers
+from apps.proxy import channel_ownership
+from apps.proxy.upstream_pool import get_upstream_pool
+from apps.proxy.ts_inspection import TSStats, inspect_packets
+from .constants import ChannelMetadataField
+from .redis_keys import RedisKeys
 
 class StreamBuffer:
     """
-    Manages buffering of stream segments with thread-safe access.
+    Stores a channel's segments in Redis so every worker can serve them.
     
     Attributes:
-        buffer (Dict[int, bytes]): Maps sequence numbers to segment data
+        buffer (Dict[int, bytes]): Segments stored by this worker, kept for fast local reads
+        info (Dict[int, tuple]): Maps sequence numbers to (duration, discontinuity)
+        manifest (tuple): (manifest bytes, ETag) last published by this worker
         lock (threading.Lock): Thread safety for buffer access
         
     Features:
-        - Thread-safe segment storage and retrieval
-        - Automatic cleanup of old segments
-        - Sequence number based indexing
+        - Segments written once by the owner worker, readable from any worker
+        - Segment keys expire after SEGMENT_TTL so abandoned channels clean themselves up
+        - Index trimmed to the most recent MAX_SEGMENTS
+        - Manifest rendered once per segment change and stored with a version counter
+        - Local-only operation when Redis is unavailable
     """
     
-    def __init__(self):
+    def __init__(self, channel_id: Optional[str] = None, redis_client=None):
+        self.channel_id = channel_id
+        self.redis_client = redis_client
         self.buffer: Dict[int, bytes] = {}  # Maps sequence numbers to segment data
+        self.info: Dict[int, tuple] = {}
+        self.manifest: Optional[tuple] = None
+        self.manifest_version = 0
         self.lock: threading.Lock = threading.Lock()
 
     def __getitem__(self, key: int) -> Optional[bytes]:
         """Get segment data by sequence number"""
-        return self.buffer.get(key)
-
-    def __setitem__(self, key: int, value: bytes):
-        """Store segment data by sequence number"""
-        self.buffer[key] = value
-        # Cleanup old segments if we exceed MAX_SEGMENTS
-        if len(self.buffer) > Config.MAX_SEGMENTS:
-            keys = sorted(self.buffer.keys())
-            # Keep the most recent MAX_SEGMENTS
-            to_remove = keys[:-Config.MAX_SEGMENTS]
-            for k in to_remove:
-                del self.buffer[k]
+        return self.get(key)
 
     def __contains__(self, key: int) -> bool:
         """Check if sequence number exists in buffer"""
-        return key in self.buffer
+        return key in self.keys()
+
+    def add_segment(self, sequence: int, data: bytes, duration: float, discontinuity: bool = False):
+        """
+        Store a segment for every worker.
+        
+        Args:
+            sequence: Proxy sequence number of the segment
+            data: Segment data
+            duration: Segment duration in seconds
+            discontinuity: True if the segment starts a new source
+        """
+        self.buffer[sequence] = data
+        self.info[sequence] = (duration, discontinuity)
+        # Keep the most recent MAX_SEGMENTS
+        for k in sorted(self.info.keys())[:-Config.MAX_SEGMENTS]:
+            del self.info[k]
+            self.buffer.pop(k, None)
+
+        if not self.redis_client:
+            return
+
+        index_key = RedisKeys.segment_index(self.channel_id)
+        info_key = RedisKeys.segment_info(self.channel_id)
+        try:
+            pipe = self.redis_client.pipeline()
+            pipe.setex(RedisKeys.segment(self.channel_id, sequence), Config.SEGMENT_TTL, data)
+            pipe.hset(info_key, sequence, f"{duration}|{int(discontinuity)}")
+            pipe.zadd(index_key, {sequence: sequence})
+            pipe.zrange(index_key, 0, -Config.MAX_SEGMENTS - 1)
+            pipe.zremrangebyrank(index_key, 0, -Config.MAX_SEGMENTS - 1)
+            pipe.expire(index_key, Config.SEGMENT_TTL)
+            pipe.expire(info_key, Config.SEGMENT_TTL)
+            trimmed = pipe.execute()[3]
+            if trimmed:
+                # Segment data expires on its own, only the info entries need removing
+                self.redis_client.hdel(info_key, *trimmed)
+        except Exception as e:
+            logging.error(f"Error storing segment {sequence} for channel {self.channel_id} in Redis: {e}")
+
+    def get(self, sequence: int) -> Optional[bytes]:
+        """Get segment data, from this worker's copy or Redis"""
+        data = self.buffer.get(sequence)
+        if data is not None or not self.redis_client:
+            return data
+
+        try:
+            return self.redis_client.get(RedisKeys.segment(self.channel_id, sequence))
+        except Exception as e:
+            logging.error(f"Error reading segment {sequence} for channel {self.channel_id} from Redis: {e}")
+            return None
 
     def keys(self) -> List[int]:
         """Get list of available sequence numbers"""
-        return list(self.buffer.keys())
+        if not self.redis_client:
+            return list(self.buffer.keys())
+
+        try:
+            return [int(seq) for seq in self.redis_client.zrange(RedisKeys.segment_index(self.channel_id), 0, -1)]
+        except Exception as e:
+            logging.error(f"Error reading segment index for channel {self.channel_id}: {e}")
+            return list(self.buffer.keys())
+
+    def segment_info(self, sequences: List[int]) -> Dict[int, tuple]:
+        """Get (duration, discontinuity) for the given sequence numbers"""
+        if not self.redis_client or not sequences:
+            return {seq: self.info[seq] for seq in sequences if seq in self.info}
 
-    def cleanup(self, keep_sequences: List[int]):
-        """Remove segments not in keep list"""
-        for seq in list(self.buffer.keys()):
-            if seq not in keep_sequences:
-                del self.buffer[seq]
+        try:
+            values = self.redis_client.hmget(RedisKeys.segment_info(self.channel_id), sequences)
+        except Exception as e:
+            logging.error(f"Error reading segment info for channel {self.channel_id}: {e}")
+            return {seq: self.info[seq] for seq in sequences if seq in self.info}
+
+        info = {}
+        for seq, value in zip(sequences, values):
+            if value:
+                duration, discontinuity = value.decode('utf-8').split('|')
+                info[seq] = (float(duration), discontinuity == '1')
+        return info
+
+    def publish_manifest(self, manifest: bytes):
+        """Store a freshly rendered manifest for every worker, bumping its version"""
+        # Versions of a new channel start at the current time so ETags never repeat across restarts
+        version = self.manifest_version + 1 if self.manifest_version else int(time.time() * 1000)
+        if self.redis_client:
+            try:
+                manifest_key = RedisKeys.manifest(self.channel_id)
+                pipe = self.redis_client.pipeline()
+                pipe.hsetnx(manifest_key, 'version', int(time.time() * 1000))
+                pipe.hincrby(manifest_key, 'version', 1)
+                pipe.hset(manifest_key, 'data', manifest)
+                pipe.expire(manifest_key, Config.SEGMENT_TTL)
+                version = pipe.execute()[1]
+            except Exception as e:
+                logging.error(f"Error storing manifest for channel {self.channel_id} in Redis: {e}")
+                return
+
+        self.manifest_version = version
+        # Swapped in as one tuple so readers never see data and ETag from different versions
+        self.manifest = (manifest, f'"{self.channel_id}-{version}"')
+
+    def get_manifest(self) -> tuple:
+        """
+        Get the latest rendered manifest without touching segment state.
+        
+        Returns:
+            tuple: (manifest bytes, ETag), or (None, None) before the first segment
+        """
+        if self.manifest or not self.redis_client:
+            return self.manifest or (None, None)
+
+        try:
+            manifest, version = self.redis_client.hmget(RedisKeys.manifest(self.channel_id), ['data', 'version'])
+        except Exception as e:
+            logging.error(f"Error reading manifest for channel {self.channel_id} from Redis: {e}")
+            return None, None
+        if not manifest:
+            return None, None
+        return manifest, f'"{self.channel_id}-{int(version)}"'
+
+    def clear(self):
+        """Remove every stored segment"""
+        self.buffer.clear()
+        self.info.clear()
+        self.manifest = None
+        self.manifest_version = 0
+        if not self.redis_client:
+            return
+
+        try:
+            index_key = RedisKeys.segment_index(self.channel_id)
+            sequences = self.redis_client.zrange(index_key, 0, -1)
+            keys = [RedisKeys.segment(self.channel_id, int(seq)) for seq in sequences]
+            self.redis_client.delete(index_key, RedisKeys.segment_info(self.channel_id),
+                                     RedisKeys.manifest(self.channel_id), *keys)
+        except Exception as e:
+            logging.error(f"Error clearing segments for channel {self.channel_id}: {e}")
 
 class ClientManager:
-    """Manages client connections and activity tracking"""
+    """Manages client connections and activity tracking across workers"""
     
-    def __init__(self):
+    def __init__(self, channel_id: Optional[str] = None, redis_client=None):
+        self.channel_id = channel_id
+        self.redis_client = redis_client
         self.last_activity = {}  # Maps client IPs to last activity timestamp
         self.lock = threading.Lock()
         
     def record_activity(self, client_ip: str):
         """Record client activity timestamp"""
-        with self.lock:
-            prev_time = self.last_activity.get(client_ip)
-            current_time = time.time()
-            self.last_activity[client_ip] = current_time
-            if not prev_time:
-                logging.info(f"New client connected: {client_ip}")
-            else:
-                logging.debug(f"Client activity: {client_ip}")
+        current_time = time.time()
+        if self.redis_client:
+            try:
+                clients_key = RedisKeys.clients(self.channel_id)
+                pipe = self.redis_client.pipeline()
+                pipe.hset(clients_key, client_ip, current_time)
+                pipe.expire(clients_key, Config.SEGMENT_TTL)
+                is_new = pipe.execute()[0]
+            except Exception as e:
+                logging.error(f"Error recording client activity for channel {self.channel_id}: {e}")
+                return
+        else:
+            with self.lock:
+                is_new = client_ip not in self.last_activity
+                self.last_activity[client_ip] = current_time
+
+        if is_new:
+            logging.info(f"New client connected: {client_ip}")
+        else:
+            logging.debug(f"Client activity: {client_ip}")
+
+    def _load_activity(self) -> Dict[str, float]:
+        if not self.redis_client:
+            return dict(self.last_activity)
+        values = self.redis_client.hgetall(RedisKeys.clients(self.channel_id))
+        return {ip.decode('utf-8'): float(last_time) for ip, last_time in values.items()}
+
+    def count(self) -> int:
+        """Get the number of clients seen on any worker"""
+        try:
+            return len(self._load_activity())
+        except Exception as e:
+            logging.error(f"Error counting clients for channel {self.channel_id}: {e}")
+            return 0
                 
     def cleanup_inactive(self, timeout: float) -> bool:
         """Remove inactive clients"""
         now = time.time()
         with self.lock:
+            last_activity = self._load_activity()
             active_clients = {
                 ip: last_time 
-                for ip, last_time in self.last_activity.items()
+                for ip, last_time in last_activity.items()
                 if (now - last_time) < timeout
             }
             
-            removed = set(self.last_activity.keys()) - set(active_clients.keys())
+            removed = set(last_activity.keys()) - set(active_clients.keys())
             if removed:
                 for ip in removed:
-                    inactive_time = now - self.last_activity[ip]
+                    inactive_time = now - last_activity[ip]
                     logging.warning(f"Client {ip} inactive for {inactive_time:.1f}s, removing")
+                if self.redis_client:
+                    self.redis_client.hdel(RedisKeys.clients(self.channel_id), *removed)
             
             self.last_activity = active_clients
             if active_clients:
@@ -131,13 +290,15 @@ class StreamManager:
         - Thread coordination
         - Buffer state management
     """
-    def __init__(self, initial_url: str, channel_id: str, user_agent: Optional[str] = None):
+    def __init__(self, initial_url: str, channel_id: str, user_agent: Optional[str] = None, redis_client=None):
         # Stream state
         self.current_url = initial_url
         self.channel_id = channel_id
         self.user_agent = user_agent or Config.DEFAULT_USER_AGENT
+        self.redis_client = redis_client
         self.running = True
         self.switching_stream = False
+        self.lock = threading.Lock()
         
         # Sequence tracking
         self.next_sequence = 0
@@ -156,6 +317,9 @@ class StreamManager:
         self.fetch_thread = None
         self.url_changed = threading.Event()
         
+        # Packet-level counters over every verified segment
+        self.stream_quality = TSStats()
+
         # Add manifest info
         self.target_duration = 10.0  # Default, will be updated from manifest
         self.manifest_version = 3    # Default, will be updated from manifest
@@ -198,7 +362,7 @@ class StreamManager:
             - Signals fetch thread
         """
         if new_url != self.current_url:
-            with buffer_lock:
+            with self.lock:
                 self.switching_stream = True
                 self.current_url = new_url
                 
@@ -219,9 +383,47 @@ class StreamManager:
                 # Signal thread to switch URL
                 self.url_changed.set()
                 
+            self._update_metadata({ChannelMetadataField.URL: new_url})
             return True
         return False
 
+    def poll_url_change(self) -> bool:
+        """Pick up a URL change requested through another worker"""
+        if not self.redis_client:
+            return False
+
+        try:
+            url = self.redis_client.hget(RedisKeys.channel_metadata(self.channel_id), ChannelMetadataField.URL)
+        except Exception as e:
+            logging.error(f"Error checking URL for channel {self.channel_id}: {e}")
+            return False
+        return bool(url) and self.update_url(url.decode('utf-8'))
+
+    def publish_playlist_info(self):
+        """Share the upstream playlist's target duration, version and packet counters with other workers"""
+        quality = self.stream_quality
+        self._update_metadata({
+            ChannelMetadataField.TARGET_DURATION: self.target_duration,
+            ChannelMetadataField.MANIFEST_VERSION: self.manifest_version,
+            ChannelMetadataField.STREAM_CC_ERRORS: quality.cc_errors,
+            ChannelMetadataField.STREAM_NULL_RATIO: f"{quality.null_ratio:.4f}",
+            ChannelMetadataField.STREAM_PCR_INTERVAL_MAX: f"{quality.pcr_interval_max:.4f}",
+        })
+
+    def mark_buffer_ready(self):
+        """Let clients on every worker know the initial buffer is filled"""
+        self.initial_buffering = False
+        self.buffer_ready.set()
+        self._update_metadata({ChannelMetadataField.BUFFER_READY: 1})
+
+    def _update_metadata(self, fields: dict):
+        if not self.redis_client:
+            return
+        try:
+            self.redis_client.hset(RedisKeys.channel_metadata(self.channel_id), mapping=fields)
+        except Exception as e:
+            logging.error(f"Error updating metadata for channel {self.channel_id}: {e}")
+
     def get_next_sequence(self, source_id: str) -> Optional[int]:
         """
         Assign sequence numbers to segments with source change detection.
@@ -260,30 +462,6 @@ class StreamManager:
         
         return seq
 
-    def _fetch_loop(self):
-        """Background thread for continuous stream fetching"""
-        while self.running:
-            try:
-                fetcher = StreamFetcher(self, self.buffer)
-                fetch_stream(fetcher, self.url_changed, self.next_sequence)
-            except Exception as e:
-                logging.error(f"Stream error: {e}")
-                time.sleep(5)  # Wait before retry
-            
-            self.url_changed.clear()
-
-    def start(self):
-        """Start the background fetch thread"""
-        if not self.fetch_thread or not self.fetch_thread.is_alive():
-            self.running = True
-            self.fetch_thread = threading.Thread(
-                target=self._fetch_loop,
-                name="StreamFetcher",
-                daemon=True  # Thread will exit when main program does
-            )
-            self.fetch_thread.start()
-            logging.info("Stream manager started")
-
     def stop(self):
         """Stop the stream manager and cleanup resources"""
         self.running = False
@@ -305,7 +483,9 @@ class StreamManager:
             # Wait for initial connection window
             start_time = time.time()
             while self.cleanup_running and (time.time() - start_time) < Config.INITIAL_CONNECTION_WINDOW:
-                if self.first_client_connected:
+                # Clients may have connected through another worker
+                if self.first_client_connected or self.client_manager.count():
+                    self.first_client_connected = True
                     break
                 time.sleep(1)
                 
@@ -317,6 +497,11 @@ class StreamManager:
             # Normal client activity monitoring
             while self.cleanup_running and self.running:
                 try:
+                    if not self.proxy_server.extend_ownership(self.channel_id):
+                        logging.warning(f"Channel {self.channel_id}: Lost ownership, stopping fetch on this worker")
+                        self.proxy_server.stop_channel(self.channel_id)
+                        break
+
                     timeout = self.target_duration * Config.CLIENT_TIMEOUT_FACTOR
                     if self.client_manager.cleanup_inactive(timeout):
                         logging.info(f"Channel {self.channel_id}: All clients disconnected for {timeout:.1f}s")
@@ -339,6 +524,321 @@ class StreamManager:
             self.cleanup_thread.start()
             logging.info(f"Started cleanup thread for channel {self.channel_id}")
 
+class SegmentScheduler:
+    """
+    Works out which playlist segments still need downloading and fetches them in parallel.
+    
+    Attributes:
+        fetched (deque): Identities of recently fetched segments (oldest first)
+        executor (ThreadPoolExecutor): Bounded pool shared by the channel's downloads
+        timings (deque): Per-segment download timings, most recent last
+        
+    Features:
+        - Diffs every playlist against what was already fetched
+        - Segments identified by media sequence number, or URI without EXT-X-MEDIA-SEQUENCE
+        - Downloads pipelined on a small worker pool
+        - Results handed back strictly in playlist order
+        - Restarts from the live edge after a URL change or upstream reset
+    """
+    def __init__(self, fetcher: 'StreamFetcher', max_workers: int):
+        self.fetcher = fetcher
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix=f"HLSSegments-{fetcher.manager.channel_id}"
+        )
+        self.fetched: Deque = deque()
+        self.fetched_set: Set = set()
+        self.last_media_sequence: Optional[int] = None
+        self.playlist_url: Optional[str] = None
+        self.timings: Deque[dict] = deque(maxlen=Config.MAX_SEGMENTS)
+
+    def reset(self):
+        """Forget fetched segments so the next playlist starts from the live edge"""
+        self.fetched.clear()
+        self.fetched_set.clear()
+        self.last_media_sequence = None
+
+    def pending_segments(self, playlist_url: str, manifest, manifest_text: str, initial: bool) -> List[tuple]:
+        """
+        Get the segments of a playlist that haven't been fetched yet.
+        
+        Args:
+            playlist_url: URL the playlist was requested from
+            manifest: Parsed m3u8 playlist
+            manifest_text: Raw playlist text
+            initial: True while building the initial buffer
+            
+        Returns:
+            list of (key, segment) tuples in playlist order
+        """
+        if playlist_url != self.playlist_url:
+            if self.playlist_url is not None:
+                logging.info(f"Playlist URL changed, restarting segment tracking at live edge")
+            self.playlist_url = playlist_url
+            self.reset()
+
+        # Without EXT-X-MEDIA-SEQUENCE the number is always 0, so fall back to URIs
+        numbered = '#EXT-X-MEDIA-SEQUENCE' in manifest_text
+        first = manifest.media_sequence or 0
+        keyed = [(first + i if numbered else segment.uri, segment)
+                 for i, segment in enumerate(manifest.segments)]
+
+        pending = [(key, segment) for key, segment in keyed if key not in self.fetched_set]
+        if not self.fetched:
+            return self._live_edge(keyed) if initial else keyed[-1:]
+
+        if len(pending) == len(keyed):
+            # No overlap with what we fetched - contiguous numbering means we fell behind, anything else is a reset
+            if numbered and self.last_media_sequence is not None and first == self.last_media_sequence + 1:
+                return pending
+            logging.warning(f"Playlist no longer overlaps fetched segments, resuming at live edge")
+            self.reset()
+            return keyed[-1:]
+
+        return pending
+
+    def _live_edge(self, keyed: List[tuple]) -> List[tuple]:
+        """Pick the initial buffer from the end of the playlist"""
+        selected = []
+        duration = 0.0
+        for key, segment in reversed(keyed):
+            duration += float(segment.duration)
+            selected.append((key, segment))
+            if duration >= Config.INITIAL_BUFFER_SECONDS or len(selected) >= Config.MAX_INITIAL_SEGMENTS:
+                break
+        selected.reverse()
+        return selected
+
+    def fetch(self, base_url: str, pending: List[tuple]):
+        """
+        Download pending segments in parallel, yielding them in playlist order.
+        
+        Yields:
+            (segment, data) tuples; data is None if the segment failed
+        """
+        futures = [
+            (key, segment, self.executor.submit(self._download, urljoin(base_url, segment.uri)))
+            for key, segment in pending
+        ]
+        for key, segment, future in futures:
+            try:
+                data, timing = future.result()
+                timing['uri'] = segment.uri
+                timing['duration'] = float(segment.duration)
+                self.timings.append(timing)
+                self.fetcher.manager.stream_quality.merge(timing.pop('stats'))
+                logging.debug(f"Fetched {segment.uri} in {timing['elapsed']:.3f}s "
+                              f"({timing['size']} bytes, {timing['attempts']} attempts)")
+            except Exception as e:
+                logging.error(f"Segment download error for {segment.uri}: {e}")
+                data = None
+
+            # Failed segments count as fetched too - they won't come back valid on the next poll
+            self._mark_fetched(key)
+            yield segment, data
+
+    def _download(self, url: str) -> tuple:
+        """Download and verify one segment, retrying invalid data"""
+        start = time.time()
+        max_retries = 3
+        for attempt in range(1, max_retries + 1):
+            data, _ = self.fetcher.download(url)
+            verification = verify_segment(data)
+            if verification.get('valid', False):
+                return data, {'elapsed': time.time() - start, 'size': len(data), 'attempts': attempt,
+                              'stats': verification['stats']}
+            logging.warning(f"Invalid segment, retry {attempt}/{max_retries}: {verification.get('error')}")
+            if attempt < max_retries:
+                time.sleep(0.5)  # Short delay before retry
+        raise ValueError(f"Segment validation failed after {max_retries} attempts")
+
+    def _mark_fetched(self, key):
+        self.fetched.append(key)
+        self.fetched_set.add(key)
+        if isinstance(key, int):
+            self.last_media_sequence = key
+
+        # Remember a few playlists' worth of segments
+        while len(self.fetched) > Config.MAX_SEGMENTS * 4:
+            self.fetched_set.discard(self.fetched.popleft())
+
+    def shutdown(self):
+        """Stop the worker pool without waiting for downloads in flight"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+class PlaylistRefresher:
+    """
+    Schedules and sends live playlist reloads.
+    
+    Attributes:
+        next_reload (float): Earliest time the playlist may be requested again
+        publish_intervals (deque): Recent seconds per newly published segment
+        can_block_reload (bool): Upstream supports LL-HLS blocking playlist reload
+        
+    Features:
+        - RFC 8216 section 6.3.4 reload rules: wait a target duration after a
+          changed playlist and half of one after an unchanged playlist, both
+          measured from when the previous load started
+        - Reloads lined up with the upstream's measured segment publish cadence
+          instead of polling blindly
+        - Conditional requests (If-None-Match / If-Modified-Since)
+        - Blocking reload (_HLS_msn) when EXT-X-SERVER-CONTROL advertises CAN-BLOCK-RELOAD
+        - No reloads after EXT-X-ENDLIST until the URL changes
+    """
+    def __init__(self, fetcher: 'StreamFetcher'):
+        self.fetcher = fetcher
+        self.publish_intervals: Deque[float] = deque(maxlen=Config.PUBLISH_CADENCE_SAMPLES)
+        self.playlist_url: Optional[str] = None
+        self.reset()
+
+        # Request counters
+        self.loads = 0
+        self.not_modified = 0
+        self.unchanged = 0
+
+    def reset(self):
+        """Forget everything learned about the current playlist"""
+        self.next_reload = 0.0
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self.last_text: Optional[str] = None
+        self.last_media_sequence: Optional[int] = None
+        self.last_publish_time: Optional[float] = None
+        self.can_block_reload = False
+        self.ended = False
+        self.publish_intervals.clear()
+
+    @property
+    def publish_cadence(self) -> Optional[float]:
+        """Sliding average of seconds between newly published segments"""
+        if not self.publish_intervals:
+            return None
+        return sum(self.publish_intervals) / len(self.publish_intervals)
+
+    def wait(self, playlist_url: str) -> bool:
+        """
+        Sleep until the playlist may be reloaded.
+        
+        Returns:
+            bool: True when it is time to load, False if the loop should check its state again first
+        """
+        if playlist_url != self.playlist_url:
+            # New URL - nothing we know about the old playlist applies
+            self.playlist_url = playlist_url
+            self.reset()
+
+        delay = self.next_reload - time.time()
+        if self.ended:
+            # Finished playlists are only reloaded if the URL changes
+            time.sleep(1.0)
+            return False
+        if delay > 0:
+            # Sleep in short steps so a URL change or stop is noticed quickly
+            time.sleep(min(delay, 1.0))
+            return delay <= 1.0
+        return True
+
+    def reload_after(self, seconds: float):
+        """Hold off the next load (used after errors)"""
+        self.next_reload = time.time() + seconds
+
+    def load(self, playlist_url: str) -> tuple:
+        """
+        Request the playlist and schedule the next reload.
+        
+        Returns:
+            tuple: (manifest, manifest_text, final_url); manifest is None when the
+            playlist hasn't changed since the last load
+        """
+        load_start = time.time()
+        target_duration = self.fetcher.manager.target_duration
+
+        url = playlist_url
+        timeout = 10
+        if self.can_block_reload and self.last_media_sequence is not None:
+            # Ask the server to hold the response until the next segment exists
+            separator = '&' if '?' in url else '?'
+            url = f"{url}{separator}_HLS_msn={self.last_media_sequence + 1}"
+            timeout = max(timeout, target_duration * 3)
+
+        headers = {}
+        if self.etag:
+            headers['If-None-Match'] = self.etag
+        if self.last_modified:
+            headers['If-Modified-Since'] = self.last_modified
+
+        response = self.fetcher.request(url, headers=headers, timeout=timeout)
+        self.loads += 1
+
+        if response.status_code == 304:
+            self.not_modified += 1
+            self._schedule(load_start, changed=False)
+            return None, None, response.url
+        if response.status_code != 200:
+            raise ValueError(f"Playlist request returned HTTP {response.status_code}")
+
+        self.etag = response.headers.get('ETag')
+        self.last_modified = response.headers.get('Last-Modified')
+        manifest_text = response.content.decode()
+        if manifest_text == self.last_text:
+            self.unchanged += 1
+            self._schedule(load_start, changed=False)
+            return None, None, response.url
+        self.last_text = manifest_text
+
+        manifest = m3u8.loads(manifest_text)
+        self.can_block_reload = Config.BLOCKING_RELOAD and bool(
+            manifest.server_control and manifest.server_control.can_block_reload == 'YES'
+        )
+        self.ended = manifest.is_endlist
+        self._track_publishing(manifest, manifest_text)
+        if manifest.target_duration:
+            target_duration = float(manifest.target_duration)
+        self._schedule(load_start, changed=True, target_duration=target_duration)
+        return manifest, manifest_text, response.url
+
+    def _track_publishing(self, manifest, manifest_text: str):
+        """Update the publish cadence from how many segments appeared since the last change"""
+        if not manifest.segments or '#EXT-X-MEDIA-SEQUENCE' not in manifest_text:
+            return
+
+        last_sequence = (manifest.media_sequence or 0) + len(manifest.segments) - 1
+        now = time.time()
+        if self.last_media_sequence is not None and last_sequence > self.last_media_sequence:
+            new_segments = last_sequence - self.last_media_sequence
+            if self.last_publish_time is not None:
+                self.publish_intervals.append((now - self.last_publish_time) / new_segments)
+            self.last_publish_time = now
+        elif self.last_media_sequence is None or last_sequence < self.last_media_sequence:
+            # First load or upstream restart - start measuring again
+            self.publish_intervals.clear()
+            self.last_publish_time = now
+        self.last_media_sequence = last_sequence
+
+    def _schedule(self, load_start: float, changed: bool, target_duration: Optional[float] = None):
+        """Pick the next reload time from the RFC 8216 minimums and the publish cadence"""
+        target_duration = target_duration or self.fetcher.manager.target_duration
+
+        if self.can_block_reload:
+            # The server holds blocking requests until there is news, so ask again right away
+            self.next_reload = time.time() if changed else load_start + target_duration / 2
+            return
+
+        if changed:
+            next_reload = load_start + target_duration
+        else:
+            next_reload = load_start + target_duration / 2
+
+        cadence = self.publish_cadence
+        if cadence and self.last_publish_time:
+            # Line up with the next expected segment, but never more than a target duration away
+            expected = self.last_publish_time + cadence
+            while expected < next_reload:
+                expected += cadence
+            next_reload = min(expected, load_start + target_duration * (2 if changed else 1))
+
+        self.next_reload = next_reload
+
 class StreamFetcher:
     """
     Handles HTTP requests for stream segments with connection pooling.
@@ -346,8 +846,10 @@ class StreamFetcher:
     Attributes:
         manager (StreamManager): Associated stream manager instance
         buffer (StreamBuffer): Buffer for storing segments
-        session (requests.Session): Persistent HTTP session
+        upstream_pool (UpstreamPool): Worker-wide keep-alive sessions per host
         redirect_cache (dict): Cache for redirect responses
+        request_lock (Lock): Guards the rate limiter and redirect cache across segment download threads
+        cookies (RequestsCookieJar): This channel's cookies, kept out of the shared sessions
         
     Features:
         - Connection pooling and reuse
@@ -360,25 +862,10 @@ class StreamFetcher:
         self.manager = manager
         self.buffer = buffer
         self.stream_url = manager.current_url
-        self.session = requests.Session()
-        
-        # Configure session headers
-        self.session.headers.update({
-            'User-Agent': manager.user_agent,
-            'Connection': 'keep-alive'
-        })
-        
-        # Set up connection pooling
-        adapter = requests.adapters.HTTPAdapter(
-            pool_connections=2,    # Number of connection pools
-            pool_maxsize=4,       # Connections per pool
-            max_retries=3,        # Auto-retry failed requests
-            pool_block=False      # Don't block when pool is full
-        )
-        
-        # Apply adapter to both HTTP and HTTPS
-        self.session.mount('http://', adapter)
-        self.session.mount('https://', adapter)
+        # Keep-alive sessions and DNS cache shared with every other stream in this worker
+        self.upstream_pool = get_upstream_pool()
+        # The shared sessions keep no cookies - this channel's live here
+        self.cookies = requests.cookies.RequestsCookieJar()
         
         # Request optimization
         self.last_request_time = 0
@@ -386,12 +873,40 @@ class StreamFetcher:
         self.last_host = None            # Cache last successful host
         self.redirect_cache = {}         # Cache redirect responses
         self.redirect_cache_limit = 1000
+        # request() runs on the segment download workers as well as the fetch loop
+        self.request_lock = threading.Lock()
         
     def cleanup_redirect_cache(self):
         """Remove old redirect cache entries"""
         if len(self.redirect_cache) > self.redirect_cache_limit:
             self.redirect_cache.clear()
 
+    @staticmethod
+    def split_hls_params(url: str) -> tuple[str, list]:
+        """
+        Separate LL-HLS delivery directives (_HLS_msn, _HLS_part, ...) from a URL.
+        
+        Returns:
+            tuple containing:
+                str: URL without the _HLS_* query parameters
+                list: The removed (name, value) pairs, in order
+        """
+        parsed = urlparse(url)
+        if '_HLS_' not in parsed.query:
+            return url, []
+        params = parse_qsl(parsed.query, keep_blank_values=True)
+        kept = [(name, value) for name, value in params if not name.startswith('_HLS_')]
+        directives = [(name, value) for name, value in params if name.startswith('_HLS_')]
+        return parsed._replace(query=urlencode(kept)).geturl(), directives
+
+    @staticmethod
+    def add_query_params(url: str, params: list) -> str:
+        """Append (name, value) query parameters to a URL"""
+        if not params:
+            return url
+        separator = '&' if urlparse(url).query else '?'
+        return f"{url}{separator}{urlencode(params)}"
+
     def get_base_host(self, url: str) -> str:
         """
         Extract base host from URL.
@@ -423,6 +938,21 @@ class StreamFetcher:
             tuple containing:
                 bytes: Downloaded content
                 str: Final URL after any redirects
+        """
+        response = self.request(url)
+        return response.content, response.url
+
+    def request(self, url: str, headers: Optional[Dict[str, str]] = None, timeout: float = 10) -> requests.Response:
+        """
+        Send a GET with connection reuse and redirect handling.
+        
+        Args:
+            url: URL to request
+            headers: Extra request headers (e.g. conditional request validators)
+            timeout: Read timeout in seconds
+            
+        Returns:
+            requests.Response: The response, whatever its status
                 
         Features:
             - Connection pooling/reuse
@@ -431,29 +961,38 @@ class StreamFetcher:
             - Host fallback on failure
             - Automatic retries
         """
-        now = time.time()
-        wait_time = self.last_request_time + self.min_request_interval - now
+        # Reserve the next send slot under the lock, then wait for it outside so
+        # concurrent segment downloads queue up min_request_interval apart
+        with self.request_lock:
+            now = time.time()
+            send_at = max(now, self.last_request_time + self.min_request_interval)
+            self.last_request_time = send_at
+            # LL-HLS reloads add a fresh _HLS_msn to every playlist URL - cache by the URL without them
+            cache_key, hls_params = self.split_hls_params(url)
+            final_url = self.redirect_cache.get(cache_key)
+        wait_time = send_at - now
         if (wait_time > 0):
             time.sleep(wait_time)
             
         try:
             # Use cached redirect if available
-            if url in self.redirect_cache:
+            if final_url:
                 logging.debug(f"Using cached redirect for {url}")
-                final_url = self.redirect_cache[url]
-                response = self.session.get(final_url, timeout=10)
+                response = self.upstream_pool.get(self.add_query_params(final_url, hls_params), user_agent=self.manager.user_agent,
+                                                  headers=headers, cookies=self.cookies, timeout=timeout)
             else:
-                response = self.session.get(url, allow_redirects=True, timeout=10)
+                response = self.upstream_pool.get(url, user_agent=self.manager.user_agent, headers=headers,
+                                                  cookies=self.cookies, allow_redirects=True, timeout=timeout)
                 if response.history:  # Cache redirects
                     logging.debug(f"Caching redirect for {url} -> {response.url}")
-                    self.redirect_cache[url] = response.url
-                    
-            self.last_request_time = time.time()
+                    with self.request_lock:
+                        self.redirect_cache[cache_key] = self.split_hls_params(response.url)[0]
+                        self.cleanup_redirect_cache()
             
             if response.status_code == 200:
                 self.last_host = self.get_base_host(response.url)
             
-            return response.content, response.url
+            return response
             
         except Exception as e:
             logging.error(f"Download error: {e}")
@@ -461,138 +1000,89 @@ class StreamFetcher:
                 # Use urljoin to handle path resolution
                 new_url = urljoin(self.last_host + '/', url.split('://')[-1].split('/', 1)[-1])
                 logging.debug(f"Retrying with last host: {new_url}")
-                return self.download(new_url)
+                return self.request(new_url, headers=headers, timeout=timeout)
             raise
 
     def fetch_loop(self):
         """Main fetch loop for stream data"""
         retry_delay = 1
         max_retry_delay = 8
-        last_manifest_time = 0
-        downloaded_segments = set()  # Track downloaded segment URIs
+        scheduler = SegmentScheduler(self, Config.SEGMENT_DOWNLOAD_WORKERS)
+        refresher = PlaylistRefresher(self)
 
-        while self.manager.running:
-            try:
-                current_time = time.time()
-                
-                # Check manifest update timing
-                if last_manifest_time:
-                    time_since_last = current_time - last_manifest_time
-                    if time_since_last < (self.manager.target_duration * 0.5):
-                        time.sleep(self.manager.target_duration * 0.5 - time_since_last)
+        try:
+            while self.manager.running:
+                try:
+                    # Switches requested on other workers arrive through Redis
+                    self.manager.poll_url_change()
+
+                    # Wait until the reload rules allow the next playlist request
+                    playlist_url = self.manager.current_url
+                    if not refresher.wait(playlist_url):
                         continue
 
-                # Get manifest data
-                manifest_data, final_url = self.download(self.manager.current_url)
-                manifest = m3u8.loads(manifest_data.decode())
-                
-                # Update manifest info
-                if manifest.target_duration:
-                    self.manager.target_duration = float(manifest.target_duration)
-                if manifest.version:
-                    self.manager.manifest_version = manifest.version
-
-                if not manifest.segments:
-                    continue
-
-                if self.manager.initial_buffering:
-                    segments_to_fetch = []
-                    current_duration = 0.0
-                    successful_downloads = 0  # Initialize counter here
-                    
-                    # Start from the end of the manifest
-                    for segment in reversed(manifest.segments):
-                        current_duration += float(segment.duration)
-                        segments_to_fetch.append(segment)
-                        
-                        # Stop when we have enough duration or hit max segments
-                        if (current_duration >= Config.INITIAL_BUFFER_SECONDS or 
-                            len(segments_to_fetch) >= Config.MAX_INITIAL_SEGMENTS):
-                            break
-                    
-                    # Reverse back to chronological order
-                    segments_to_fetch.reverse()
-                    
-                    # Download initial segments
-                    for segment in segments_to_fetch:
-                        try:
-                            segment_url = urljoin(final_url, segment.uri)
-                            segment_data, _ = self.download(segment_url)
-                            
-                            validation = verify_segment(segment_data)
-                            if validation.get('valid', False):
-                                with self.buffer.lock:
-                                    seq = self.manager.next_sequence
-                                    self.buffer[seq] = segment_data
-                                    duration = float(segment.duration)
-                                    self.manager.segment_durations[seq] = duration
-                                    self.manager.buffered_duration += duration
-                                    self.manager.next_sequence += 1
-                                    successful_downloads += 1
-                                    logging.debug(f"Buffered initial segment {seq} (source: {segment.uri}, duration: {duration}s)")
-                        except Exception as e:
-                            logging.error(f"Initial segment download error: {e}")
-                    
-                    # Only mark buffer ready if we got some segments
-                    if successful_downloads > 0:
-                        self.manager.initial_buffering = False
-                        self.manager.buffer_ready.set()
-                        logging.info(f"Initial buffer ready with {successful_downloads} segments "
-                                   f"({self.manager.buffered_duration:.1f}s of content)")
-                    continue
+                    manifest, manifest_text, final_url = refresher.load(playlist_url)
+                    if manifest is None:
+                        # Not modified - nothing new to fetch
+                        continue
 
-                # Normal operation - get latest segment if we haven't already
-                latest_segment = manifest.segments[-1]
-                if (latest_segment.uri in downloaded_segments):
-                    # Wait for next manifest update
-                    time.sleep(self.manager.target_duration * 0.5)
-                    continue
+                    # Update manifest info
+                    if manifest.target_duration:
+                        self.manager.target_duration = float(manifest.target_duration)
+                    if manifest.version:
+                        self.manager.manifest_version = manifest.version
+                    self.manager.publish_playlist_info()
 
-                try:
-                    segment_url = urljoin(final_url, latest_segment.uri)
-                    segment_data, _ = self.download(segment_url)
-                    
-                    # Try several times if segment validation fails
-                    max_retries = 3
-                    retry_count = 0
-                    while retry_count < max_retries:
-                        verification = verify_segment(segment_data)
-                        if verification.get('valid', False):
+                    if not manifest.segments:
+                        continue
+
+                    # Everything published since the last poll, in order (the initial buffer on first run)
+                    initial = self.manager.initial_buffering
+                    pending = scheduler.pending_segments(playlist_url, manifest, manifest_text, initial)
+
+                    stored = 0
+                    for segment, segment_data in scheduler.fetch(final_url, pending):
+                        if not self.manager.running:
+                            # Stopped or handed over to another worker - don't store into its numbering
                             break
-                        logging.warning(f"Invalid segment, retry {retry_count + 1}/{max_retries}: {verification.get('error')}")
-                        time.sleep(0.5)  # Short delay before retry
-                        segment_data, _ = self.download(segment_url)
-                        retry_count += 1
+                        if segment_data is None:
+                            continue
 
-                    if verification.get('valid', False):
-                        with self.buffer.lock:
+                        with self.manager.lock:
                             seq = self.manager.next_sequence
-                            self.buffer[seq] = segment_data
-                            self.manager.segment_durations[seq] = float(latest_segment.duration)
+                            duration = float(segment.duration)
+                            self.buffer.add_segment(seq, segment_data, duration,
+                                                    discontinuity=seq in self.manager.source_changes)
+                            self.manager.segment_durations[seq] = duration
+                            if initial:
+                                self.manager.buffered_duration += duration
                             self.manager.next_sequence += 1
-                            downloaded_segments.add(latest_segment.uri)
-                            logging.debug(f"Stored segment {seq} (source: {latest_segment.uri}, "
-                                       f"duration: {latest_segment.duration}s, "
-                                       f"size: {len(segment_data)})")
+                            stored += 1
+                            logging.debug(f"Stored segment {seq} (source: {segment.uri}, "
+                                        f"duration: {duration}s, size: {len(segment_data)})")
 
-                        # Update timing
-                        last_manifest_time = time.time()
-                        retry_delay = 1  # Reset retry delay on success
-                    else:
-                        logging.error(f"Segment validation failed after {max_retries} retries")
+                        # Render once here rather than on every client poll
+                        self.buffer.publish_manifest(render_manifest(
+                            self.manager.channel_id,
+                            self.buffer.info,
+                            self.manager.target_duration,
+                            self.manager.manifest_version
+                        ))
 
-                except Exception as e:
-                    logging.error(f"Segment download error: {e}")
-                    continue
+                    # Only mark buffer ready if we got some segments
+                    if initial and stored > 0:
+                        self.manager.mark_buffer_ready()
+                        logging.info(f"Initial buffer ready with {stored} segments "
+                                   f"({self.manager.buffered_duration:.1f}s of content)")
 
-                # Cleanup old segment URIs from tracking
-                if len(downloaded_segments) > 100:
-                    downloaded_segments.clear()
+                    retry_delay = 1  # Reset retry delay on success
 
-            except Exception as e:
-                logging.error(f"Fetch error: {e}")
-                time.sleep(retry_delay)
-                retry_delay = min(retry_delay * 2, max_retry_delay)
+                except Exception as e:
+                    logging.error(f"Fetch error: {e}")
+                    refresher.reload_after(retry_delay)
+                    retry_delay = min(retry_delay * 2, max_retry_delay)
+        finally:
+            scheduler.shutdown()
 
 def get_segment_sequence(segment_uri: str) -> Optional[int]:
     """
@@ -618,6 +1108,68 @@ def get_segment_sequence(segment_uri: str) -> Optional[int]:
     except ValueError:
         return None
 
+def render_manifest(channel_id: str, segments: Dict[int, tuple], target_duration: float,
+                    manifest_version: int) -> bytes:
+    """
+    Build the playlist clients are served for a channel.
+    
+    Args:
+        channel_id: Channel the segment URIs point at
+        segments: Maps buffered sequence numbers to (duration, discontinuity)
+        target_duration: Upstream EXT-X-TARGETDURATION
+        manifest_version: Upstream EXT-X-VERSION
+        
+    Returns:
+        bytes: The manifest, starting at the latest discontinuity when the
+        window would otherwise span two sources
+    """
+    available = sorted(segments.keys())
+    max_seq = max(available)
+    # Find the first segment after any discontinuity
+    discontinuity_start = min(available)
+    for seq in available:
+        if segments[seq][1]:
+            discontinuity_start = seq
+            break
+    
+    # Calculate window bounds starting from discontinuity
+    if len(available) <= Config.INITIAL_SEGMENTS:
+        min_seq = discontinuity_start
+    else:
+        min_seq = max(
+            discontinuity_start,
+            max_seq - Config.WINDOW_SIZE + 1
+        )
+    
+    # Build manifest with proper tags
+    new_manifest = ['#EXTM3U']
+    new_manifest.append(f'#EXT-X-VERSION:{manifest_version}')
+    new_manifest.append(f'#EXT-X-MEDIA-SEQUENCE:{min_seq}')
+    new_manifest.append(f'#EXT-X-TARGETDURATION:{int(target_duration)}')
+    
+    # Filter segments within window
+    window_segments = [s for s in available if min_seq <= s <= max_seq]
+    
+    # Add segments with discontinuity handling
+    for seq in window_segments:
+        duration, discontinuity = segments[seq]
+        if discontinuity:
+            new_manifest.append('#EXT-X-DISCONTINUITY')
+        new_manifest.append(f'#EXTINF:{duration},')
+        new_manifest.append(f'/proxy/hls/segments/{channel_id}/{seq}.ts')
+    
+    logging.debug(f"Rendered manifest with segments {min_seq}-{max_seq} (window: {len(window_segments)})")
+    return '\n'.join(new_manifest).encode()
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    """Check an If-None-Match header against an ETag (weak comparison, as RFC 9110 requires)"""
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return etag in [tag[2:] if tag.startswith('W/') else tag for tag in tags]
+
 # Update verify_segment with more thorough checks
 def verify_segment(data: bytes) -> dict:
     """
@@ -631,6 +1183,7 @@ def verify_segment(data: bytes) -> dict:
             valid (bool): True if segment passes all checks
             packets (int): Number of valid packets found
             size (int): Total segment size in bytes
+            stats (TSStats): Continuity, null packet and PCR counters
             error (str): Description if validation fails
             
     Checks:
@@ -648,185 +1201,181 @@ def verify_segment(data: bytes) -> dict:
     if len(data) % 188 != 0:
         return {'valid': False, 'error': 'Invalid segment size'}
     
-    valid_packets = 0
-    total_packets = len(data) // 188
+    # Inspect all packets in segment in one pass
+    stats = inspect_packets(data)
     
-    # Scan all packets in segment
-    for i in range(0, len(data), 188):
-        packet = data[i:i+188]
+    # Verify sync byte
+    if stats.sync_errors:
+        return {'valid': False, 'error': f'Invalid sync byte at offset {stats.first_sync_error}'}
         
-        # Check packet completeness
-        if len(packet) != 188:
-            return {'valid': False, 'error': 'Incomplete packet'}
-            
-        # Verify sync byte
-        if packet[0] != 0x47:
-            return {'valid': False, 'error': f'Invalid sync byte at offset {i}'}
-            
-        # Check transport error indicator
-        if packet[1] & 0x80:
-            return {'valid': False, 'error': 'Transport error indicator set'}
-            
-        valid_packets += 1
+    # Check transport error indicator
+    if stats.transport_errors:
+        return {'valid': False, 'error': 'Transport error indicator set'}
     
     return {
         'valid': True,
-        'packets': valid_packets,
-        'size': len(data)
+        'packets': stats.packets,
+        'size': len(data),
+        'stats': stats
     }
 
-def fetch_stream(fetcher: StreamFetcher, stop_event: threading.Event, start_sequence: int = 0):
+class ProxyServer:
     """
-    Main streaming function that handles manifest updates and segment downloads.
+    Manages HLS proxy server instance.
     
-    Args:
-        fetcher: StreamFetcher instance to handle HTTP requests
-        stop_event: Threading event to signal when to stop fetching
-        start_sequence: Initial sequence number to start from
-        
-    The function implements the core HLS fetching logic:
-    - Fetches and parses manifest files
-    - Downloads new segments when they become available
-    - Handles stream switches with proper discontinuity marking
-    - Maintains buffer state and segment sequence numbering
+    Every worker runs its own ProxyServer. The worker that wins ownership of a
+    channel in Redis fetches it and stores segments there; all workers serve
+    manifests and segments from that shared store, and a worker takes over the
+    fetch if the owner's lock expires.
     """
-    # Remove global stream_manager reference
-    retry_delay = 1
-    max_retry_delay = 8
-    last_segment_time = 0
-    buffer_initialized = False
-    manifest_update_needed = True
-    segment_duration = None
-
-    while not stop_event.is_set():
-        try:
-            now = time.time()
-            
-            # Only update manifest when it's time for next segment
-            should_update = (
-                manifest_update_needed or 
-                not segment_duration or 
-                (last_segment_time and (now - last_segment_time) >= segment_duration * 0.8)
-            )
-            
-            if should_update:
-                manifest_data, final_url = fetcher.download(fetcher.stream_url)
-                manifest = m3u8.loads(manifest_data.decode())
-                
-                if not manifest.segments:
-                    continue
-                
-                with buffer_lock:
-                    manifest_content = manifest_data.decode()
-                    new_segments = {}
-                    
-                    if fetcher.manager.switching_stream:  # Use fetcher.manager instead of stream_manager
-                        # Stream switch - only get latest segment
-                        manifest_segments = [manifest.segments[-1]]
-                        seq_start = fetcher.manager.next_sequence
-                        max_segments = 1
-                        logging.debug(f"Processing stream switch - getting latest segment at sequence {seq_start}")
-                    elif not buffer_initialized:
-                        # Initial buffer
-                        manifest_segments = manifest.segments[-Config.INITIAL_SEGMENTS:]
-                        seq_start = fetcher.manager.next_sequence
-                        max_segments = Config.INITIAL_SEGMENTS
-                        logging.debug(f"Starting initial buffer at sequence {seq_start}")
-                    else:
-                        # Normal operation
-                        manifest_segments = [manifest.segments[-1]]
-                        seq_start = fetcher.manager.next_sequence
-                        max_segments = 1
-
-                    # Map segments
-                    segments_mapped = 0
-                    for segment in manifest_segments:
-                        if segments_mapped >= max_segments:
-                            break
-                            
-                        source_id = segment.uri.split('/')[-1].split('.')[0]
-                        next_seq = fetcher.manager.get_next_sequence(source_id)
-                        
-                        if next_seq is not None:
-                            duration = float(segment.duration)
-                            new_segments[next_seq] = {
-                                'uri': segment.uri,
-                                'duration': duration,
-                                'source_id': source_id
-                            }
-                            fetcher.manager.segment_durations[next_seq] = duration
-                            segments_mapped += 1
-                    
-                    manifest_buffer = manifest_content
-
-                # Download segments
-                for sequence_id, segment_info in new_segments.items():
-                    try:
-                        segment_url = f"{fetcher.last_host}{segment_info['uri']}"
-                        logging.debug(f"Downloading {segment_info['uri']} as segment {sequence_id}.ts "
-                                   f"(source: {segment_info['source_id']}, duration: {segment_info['duration']:.3f}s)")
-                        
-                        segment_data, _ = fetcher.download(segment_url)
-                        validation = verify_segment(segment_data)
-                        
-                        if validation.get('valid', False):
-                            with buffer_lock:
-                                segment_buffers[sequence_id] = segment_data
-                                logging.debug(f"Downloaded and verified segment {sequence_id} (packets: {validation['packets']})")
-                                
-                                if fetcher.manager.switching_stream:
-                                    fetcher.manager.switching_stream = False
-                                    stop_event.set()  # Force fetcher restart with new URL
-                                    break
-                                elif not buffer_initialized and len(segment_buffers) >= Config.INITIAL_SEGMENTS:
-                                    buffer_initialized = True
-                                    manifest_update_needed = True
-                                    break
-                    except Exception as e:
-                        logging.error(f"Segment download error: {e}")
-                        continue
-
-            else:
-                # Short sleep to prevent CPU spinning
-                threading.Event().wait(0.1)
-
-        except Exception as e:
-            logging.error(f"Manifest error: {e}")
-            threading.Event().wait(retry_delay)
-            retry_delay = min(retry_delay * 2, max_retry_delay)
-            manifest_update_needed = True
-
-class ProxyServer:
-    """Manages HLS proxy server instance"""
     
-    def __init__(self, user_agent: Optional[str] = None):
+    def __init__(self, user_agent: Optional[str] = None, redis_client=None):
         self.stream_managers: Dict[str, StreamManager] = {}
         self.stream_buffers: Dict[str, StreamBuffer] = {}
         self.client_managers: Dict[str, ClientManager] = {}
         self.fetch_threads: Dict[str, threading.Thread] = {}
         self.user_agent: str = user_agent or Config.DEFAULT_USER_AGENT
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+        self.redis_client = redis_client
+        if self.redis_client is None:
+            try:
+                from core.utils import RedisClient
+                self.redis_client = RedisClient.get_client()
+            except Exception as e:
+                logging.error(f"Failed to initialize Redis, channels will only be served by this worker: {e}")
+                self.redis_client = None
+
+    def get_channel_owner(self, channel_id: str) -> Optional[str]:
+        """Get the worker ID that fetches this channel"""
+        if not self.redis_client:
+            return None
+
+        try:
+            return channel_ownership.owner(self.redis_client, RedisKeys.channel_owner(channel_id))
+        except Exception as e:
+            logging.error(f"Error getting channel owner: {e}")
+            return None
+
+    def am_i_owner(self, channel_id: str) -> bool:
+        """Check if this worker fetches the channel"""
+        if not self.redis_client:
+            return channel_id in self.stream_managers
+        return self.get_channel_owner(channel_id) == self.worker_id
 
-    def initialize_channel(self, url: str, channel_id: str) -> None:
+    def try_acquire_ownership(self, channel_id: str, ttl: int = Config.OWNERSHIP_TTL) -> bool:
+        """Try to become the worker that fetches this channel"""
+        if not self.redis_client:
+            return True  # If no Redis, always become owner
+
+        try:
+            lock_key = RedisKeys.channel_owner(channel_id)
+            if channel_ownership.claim(self.redis_client, lock_key, self.worker_id, ttl):
+                logging.info(f"Worker {self.worker_id} acquired ownership of channel {channel_id}")
+                return True
+
+            # Already ours (e.g. re-initialized) - refresh the lease
+            return self.extend_ownership(channel_id, ttl)
+        except Exception as e:
+            logging.error(f"Error acquiring channel ownership: {e}")
+            return False
+
+    def extend_ownership(self, channel_id: str, ttl: int = Config.OWNERSHIP_TTL) -> bool:
+        """Extend the ownership lease, and the channel's metadata with it"""
+        if not self.redis_client:
+            return True
+
+        try:
+            if not channel_ownership.renew(self.redis_client, RedisKeys.channel_owner(channel_id), self.worker_id, ttl):
+                return False
+            self.redis_client.expire(RedisKeys.channel_metadata(channel_id), Config.SEGMENT_TTL)
+            return True
+        except Exception as e:
+            logging.error(f"Error extending ownership: {e}")
+            return False
+
+    def release_ownership(self, channel_id: str):
+        """Release ownership of this channel if this worker holds it"""
+        if not self.redis_client:
+            return
+
+        try:
+            if channel_ownership.release(self.redis_client, RedisKeys.channel_owner(channel_id), self.worker_id):
+                logging.info(f"Released ownership of channel {channel_id}")
+        except Exception as e:
+            logging.error(f"Error releasing channel ownership: {e}")
+
+    def _get_metadata(self, channel_id: str) -> Dict[str, str]:
+        if not self.redis_client:
+            return {}
+
+        try:
+            metadata = self.redis_client.hgetall(RedisKeys.channel_metadata(channel_id))
+            return {k.decode('utf-8'): v.decode('utf-8') for k, v in metadata.items()}
+        except Exception as e:
+            logging.error(f"Error reading metadata for channel {channel_id}: {e}")
+            return {}
+
+    def _update_metadata(self, channel_id: str, fields: dict):
+        if not self.redis_client:
+            return
+
+        try:
+            metadata_key = RedisKeys.channel_metadata(channel_id)
+            self.redis_client.hset(metadata_key, mapping=fields)
+            self.redis_client.expire(metadata_key, Config.SEGMENT_TTL)
+        except Exception as e:
+            logging.error(f"Error updating metadata for channel {channel_id}: {e}")
+
+    def initialize_channel(self, url: str, channel_id: str, user_agent: Optional[str] = None) -> None:
         """Initialize a new channel stream"""
         if channel_id in self.stream_managers:
             self.stop_channel(channel_id)
-            
-        self.stream_managers[channel_id] = StreamManager(
+
+        user_agent = user_agent or self.user_agent
+        self._update_metadata(channel_id, {
+            ChannelMetadataField.URL: url,
+            ChannelMetadataField.USER_AGENT: user_agent,
+            ChannelMetadataField.INIT_TIME: time.time(),
+        })
+
+        if self.try_acquire_ownership(channel_id):
+            self._start_fetching(channel_id, url, user_agent)
+            logging.info(f"Initialized channel {channel_id} with URL {url}")
+        else:
+            # The owner sees the URL in the metadata and switches to it
+            self._add_channel_view(channel_id)
+            logging.info(f"Channel {channel_id} is fetched by worker {self.get_channel_owner(channel_id)}, "
+                         f"serving it from Redis")
+
+    def _start_fetching(self, channel_id: str, url: str, user_agent: str) -> None:
+        """Start fetching a channel on this worker (which must own it)"""
+        manager = StreamManager(
             url, 
             channel_id,
-            user_agent=self.user_agent
+            user_agent=user_agent,
+            redis_client=self.redis_client
         )
-        self.stream_buffers[channel_id] = StreamBuffer()
-        self.client_managers[channel_id] = ClientManager()
+        buffer = StreamBuffer(channel_id, redis_client=self.redis_client)
+        client_manager = ClientManager(channel_id, redis_client=self.redis_client)
+
+        # Continue numbering after segments a previous owner stored
+        existing = buffer.keys()
+        if existing:
+            manager.next_sequence = max(existing) + 1
+            manager.source_changes.add(manager.next_sequence)
+            buffer.info.update(buffer.segment_info(existing))
+
+        self.stream_managers[channel_id] = manager
+        self.stream_buffers[channel_id] = buffer
+        self.client_managers[channel_id] = client_manager
+        self._update_metadata(channel_id, {ChannelMetadataField.OWNER: self.worker_id})
         
         # Set up cleanup references
-        self.stream_managers[channel_id].client_manager = self.client_managers[channel_id]
-        self.stream_managers[channel_id].proxy_server = self
+        manager.client_manager = client_manager
+        manager.proxy_server = self
         
-        fetcher = StreamFetcher(
-            self.stream_managers[channel_id], 
-            self.stream_buffers[channel_id]
-        )
+        fetcher = StreamFetcher(manager, buffer)
         
         self.fetch_threads[channel_id] = threading.Thread(
             target=fetcher.fetch_loop,
@@ -836,8 +1385,59 @@ class ProxyServer:
         self.fetch_threads[channel_id].start()
         
         # Start cleanup monitoring
-        self.stream_managers[channel_id].start_cleanup_thread()
-        logging.info(f"Initialized channel {channel_id} with URL {url}")
+        manager.start_cleanup_thread()
+
+    def _add_channel_view(self, channel_id: str) -> None:
+        """Serve a channel another worker fetches"""
+        if channel_id not in self.stream_buffers:
+            self.stream_buffers[channel_id] = StreamBuffer(channel_id, redis_client=self.redis_client)
+            self.client_managers[channel_id] = ClientManager(channel_id, redis_client=self.redis_client)
+
+    def has_channel(self, channel_id: str) -> bool:
+        """Check if a channel is running on any worker"""
+        return self.lookup_channel(channel_id) is not None
+
+    def lookup_channel(self, channel_id: str) -> Optional[Dict[str, str]]:
+        """
+        Find a running channel, reading its shared state in one round trip.
+        
+        Non-owner workers get a local view of the shared segment store, and take
+        over fetching if the owner's lock expired while clients still watch.
+        
+        Returns:
+            dict: The channel's metadata (empty on the owner, which has it
+            locally), or None if the channel isn't running
+        """
+        if channel_id in self.stream_managers:
+            return {}
+        if not self.redis_client:
+            return None
+
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.hgetall(RedisKeys.channel_metadata(channel_id))
+            pipe.get(RedisKeys.channel_owner(channel_id))
+            raw_metadata, owner = pipe.execute()
+        except Exception as e:
+            logging.error(f"Error reading state for channel {channel_id}: {e}")
+            return None
+
+        metadata = {k.decode('utf-8'): v.decode('utf-8') for k, v in raw_metadata.items()}
+        if ChannelMetadataField.URL not in metadata:
+            # Stopped or never started - drop any stale view
+            self.stream_buffers.pop(channel_id, None)
+            self.client_managers.pop(channel_id, None)
+            return None
+
+        self._add_channel_view(channel_id)
+        if not owner and self.try_acquire_ownership(channel_id):
+            logging.info(f"Owner of channel {channel_id} is gone, worker {self.worker_id} taking over")
+            self._start_fetching(
+                channel_id,
+                metadata[ChannelMetadataField.URL],
+                metadata.get(ChannelMetadataField.USER_AGENT) or self.user_agent
+            )
+        return metadata
 
     def stop_channel(self, channel_id: str) -> None:
         """Stop and cleanup a channel"""
@@ -855,8 +1455,23 @@ class ProxyServer:
             except Exception as e:
                 logging.error(f"Error stopping channel {channel_id}: {e}")
             finally:
+                if self.am_i_owner(channel_id):
+                    self._remove_shared_state(channel_id)
                 self._cleanup_channel(channel_id)
 
+    def _remove_shared_state(self, channel_id: str) -> None:
+        """Delete a stopped channel's segments and metadata so other workers stop serving it"""
+        self.stream_buffers[channel_id].clear()
+        if self.redis_client:
+            try:
+                self.redis_client.delete(
+                    RedisKeys.channel_metadata(channel_id),
+                    RedisKeys.clients(channel_id)
+                )
+            except Exception as e:
+                logging.error(f"Error removing state for channel {channel_id}: {e}")
+        self.release_ownership(channel_id)
+
     def _cleanup_channel(self, channel_id: str) -> None:
         """Remove channel resources"""
         for collection in [self.stream_managers, self.stream_buffers, 
@@ -872,141 +1487,131 @@ class ProxyServer:
     def _setup_routes(self) -> None:
         pass
 
+    def _wait_for_buffer(self, channel_id: str, metadata: Optional[Dict[str, str]] = None) -> bool:
+        """Wait for the owner to fill the initial buffer, skipping Redis if metadata already says so"""
+        manager = self.stream_managers.get(channel_id)
+        if manager:
+            return manager.buffer_ready.wait(Config.BUFFER_READY_TIMEOUT)
+        if metadata and metadata.get(ChannelMetadataField.BUFFER_READY):
+            return True
+
+        deadline = time.time() + Config.BUFFER_READY_TIMEOUT
+        while time.time() < deadline:
+            metadata = self._get_metadata(channel_id)
+            if not metadata:
+                return False
+            if metadata.get(ChannelMetadataField.BUFFER_READY):
+                return True
+            time.sleep(0.2)
+        return False
+
     # Update methods to return data instead of Flask Response objects
-    def stream_endpoint(self, channel_id: str):
-        if channel_id not in self.stream_managers:
-            return 'Channel not found', 404
+    def stream_endpoint(self, channel_id: str, client_ip: Optional[str] = None,
+                        if_none_match: Optional[str] = None):
+        """
+        Serve a channel's manifest.
+        
+        The fetcher renders the manifest whenever its segments change, so a
+        request only looks up the latest version. The channel is looked up
+        once per request and its metadata reused, which keeps a poll on a
+        non-owner worker to three Redis round trips: channel state, client
+        activity and the manifest.
+        
+        Args:
+            channel_id: Unique identifier for the channel
+            client_ip: Address of the requesting client, for activity tracking
+            if_none_match: The client's If-None-Match header, if any
             
-        manager = self.stream_managers[channel_id]
+        Returns:
+            tuple: (content, status, ETag); 304 with empty content if the client's copy is current
+        """
+        metadata = self.lookup_channel(channel_id)
+        if metadata is None:
+            return 'Channel not found', 404, None
         
         # Wait for initial buffer
-        if not manager.buffer_ready.wait(Config.BUFFER_READY_TIMEOUT):
+        if not self._wait_for_buffer(channel_id, metadata):
             logging.error(f"Timeout waiting for initial buffer for channel {channel_id}")
-            return 'Initial buffer not ready', 503
+            return 'Initial buffer not ready', 503, None
         
         try:
-            if (channel_id not in self.stream_managers) or (not self.stream_managers[channel_id].running):
-                return 'Channel not found', 404
-            
-            manager = self.stream_managers[channel_id]
-            buffer = self.stream_buffers[channel_id]
+            if channel_id not in self.stream_buffers:
+                # Stopped while we waited
+                return 'Channel not found', 404, None
             
             # Record client activity and enable cleanup
-            client_ip = request.remote_addr
-            manager.enable_cleanup()
-            self.client_managers[channel_id].record_activity(client_ip)
+            manager = self.stream_managers.get(channel_id)
+            if manager:
+                manager.enable_cleanup()
+            if client_ip:
+                self.client_managers[channel_id].record_activity(client_ip)
             
             # Wait for first segment with timeout
+            buffer = self.stream_buffers[channel_id]
             start_time = time.time()
             while True:
-                with buffer.lock:
-                    available = sorted(buffer.keys())
-                    if available:
-                        break
+                manifest, etag = buffer.get_manifest()
+                if manifest:
+                    break
                     
                 if time.time() - start_time > Config.FIRST_SEGMENT_TIMEOUT:
                     logging.warning(f"Timeout waiting for first segment for channel {channel_id}")
-                    return 'No segments available', 503
+                    return 'No segments available', 503, None
                     
                 time.sleep(0.1)  # Short sleep to prevent CPU spinning
             
-            # Rest of manifest generation code...
-            with buffer.lock:
-                max_seq = max(available)
-                # Find the first segment after any discontinuity
-                discontinuity_start = min(available)
-                for seq in available:
-                    if seq in manager.source_changes:
-                        discontinuity_start = seq
-                        break
-                
-                # Calculate window bounds starting from discontinuity
-                if len(available) <= Config.INITIAL_SEGMENTS:
-                    min_seq = discontinuity_start
-                else:
-                    min_seq = max(
-                        discontinuity_start,
-                        max_seq - Config.WINDOW_SIZE + 1
-                    )
-                
-                # Build manifest with proper tags
-                new_manifest = ['#EXTM3U']
-                new_manifest.append(f'#EXT-X-VERSION:{manager.manifest_version}')
-                new_manifest.append(f'#EXT-X-MEDIA-SEQUENCE:{min_seq}')
-                new_manifest.append(f'#EXT-X-TARGETDURATION:{int(manager.target_duration)}')
-                
-                # Filter segments within window
-                window_segments = [s for s in available if min_seq <= s <= max_seq]
-                
-                # Add segments with discontinuity handling
-                for seq in window_segments:
-                    if seq in manager.source_changes:
-                        new_manifest.append('#EXT-X-DISCONTINUITY')
-                        logging.debug(f"Added discontinuity marker before segment {seq}")
-                    
-                    duration = manager.segment_durations.get(seq, 10.0)
-                    new_manifest.append(f'#EXTINF:{duration},')
-                    new_manifest.append(f'/stream/{channel_id}/segments/{seq}.ts')
-                
-                manifest_content = '\n'.join(new_manifest)
-                logging.debug(f"Serving manifest with segments {min_seq}-{max_seq} (window: {len(window_segments)})")
-                return manifest_content, 200  # Return content and status code
+            if etag_matches(if_none_match, etag):
+                return '', 304, etag
+            return manifest, 200, etag
         except ConnectionAbortedError:
             logging.debug("Client disconnected")
-            return '', 499
+            return '', 499, None
         except Exception as e:
             logging.error(f"Stream endpoint error: {e}")
-            return '', 500
+            return '', 500, None
 
-    def get_segment(self, channel_id: str, segment_name: str):
+    def get_segment(self, channel_id: str, segment_name: str, client_ip: Optional[str] = None):
         """
         Serve individual MPEG-TS segments to clients.
         
         Args:
             channel_id: Unique identifier for the channel
             segment_name: Segment filename (e.g., '123.ts')
+            client_ip: Address of the requesting client, for activity tracking
             
         Returns:
-            Flask Response:
-                - MPEG-TS segment data with video/MP2T content type
-                - 404 if segment or channel not found
+            tuple: (segment data, 200), or ('', 404) if segment or channel not found
                 
         Error Handling:
             - Logs warning if segment not found
             - Logs error on unexpected exceptions
             - Returns 404 on any error
         """
-        if channel_id not in self.stream_managers:
+        if channel_id not in self.stream_buffers and not self.has_channel(channel_id):
             return 'Channel not found', 404
             
         try:
             # Record client activity
-            client_ip = request.remote_addr
-            self.client_managers[channel_id].record_activity(client_ip)
+            if client_ip:
+                self.client_managers[channel_id].record_activity(client_ip)
             
             segment_id = int(segment_name.split('.')[0])
-            buffer = self.stream_buffers[channel_id]
-            
-            with buffer_lock:
-                if segment_id in buffer:
-                    return buffer[segment_id], 200  # Return content and status code
+            data = self.stream_buffers[channel_id].get(segment_id)
+            if data is not None:
+                return data, 200  # Return content and status code
                     
             logging.warning(f"Segment {segment_id} not found for channel {channel_id}")
         except Exception as e:
             logging.error(f"Error serving segment {segment_name}: {e}")
         return '', 404
 
-    def change_stream(self, channel_id: str):
+    def change_stream(self, channel_id: str, new_url: Optional[str]):
         """
-        Handle stream URL changes via POST request.
+        Switch a channel to a new stream URL.
         
         Args:
             channel_id: Channel to modify
-            
-        Expected JSON body:
-            {
-                "url": "new_stream_url"
-            }
+            new_url: Stream URL to switch to
             
         Returns:
             JSON response with:
@@ -1017,19 +1622,27 @@ class ProxyServer:
             - HTTP 400 if URL missing from request
             
         Side effects:
-            - Updates stream manager URL
+            - Updates stream manager URL, or the shared metadata the owner
+              worker picks the switch up from
             - Triggers stream switch sequence
             - Maintains segment numbering
         """
-        if channel_id not in self.stream_managers:
+        metadata = self.lookup_channel(channel_id)
+        if metadata is None:
             return {'error': 'Channel not found'}, 404
             
-        new_url = request.json.get('url')
         if not new_url:
             return {'error': 'No URL provided'}, 400
             
-        manager = self.stream_managers[channel_id]
-        if manager.update_url(new_url):
+        manager = self.stream_managers.get(channel_id)
+        if manager:
+            changed = manager.update_url(new_url)
+        else:
+            changed = metadata.get(ChannelMetadataField.URL) != new_url
+            if changed:
+                self._update_metadata(channel_id, {ChannelMetadataField.URL: new_url})
+
+        if changed:
             return {
                 'message': 'Stream URL updated',
                 'channel': channel_id,
@@ -1,7 +1,7 @@
 import json
 import threading
 import logging
-from django.http import StreamingHttpResponse, JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from .server import ProxyServer, Config
@@ -13,33 +13,41 @@ proxy_server = ProxyServer()
 @require_http_methods(["GET"])
 def stream_endpoint(request, channel_id):
     """Handle HLS manifest requests"""
-    if channel_id not in proxy_server.stream_managers:
+    content, status, etag = proxy_server.stream_endpoint(
+        channel_id,
+        request.META.get('REMOTE_ADDR'),
+        request.META.get('HTTP_IF_NONE_MATCH')
+    )
+    if status == 404:
         return JsonResponse({'error': 'Channel not found'}, status=404)
     
-    response = proxy_server.stream_endpoint(channel_id)
-    return StreamingHttpResponse(
-        response[0],
+    response = HttpResponse(
+        content,
         content_type='application/vnd.apple.mpegurl',
-        status=response[1]
+        status=status
     )
+    if etag:
+        response['ETag'] = etag
+    return response
 
 @csrf_exempt
 @require_http_methods(["GET"])
 def get_segment(request, segment_name):
     """Serve MPEG-TS segments"""
     try:
-        segment_num = int(segment_name.split('.')[0])
-        buffer = proxy_server.stream_buffers.get(segment_num)
-        
-        if not buffer:
+        # Manifests link segments as <channel_id>/<sequence>.ts
+        channel_id, _, segment_file = segment_name.rpartition('/')
+        if not channel_id or not segment_file.split('.')[0].isdigit():
+            return JsonResponse({'error': 'Invalid segment name'}, status=400)
+
+        data, status = proxy_server.get_segment(channel_id, segment_file, request.META.get('REMOTE_ADDR'))
+        if status != 200:
             return JsonResponse({'error': 'Segment not found'}, status=404)
             
-        return StreamingHttpResponse(
-            buffer,
+        return HttpResponse(
+            data,
             content_type='video/MP2T'
         )
-    except ValueError:
-        return JsonResponse({'error': 'Invalid segment name'}, status=400)
     except Exception as e:
         logger.error(f"Error serving segment: {e}")
         return JsonResponse({'error': str(e)}, status=500)
@@ -49,27 +57,9 @@ def get_segment(request, segment_name):
 def change_stream(request, channel_id):
     """Change stream URL for existing channel"""
     try:
-        if channel_id not in proxy_server.stream_managers:
-            return JsonResponse({'error': 'Channel not found'}, status=404)
-            
         data = json.loads(request.body)
-        new_url = data.get('url')
-        if not new_url:
-            return JsonResponse({'error': 'No URL provided'}, status=400)
-            
-        manager = proxy_server.stream_managers[channel_id]
-        if manager.update_url(new_url):
-            return JsonResponse({
-                'message': 'Stream URL updated',
-                'channel': channel_id,
-                'url': new_url
-            })
-            
-        return JsonResponse({
-            'message': 'URL unchanged',
-            'channel': channel_id,
-            'url': new_url
-        })
+        result, status = proxy_server.change_stream(channel_id, data.get('url'))
+        return JsonResponse(result, status=status)
     except json.JSONDecodeError:
         return JsonResponse({'error': 'Invalid JSON'}, status=400)
     except Exception as e:
@@ -5,38 +5,23 @@ from asgiref.sync import async_to_sync
 import redis
 import json
 import logging
-import re
 from core.utils import RedisClient
 from apps.proxy.ts_proxy.channel_status import ChannelStatus
+from apps.proxy.ts_proxy.channel_registry import ChannelRegistry
+from apps.proxy.ts_proxy.config_helper import ConfigHelper
 
 logger = logging.getLogger(__name__)
 
-# Store the last known value to compare with new data
-last_known_data = {}
-
 @shared_task
 def fetch_channel_stats():
     redis_client = RedisClient.get_client()
 
     try:
-        # Basic info for all channels
-        channel_pattern = "ts_proxy:channel:*:metadata"
-        all_channels = []
-
-        # Extract channel IDs from keys
-        cursor = 0
-        while True:
-            cursor, keys = redis_client.scan(cursor, match=channel_pattern)
-            for key in keys:
-                channel_id_match = re.search(r"ts_proxy:channel:(.*):metadata", key.decode('utf-8'))
-                if channel_id_match:
-                    ch_id = channel_id_match.group(1)
-                    channel_info = ChannelStatus.get_basic_channel_info(ch_id)
-                    if channel_info:
-                        all_channels.append(channel_info)
+        # Basic info for all channels in the active channel registry
+        all_channels = ChannelStatus.get_basic_channel_info_bulk(ChannelRegistry.get_channel_ids(redis_client))
 
-            if cursor == 0:
-                break
+        # Send only what changed since the last update, with periodic full snapshots
+        stats = ChannelStatus.build_stats_update(all_channels, redis_client, ConfigHelper.stats_full_snapshot_interval())
 
     except Exception as e:
         logger.error(f"Error in channel_status: {e}", exc_info=True)
@@ -48,6 +33,6 @@ def fetch_channel_stats():
         "updates",
         {
             "type": "update",
-            "data": {"success": True, "type": "channel_stats", "stats": json.dumps({'channels': all_channels, 'count': len(all_channels)})}
+            "data": {"success": True, "type": "channel_stats", "stats": json.dumps(stats)}
         },
     )
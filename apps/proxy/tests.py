@@ -0,0 +1,274 @@
+from types import SimpleNamespace
+
+import m3u8
+from django.test import SimpleTestCase
+
+from apps.proxy.hls_proxy.server import SegmentScheduler, StreamFetcher
+from apps.proxy.ts_inspection import NULL_PID, PCR_CLOCK_HZ, TSInspector, inspect_packets
+
+
+def make_playlist(first, count, numbered=True, duration=6.0, prefix="seg"):
+    """Build a live playlist of count segments starting at media sequence first"""
+    lines = ["#EXTM3U", "#EXT-X-VERSION:3", f"#EXT-X-TARGETDURATION:{int(duration)}"]
+    if numbered:
+        lines.append(f"#EXT-X-MEDIA-SEQUENCE:{first}")
+    for number in range(first, first + count):
+        lines.append(f"#EXTINF:{duration},")
+        lines.append(f"{prefix}{number}.ts")
+    text = "\n".join(lines) + "\n"
+    return m3u8.loads(text), text
+
+
+def ts_packet(pid, cc, payload=True, discontinuity=False, pcr=None):
+    """Build one 188-byte TS packet, with an adaptation field if it needs one"""
+    adaptation = b''
+    if discontinuity or pcr is not None:
+        flags = (0x80 if discontinuity else 0) | (0x10 if pcr is not None else 0)
+        field = bytes([flags])
+        if pcr is not None:
+            base, extension = divmod(pcr, 300)
+            field += ((base << 15) | 0x7E00 | extension).to_bytes(6, 'big')
+        adaptation = bytes([len(field)]) + field
+    control = (0x20 if adaptation else 0) | (0x10 if payload else 0)
+    header = bytes([0x47, (pid >> 8) & 0x1F, pid & 0xFF, control | (cc & 0x0F)])
+    return (header + adaptation).ljust(188, b'\xff')
+
+
+def ts_stream(counters, pid=0x100, other_pid=0x101, other_every=4):
+    """Packets on pid with the given counters, plus a clean secondary PID and null packets"""
+    packets = []
+    for i, cc in enumerate(counters):
+        packets.append(ts_packet(pid, cc))
+        if i % other_every == 0:
+            packets.append(ts_packet(other_pid, i // other_every))
+            packets.append(ts_packet(NULL_PID, 0))
+    return b''.join(packets)
+
+
+class SegmentSchedulerPendingTest(SimpleTestCase):
+    url = "http://upstream.example/live.m3u8"
+
+    def setUp(self):
+        fetcher = SimpleNamespace(manager=SimpleNamespace(channel_id="test"))
+        self.scheduler = SegmentScheduler(fetcher, max_workers=1)
+
+    def tearDown(self):
+        self.scheduler.shutdown()
+
+    def pending(self, manifest, text, initial=False, url=None):
+        return self.scheduler.pending_segments(url or self.url, manifest, text, initial)
+
+    def fetch(self, pending):
+        for key, _ in pending:
+            self.scheduler._mark_fetched(key)
+
+    def keys(self, pending):
+        return [key for key, _ in pending]
+
+    def test_initial_load_starts_at_live_edge(self):
+        manifest, text = make_playlist(100, 10, duration=6.0)
+        # 25s of initial buffer at 6s per segment
+        self.assertEqual(self.keys(self.pending(manifest, text, initial=True)), [105, 106, 107, 108, 109])
+
+    def test_first_load_after_initial_takes_newest_segment(self):
+        manifest, text = make_playlist(100, 10)
+        self.assertEqual(self.keys(self.pending(manifest, text)), [109])
+
+    def test_overlapping_playlist_returns_only_new_segments(self):
+        manifest, text = make_playlist(100, 5)
+        self.fetch(self.pending(manifest, text, initial=True))
+
+        manifest, text = make_playlist(102, 5)
+        self.assertEqual(self.keys(self.pending(manifest, text)), [105, 106])
+
+    def test_unchanged_playlist_returns_nothing(self):
+        manifest, text = make_playlist(100, 5)
+        self.fetch(self.pending(manifest, text, initial=True))
+        self.assertEqual(self.pending(manifest, text), [])
+
+    def test_uri_keyed_without_media_sequence(self):
+        manifest, text = make_playlist(100, 5, numbered=False)
+        pending = self.pending(manifest, text, initial=True)
+        self.assertEqual(self.keys(pending), [f"seg{n}.ts" for n in range(100, 105)])
+        self.fetch(pending)
+        self.assertIsNone(self.scheduler.last_media_sequence)
+
+        manifest, text = make_playlist(103, 5, numbered=False)
+        self.assertEqual(self.keys(self.pending(manifest, text)), ["seg105.ts", "seg106.ts", "seg107.ts"])
+
+    def test_fell_behind_with_contiguous_numbering_keeps_every_segment(self):
+        manifest, text = make_playlist(100, 5)
+        self.fetch(self.pending(manifest, text, initial=True))
+
+        # The playlist moved on a whole window, but starts right after our last segment
+        manifest, text = make_playlist(105, 5)
+        self.assertEqual(self.keys(self.pending(manifest, text)), [105, 106, 107, 108, 109])
+
+    def test_gap_in_numbering_resumes_at_live_edge(self):
+        manifest, text = make_playlist(100, 5)
+        self.fetch(self.pending(manifest, text, initial=True))
+
+        manifest, text = make_playlist(200, 5)
+        self.assertEqual(self.keys(self.pending(manifest, text)), [204])
+        self.assertEqual(len(self.scheduler.fetched), 0)
+
+    def test_upstream_renumbering_resumes_at_live_edge(self):
+        manifest, text = make_playlist(100, 5)
+        self.fetch(self.pending(manifest, text, initial=True))
+
+        # Sequence numbers went backwards after an encoder restart
+        manifest, text = make_playlist(0, 5, prefix="restart")
+        self.assertEqual(self.keys(self.pending(manifest, text)), [4])
+
+    def test_uri_keyed_without_overlap_resumes_at_live_edge(self):
+        manifest, text = make_playlist(100, 5, numbered=False)
+        self.fetch(self.pending(manifest, text, initial=True))
+
+        manifest, text = make_playlist(105, 5, numbered=False)
+        self.assertEqual(self.keys(self.pending(manifest, text)), ["seg109.ts"])
+
+    def test_url_change_resets_tracking(self):
+        manifest, text = make_playlist(100, 5)
+        self.fetch(self.pending(manifest, text, initial=True))
+
+        # Same numbers on the new URL are new segments, starting at its live edge
+        pending = self.pending(manifest, text, initial=True, url="http://other.example/live.m3u8")
+        self.assertEqual(self.keys(pending), [100, 101, 102, 103, 104])
+
+    def test_reset_forgets_fetched_segments(self):
+        manifest, text = make_playlist(100, 5)
+        self.fetch(self.pending(manifest, text, initial=True))
+        self.scheduler.reset()
+
+        self.assertIsNone(self.scheduler.last_media_sequence)
+        self.assertEqual(self.keys(self.pending(manifest, text)), [104])
+
+
+class StreamFetcherRedirectCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.requested = []
+        manager = SimpleNamespace(current_url="http://origin.example/live.m3u8", user_agent="test")
+        self.fetcher = StreamFetcher(manager, buffer=None)
+        self.fetcher.min_request_interval = 0
+        self.fetcher.upstream_pool = SimpleNamespace(get=self.fake_get)
+
+    def fake_get(self, url, allow_redirects=False, **kwargs):
+        self.requested.append(url)
+        history = []
+        if allow_redirects and url.startswith("http://origin.example/"):
+            history = [SimpleNamespace(url=url)]
+            url = url.replace("http://origin.example/", "http://edge.example/")
+        return SimpleNamespace(status_code=200, url=url, history=history)
+
+    def test_split_hls_params(self):
+        url, params = StreamFetcher.split_hls_params("http://h/live.m3u8?token=a&_HLS_msn=7&_HLS_part=2")
+        self.assertEqual(url, "http://h/live.m3u8?token=a")
+        self.assertEqual(params, [("_HLS_msn", "7"), ("_HLS_part", "2")])
+        self.assertEqual(StreamFetcher.split_hls_params("http://h/live.m3u8"), ("http://h/live.m3u8", []))
+
+    def test_blocking_reloads_share_one_redirect_entry(self):
+        for msn in range(100, 110):
+            self.fetcher.request(f"http://origin.example/live.m3u8?token=a&_HLS_msn={msn}")
+
+        self.assertEqual(self.fetcher.redirect_cache,
+                         {"http://origin.example/live.m3u8?token=a": "http://edge.example/live.m3u8?token=a"})
+        # Only the first reload followed the redirect, the rest went straight to the target
+        self.assertEqual(self.requested[-1], "http://edge.example/live.m3u8?token=a&_HLS_msn=109")
+        self.assertEqual(sum(url.startswith("http://origin.example/") for url in self.requested), 1)
+
+
+class TSInspectorTest(SimpleTestCase):
+    def test_clean_stream(self):
+        stats = inspect_packets(ts_stream(range(40)))
+        self.assertEqual(stats.packets, 60)
+        self.assertEqual(stats.null_packets, 10)
+        self.assertEqual(stats.cc_errors, 0)
+        self.assertEqual(stats.sync_errors, 0)
+        self.assertEqual(stats.transport_errors, 0)
+
+    def test_gap_on_main_pid(self):
+        counters = list(range(40))
+        del counters[10]
+        self.assertEqual(inspect_packets(ts_stream(counters)).cc_errors, 1)
+
+    def test_single_corrupted_counter_counts_once(self):
+        counters = list(range(40))
+        counters[10] = 3
+        self.assertEqual(inspect_packets(ts_stream(counters)).cc_errors, 1)
+
+    def test_separate_gaps_each_count(self):
+        counters = list(range(10)) + list(range(12, 20)) + list(range(25, 40))
+        self.assertEqual(inspect_packets(ts_stream(counters)).cc_errors, 2)
+
+    def test_gap_on_secondary_pid(self):
+        packets = [ts_packet(0x100, cc) for cc in range(40)]
+        packets[5:5] = [ts_packet(0x101, cc) for cc in (0, 1, 2, 4, 5)]
+        self.assertEqual(inspect_packets(b''.join(packets)).cc_errors, 1)
+
+    def test_duplicate_packets_are_legal(self):
+        counters = list(range(20))
+        counters.insert(8, 7)
+        self.assertEqual(inspect_packets(ts_stream(counters)).cc_errors, 0)
+
+    def test_discontinuity_indicator_allows_jump(self):
+        packets = [ts_packet(0x100, cc) for cc in range(20)]
+        packets[10] = ts_packet(0x100, 3, discontinuity=True)
+        packets[11:] = [ts_packet(0x100, cc) for cc in range(4, 13)]
+        self.assertEqual(inspect_packets(b''.join(packets)).cc_errors, 0)
+
+    def test_packets_without_payload_keep_the_counter(self):
+        packets = [ts_packet(0x100, cc) for cc in range(20)]
+        packets.insert(5, ts_packet(0x100, 4, payload=False))
+        self.assertEqual(inspect_packets(b''.join(packets)).cc_errors, 0)
+
+    def test_gap_across_chunk_boundary(self):
+        inspector = TSInspector()
+        first = b''.join(ts_packet(0x100, cc) for cc in range(20))
+        second = b''.join(ts_packet(0x100, cc) for cc in range(21, 40))
+        self.assertEqual(inspector.inspect(first).cc_errors, 0)
+        self.assertEqual(inspector.inspect(second).cc_errors, 1)
+        self.assertEqual(inspector.totals.cc_errors, 1)
+
+    def test_clean_continuation_across_chunk_boundary(self):
+        inspector = TSInspector()
+        inspector.inspect(b''.join(ts_packet(0x100, cc) for cc in range(20)))
+        self.assertEqual(inspector.inspect(b''.join(ts_packet(0x100, cc) for cc in range(20, 40))).cc_errors, 0)
+
+    def test_corrupted_counter_at_chunk_boundary_counts_once(self):
+        inspector = TSInspector()
+        first = b''.join(ts_packet(0x100, cc) for cc in list(range(19)) + [9])
+        second = b''.join(ts_packet(0x100, cc) for cc in range(20, 40))
+        self.assertEqual(inspector.inspect(first).cc_errors + inspector.inspect(second).cc_errors, 1)
+
+    def test_sync_and_transport_errors(self):
+        packets = [bytearray(ts_packet(0x100, cc)) for cc in range(10)]
+        packets[3][0] = 0x00
+        packets[6][1] |= 0x80
+        stats = inspect_packets(b''.join(packets))
+        self.assertEqual(stats.sync_errors, 1)
+        self.assertEqual(stats.first_sync_error, 3 * 188)
+        self.assertEqual(stats.transport_errors, 1)
+
+    def test_pcr_intervals(self):
+        step = PCR_CLOCK_HZ // 25  # 40ms
+        packets = [ts_packet(0x100, cc, pcr=cc * step) for cc in range(10)]
+        stats = inspect_packets(b''.join(packets))
+        self.assertEqual(stats.pcr_count, 10)
+        self.assertAlmostEqual(stats.pcr_interval_max, 0.04)
+        self.assertEqual(stats.pcr_discontinuities, 0)
+
+    def test_pcr_jump_is_a_discontinuity(self):
+        packets = [ts_packet(0x100, 0, pcr=0), ts_packet(0x100, 1, pcr=5 * PCR_CLOCK_HZ)]
+        stats = inspect_packets(b''.join(packets))
+        self.assertEqual(stats.pcr_discontinuities, 1)
+        self.assertEqual(stats.pcr_interval_max, 0.0)
+
+    def test_signalled_pcr_jump_is_not_counted(self):
+        packets = [ts_packet(0x100, 0, pcr=0), ts_packet(0x100, 1, pcr=5 * PCR_CLOCK_HZ, discontinuity=True)]
+        self.assertEqual(inspect_packets(b''.join(packets)).pcr_discontinuities, 0)
+
+    def test_pcr_interval_across_chunk_boundary(self):
+        inspector = TSInspector()
+        inspector.inspect(ts_packet(0x100, 0, pcr=0))
+        stats = inspector.inspect(ts_packet(0x100, 1, pcr=PCR_CLOCK_HZ // 10))
+        self.assertAlmostEqual(stats.pcr_interval_max, 0.1)
@@ -0,0 +1,266 @@
+"""
+Single-pass MPEG-TS health checks shared by the TS and HLS proxies.
+
+Header fields are read as strided byte slices (every 188th byte) and mapped
+through translation tables, so sync bytes, transport errors and null packets
+are counted without a Python-level step per packet. The busiest PID's
+continuity counters are compared against the rolling 0-15 sequence in one go;
+only the other PIDs' packets (and the busiest PID's, if its sequence breaks) are
+walked one by one. PCRs are only read from the few packets whose adaptation
+field carries one.
+"""
+
+import sys
+from array import array
+from collections import Counter
+from itertools import compress, repeat
+from operator import and_
+
+from apps.proxy.ts_proxy.constants import TS_PACKET_SIZE, TS_SYNC_BYTE
+
+NULL_PID = 0x1FFF
+PCR_CLOCK_HZ = 27_000_000
+
+# PCR steps of a second or more (or backwards) are discontinuities, not repetition intervals
+MAX_PCR_INTERVAL = 1.0
+
+# Translation tables applied to strided header bytes
+_PID_HIGH = bytes(b & 0x1F for b in range(256))
+_NOT_SYNC = bytes(0 if b == TS_SYNC_BYTE else 1 for b in range(256))
+_TRANSPORT_ERROR = bytes(1 if b & 0x80 else 0 for b in range(256))
+_HAS_ADAPTATION = bytes(1 if b & 0x20 else 0 for b in range(256))
+# Adaptation field flags worth a closer look: discontinuity_indicator or PCR_flag
+_INTERESTING_FLAGS = bytes(1 if b & 0x90 else 0 for b in range(256))
+
+# Continuity counters, with markers for packets the counter check treats specially
+_NO_PAYLOAD = 16      # counter doesn't advance without a payload
+_DISCONTINUITY = 32   # added to the counter when discontinuity_indicator is set
+_CONTINUITY = bytes(b & 0x0F if b & 0x10 else _NO_PAYLOAD for b in range(256))
+_NEXT_CC = tuple((cc + 1) & 0x0F for cc in range(16))
+_CC_CYCLE = bytes(range(16))
+
+
+class TSStats:
+    """Counters from inspecting TS packets"""
+
+    def __init__(self):
+        self.packets = 0
+        self.sync_errors = 0
+        self.transport_errors = 0
+        self.cc_errors = 0
+        self.null_packets = 0
+        self.pcr_count = 0
+        self.pcr_discontinuities = 0
+        self.pcr_interval_max = 0.0
+        # Offset of the first packet without a sync byte (single inspections only)
+        self.first_sync_error = -1
+
+    @property
+    def null_ratio(self):
+        """Share of packets that are null stuffing"""
+        return self.null_packets / self.packets if self.packets else 0.0
+
+    def merge(self, other):
+        """Add another inspection's counters to these"""
+        self.packets += other.packets
+        self.sync_errors += other.sync_errors
+        self.transport_errors += other.transport_errors
+        self.cc_errors += other.cc_errors
+        self.null_packets += other.null_packets
+        self.pcr_count += other.pcr_count
+        self.pcr_discontinuities += other.pcr_discontinuities
+        self.pcr_interval_max = max(self.pcr_interval_max, other.pcr_interval_max)
+
+    def to_dict(self):
+        return {
+            'packets': self.packets,
+            'sync_errors': self.sync_errors,
+            'transport_errors': self.transport_errors,
+            'cc_errors': self.cc_errors,
+            'null_packets': self.null_packets,
+            'null_ratio': round(self.null_ratio, 4),
+            'pcr_count': self.pcr_count,
+            'pcr_discontinuities': self.pcr_discontinuities,
+            'pcr_interval_max': round(self.pcr_interval_max, 4),
+        }
+
+
+class TSInspector:
+    """
+    Inspects packet-aligned TS data, carrying per-PID state across calls.
+
+    Feed consecutive chunks of one stream to the same inspector so continuity
+    counter gaps and PCR intervals spanning a chunk boundary are caught.
+    Running totals are kept in `totals`.
+    """
+
+    def __init__(self):
+        self.last_cc = {}
+        # PIDs whose last counter was a gap, so a single corrupted counter counts once
+        self.cc_mismatch = set()
+        self.last_pcr = {}
+        self.totals = TSStats()
+
+    def reset(self):
+        """Forget per-PID state, e.g. when data starts coming from a new source"""
+        self.last_cc.clear()
+        self.cc_mismatch.clear()
+        self.last_pcr.clear()
+
+    def inspect(self, data, start=0):
+        """
+        Check every whole packet in data from a packet-aligned start.
+
+        Returns:
+            TSStats: Counters for this data (also added to self.totals)
+        """
+        stats = TSStats()
+        count = (len(data) - start) // TS_PACKET_SIZE
+        if count <= 0:
+            return stats
+        end = start + count * TS_PACKET_SIZE
+        stats.packets = count
+
+        # One byte per packet for each header byte we need
+        sync = bytes(data[start:end:TS_PACKET_SIZE])
+        header1 = bytes(data[start + 1:end:TS_PACKET_SIZE])
+        header3 = bytes(data[start + 3:end:TS_PACKET_SIZE])
+
+        not_sync = sync.translate(_NOT_SYNC)
+        stats.sync_errors = count - not_sync.count(0)
+        if stats.sync_errors:
+            stats.first_sync_error = start + not_sync.find(1) * TS_PACKET_SIZE
+        stats.transport_errors = count - header1.translate(_TRANSPORT_ERROR).count(0)
+
+        # 13-bit PIDs assembled from the two header bytes in one copy
+        pid_high = header1.translate(_PID_HIGH)
+        pid_low = bytes(data[start + 2:end:TS_PACKET_SIZE])
+        pid_bytes = bytearray(count * 2)
+        pid_bytes[0::2] = pid_high
+        pid_bytes[1::2] = pid_low
+        pids = array('H', pid_bytes)
+        if sys.byteorder == 'little':
+            pids.byteswap()
+        stats.null_packets = pids.count(NULL_PID)
+
+        continuity = bytearray(header3.translate(_CONTINUITY))
+        self._inspect_adaptation_fields(data, start, end, header3, pids, continuity, stats)
+        self._check_continuity(pids, pid_high, pid_low, continuity, stats)
+
+        self.totals.merge(stats)
+        return stats
+
+    def _inspect_adaptation_fields(self, data, start, end, header3, pids, continuity, stats):
+        """Read PCRs and discontinuity indicators from the packets that have them"""
+        has_adaptation = header3.translate(_HAS_ADAPTATION)
+        if not has_adaptation.count(1):
+            return
+
+        # Without an adaptation field byte 5 is payload, so only trust its flags where one exists
+        flags = bytes(data[start + 5:end:TS_PACKET_SIZE]).translate(_INTERESTING_FLAGS)
+        candidates = bytes(map(and_, has_adaptation, flags))
+        index = candidates.find(1)
+        while index >= 0:
+            offset = start + index * TS_PACKET_SIZE
+            adaptation_length = data[offset + 4]
+            if adaptation_length:
+                flag_byte = data[offset + 5]
+                if flag_byte & 0x80 and continuity[index] < _NO_PAYLOAD:
+                    continuity[index] += _DISCONTINUITY
+                if flag_byte & 0x10 and adaptation_length >= 7:
+                    self._record_pcr(pids[index], data, offset, bool(flag_byte & 0x80), stats)
+            index = candidates.find(1, index + 1)
+
+    def _record_pcr(self, pid, data, offset, discontinuity, stats):
+        value = int.from_bytes(data[offset + 6:offset + 12], 'big')
+        pcr = (value >> 15) * 300 + (value & 0x1FF)
+        stats.pcr_count += 1
+
+        last = self.last_pcr.get(pid)
+        self.last_pcr[pid] = pcr
+        if last is None or discontinuity:
+            return
+        interval = (pcr - last) / PCR_CLOCK_HZ
+        if 0 <= interval < MAX_PCR_INTERVAL:
+            stats.pcr_interval_max = max(stats.pcr_interval_max, interval)
+        else:
+            stats.pcr_discontinuities += 1
+
+    def _check_continuity(self, pids, pid_high, pid_low, continuity, stats):
+        """Count continuity counter gaps per PID (a repeated counter is a legal duplicate)"""
+        # One PID (usually video) carries most packets. Its counters are checked in one
+        # comparison against the rolling 0-15 sequence, and only the remaining non-null
+        # packets are walked one by one
+        count = len(pids)
+        main_pid = Counter(pids[::16]).most_common(1)[0][0]
+        main = _pid_mask(pid_high, pid_low, main_pid)
+        skipped = main | _pid_mask(pid_high, pid_low, NULL_PID)
+        walked = skipped ^ int.from_bytes(b'\x01' * count, 'big')
+
+        errors = self._check_run(main_pid, bytes(compress(continuity, main.to_bytes(count, 'big'))))
+        if walked:
+            errors += self._count_gaps(compress(zip(pids, continuity), walked.to_bytes(count, 'big')))
+        stats.cc_errors = errors
+
+    def _check_run(self, pid, counters):
+        """Check one PID's counters in order, walking them only if they aren't a clean sequence"""
+        run = counters.replace(bytes([_NO_PAYLOAD]), b'')
+        if not run or pid == NULL_PID:
+            return 0
+
+        last = self.last_cc.get(pid)
+        expected_first = run[0] if last is None else _NEXT_CC[last]
+        if run[0] == expected_first:
+            cycle = _CC_CYCLE * ((expected_first + len(run)) // 16 + 1)
+            if run == cycle[expected_first:expected_first + len(run)]:
+                self.last_cc[pid] = run[-1]
+                self.cc_mismatch.discard(pid)
+                return 0
+        return self._count_gaps(zip(repeat(pid), counters))
+
+    def _count_gaps(self, packets):
+        """
+        Walk (PID, counter) pairs in stream order.
+
+        Only the first mismatch of a run counts: one corrupted counter breaks the
+        sequence both into and out of it, but is a single error.
+        """
+        last_cc = self.last_cc
+        get_last = last_cc.get
+        mismatch = self.cc_mismatch
+        next_cc = _NEXT_CC
+        errors = 0
+        for pid, cc in packets:
+            if cc >= _NO_PAYLOAD or pid == NULL_PID:
+                if cc >= _DISCONTINUITY:
+                    last_cc[pid] = cc - _DISCONTINUITY
+                    mismatch.discard(pid)
+                continue
+            previous = get_last(pid)
+            last_cc[pid] = cc
+            if previous is None or cc == previous:
+                continue
+            if cc == next_cc[previous]:
+                if mismatch:
+                    mismatch.discard(pid)
+            elif pid not in mismatch:
+                mismatch.add(pid)
+                errors += 1
+        return errors
+
+
+def _pid_mask(pid_high, pid_low, pid):
+    """One byte per packet, 1 where the packet is on pid, as an int for bitwise combining"""
+    high = pid_high.translate(bytes(pid >> 8) + b'\x01' + bytes(255 - (pid >> 8)))
+    low = pid_low.translate(bytes(pid & 0xFF) + b'\x01' + bytes(255 - (pid & 0xFF)))
+    return int.from_bytes(high, 'big') & int.from_bytes(low, 'big')
+
+
+def inspect_packets(data, start=0):
+    """
+    Inspect a self-contained block of TS packets, such as an HLS segment.
+
+    Returns:
+        TSStats: Counters for the block
+    """
+    return TSInspector().inspect(data, start)
@@ -0,0 +1,194 @@
+"""
+Async stream generation for TS streams served over ASGI.
+Idle or slow viewers cost a suspended coroutine instead of a greenlet or thread.
+"""
+
+import asyncio
+import time
+from asgiref.sync import sync_to_async
+from apps.proxy.config import TSConfig as Config
+from core.utils import RedisClient
+from .stream_generator import StreamGenerator
+from .redis_keys import RedisKeys
+from .constants import ChannelState, LagPolicy
+from .config_helper import ConfigHelper
+from .utils import create_ts_packet, get_logger
+
+logger = get_logger()
+
+class AsyncStreamGenerator(StreamGenerator):
+    """
+    Async counterpart of StreamGenerator for the ASGI streaming endpoint.
+
+    Keepalive, ghost-client, timeout and stats handling are inherited from
+    StreamGenerator; only waiting and Redis I/O are done asynchronously.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.async_redis = RedisClient.get_async_client()
+        self.channel_ready = not self.channel_initializing
+
+    async def generate(self):
+        """
+        Async generator producing the stream content for the client.
+
+        Yields:
+            bytes: Chunks of TS stream data
+        """
+        self.stream_start_time = time.time()
+        self.bytes_sent = 0
+        self.chunks_sent = 0
+
+        try:
+            logger.info(f"[{self.client_id}] Async stream generator started, channel_ready={not self.channel_initializing}")
+
+            # First handle initialization if needed
+            if self.channel_initializing:
+                async for packet in self._wait_for_initialization_async():
+                    yield packet
+                if not self.channel_ready:
+                    return
+
+            logger.info(f"[{self.client_id}] Channel {self.channel_id} ready, starting normal streaming")
+
+            # Reset start time for real streaming
+            self.stream_start_time = time.time()
+
+            # Ownership lookup uses the sync client - keep it off the event loop
+            if not await sync_to_async(self._setup_streaming, thread_sensitive=False)():
+                return
+
+            async for chunk in self._stream_data_generator_async():
+                yield chunk
+
+        except asyncio.CancelledError:
+            logger.debug(f"[{self.client_id}] Async stream cancelled by client disconnect")
+            raise
+        except Exception as e:
+            logger.error(f"[{self.client_id}] Stream error: {e}", exc_info=True)
+        finally:
+            # Cleanup touches the database when releasing streams
+            await sync_to_async(self._cleanup, thread_sensitive=False)()
+
+    async def _wait_for_initialization_async(self):
+        """Wait for channel initialization to complete, sending keepalive packets."""
+        initialization_start = time.time()
+        max_init_wait = getattr(Config, 'CLIENT_WAIT_TIMEOUT', 30)
+        keepalive_interval = 0.5
+        last_keepalive = 0
+        self.channel_ready = False
+
+        while time.time() - initialization_start < max_init_wait:
+            if self.async_redis:
+                pipe = self.async_redis.pipeline(transaction=False)
+                pipe.hgetall(RedisKeys.channel_metadata(self.channel_id))
+                pipe.exists(RedisKeys.channel_stopping(self.channel_id))
+                metadata, stopping = await pipe.execute()
+
+                if metadata and b'state' in metadata:
+                    state = metadata[b'state'].decode('utf-8')
+                    if state in [ChannelState.WAITING_FOR_CLIENTS, ChannelState.ACTIVE]:
+                        logger.info(f"[{self.client_id}] Channel {self.channel_id} now ready (state={state})")
+                        self.channel_ready = True
+                        return
+                    elif state in [ChannelState.ERROR, ChannelState.STOPPED, ChannelState.STOPPING]:
+                        error_message = metadata.get(b'error_message', b'Unknown error').decode('utf-8')
+                        logger.error(f"[{self.client_id}] Channel {self.channel_id} in error state: {state}, message: {error_message}")
+                        yield create_ts_packet('error', f"Error: {error_message}")
+                        return
+                    elif time.time() - last_keepalive >= keepalive_interval:
+                        # Still initializing - send keepalive
+                        keepalive_packet = create_ts_packet('keepalive', f"Initializing: {state}")
+                        logger.debug(f"[{self.client_id}] Sending keepalive packet during initialization, state={state}")
+                        yield keepalive_packet
+                        self.bytes_sent += len(keepalive_packet)
+                        last_keepalive = time.time()
+
+                if stopping:
+                    logger.error(f"[{self.client_id}] Channel {self.channel_id} stopping flag detected during initialization")
+                    yield create_ts_packet('error', "Error: Channel is stopping")
+                    return
+
+            await asyncio.sleep(0.1)
+
+        logger.warning(f"[{self.client_id}] Timed out waiting for initialization")
+        yield create_ts_packet('error', "Error: Initialization timeout")
+
+    async def _stream_data_generator_async(self):
+        """Generate stream data chunks based on buffer contents."""
+        while True:
+            if not await self._check_resources_async():
+                break
+
+            # Keep slow clients within the lag bounds before reading
+            if not await self._enforce_lag_policy_async():
+                break
+
+            chunks, next_index = await self.buffer.get_optimized_client_data_async(self.local_index, self.async_redis)
+
+            if chunks and self.join_point:
+                chunks = self._apply_join_point(chunks)
+
+            if chunks:
+                # Stats are recorded in memory, so the sync chunk processor is safe here
+                for chunk in self._process_chunks(chunks, next_index):
+                    yield chunk
+                self.local_index = next_index
+                self.last_yield_time = time.time()
+                self.empty_reads = 0
+                self.consecutive_empty = 0
+            else:
+                self.empty_reads += 1
+                self.consecutive_empty += 1
+
+                if self._should_send_keepalive(self.local_index):
+                    keepalive_packet = create_ts_packet('keepalive')
+                    logger.debug(f"[{self.client_id}] Sending keepalive packet while waiting at buffer head")
+                    yield keepalive_packet
+                    self.bytes_sent += len(keepalive_packet)
+                    self.last_yield_time = time.time()
+                    self.consecutive_empty = 0
+                    await self.buffer.wait_for_chunks_async(self.local_index, Config.KEEPALIVE_INTERVAL)
+                elif self.buffer.index > self.local_index:
+                    # Buffer is ahead but chunks weren't readable yet - back off
+                    await asyncio.sleep(min(0.1 * self.consecutive_empty, 1.0))
+                else:
+                    # At buffer head - suspend until the writer announces a new chunk
+                    await self.buffer.wait_for_chunks_async(self.local_index, ConfigHelper.chunk_wait_timeout())
+
+                if self.empty_reads % 50 == 0:
+                    stream_status = "healthy" if (self.stream_manager and self.stream_manager.healthy) else "unknown"
+                    logger.debug(f"[{self.client_id}] Waiting for chunks beyond {self.local_index} (buffer at {self.buffer.index}, stream: {stream_status})")
+
+                if self._is_ghost_client(self.local_index):
+                    logger.warning(f"[{self.client_id}] Possible ghost client: buffer has advanced {self.buffer.index - self.local_index} chunks ahead but client stuck at {self.local_index}")
+                    break
+
+                if self._is_timeout():
+                    break
+
+    async def _enforce_lag_policy_async(self):
+        """Apply the lag policy, reading a non-owner's join point without blocking the event loop"""
+        if not self._lag_exceeded():
+            return True
+
+        join_point = None
+        if self.lag_policy == LagPolicy.SKIP_TO_KEYFRAME:
+            join_point = await self.buffer.get_join_point_async(self.async_redis)
+        return self._apply_lag_policy(join_point)
+
+    async def _check_resources_async(self):
+        """Refresh shared channel state asynchronously when due, then run the in-memory checks."""
+        if self.watcher.reconcile_due():
+            await self.watcher.reconcile_async(self.async_redis)
+        return self._check_resources()
+
+
+def create_async_stream_generator(channel_id, client_id, client_ip, client_user_agent, channel_initializing=False, rendition=None):
+    """
+    Factory function to create a new async stream generator.
+    Returns an async generator for use with StreamingHttpResponse under ASGI.
+    """
+    generator = AsyncStreamGenerator(channel_id, client_id, client_ip, client_user_agent, channel_initializing, rendition)
+    return generator.generate
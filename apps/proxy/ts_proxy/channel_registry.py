@@ -0,0 +1,66 @@
+"""Registry of active TS proxy channels, so enumerating channels never scans the keyspace"""
+
+import time
+from .config_helper import ConfigHelper
+from .redis_keys import RedisKeys
+from .utils import get_logger
+
+logger = get_logger()
+
+class ChannelRegistry:
+    """
+    Sorted set of channel IDs scored by their last heartbeat.
+
+    Workers holding a channel refresh its score from the cleanup thread;
+    entries that stop being refreshed age out by score.
+    """
+
+    @staticmethod
+    def register(redis_client, channel_id):
+        """Add a channel to the registry"""
+        redis_client.zadd(RedisKeys.channel_registry(), {channel_id: time.time()})
+
+    @staticmethod
+    def touch(redis_client, channel_ids):
+        """Refresh the heartbeat score for channels held by this worker"""
+        if channel_ids:
+            now = time.time()
+            redis_client.zadd(RedisKeys.channel_registry(), {channel_id: now for channel_id in channel_ids})
+
+    @staticmethod
+    def unregister(redis_client, channel_id):
+        """Remove a channel from the registry"""
+        redis_client.zrem(RedisKeys.channel_registry(), channel_id)
+
+    @staticmethod
+    def get_channel_ids(redis_client, include_stale=False):
+        """
+        Get registered channel IDs.
+
+        Args:
+            include_stale: Also return channels whose heartbeat is older than CHANNEL_REGISTRY_TTL
+
+        Returns:
+            list: Channel IDs as strings
+        """
+        registry_key = RedisKeys.channel_registry()
+        if include_stale:
+            members = redis_client.zrange(registry_key, 0, -1)
+        else:
+            min_score = time.time() - ConfigHelper.channel_registry_ttl()
+            members = redis_client.zrangebyscore(registry_key, min_score, '+inf')
+        return [member.decode('utf-8') for member in members]
+
+    @staticmethod
+    def prune(redis_client):
+        """
+        Drop entries whose heartbeat is older than CHANNEL_REGISTRY_TTL.
+
+        Returns:
+            int: Number of entries removed
+        """
+        max_score = time.time() - ConfigHelper.channel_registry_ttl()
+        removed = redis_client.zremrangebyscore(RedisKeys.channel_registry(), '-inf', max_score)
+        if removed:
+            logger.info(f"Pruned {removed} stale channels from registry")
+        return removed
@@ -1,10 +1,12 @@
 import logging
 import time
 import re
+import json
 from .server import ProxyServer
 from .redis_keys import RedisKeys
 from .constants import TS_PACKET_SIZE, ChannelMetadataField
-from redis.exceptions import ConnectionError, TimeoutError
+from apps.proxy.ts_inspection import inspect_packets
+from redis.exceptions import ConnectionError, TimeoutError, WatchError
 from .utils import get_logger
 
 logger = get_logger()
@@ -45,6 +47,17 @@ class ChannelStatus:
             'buffer_index': int(buffer_index_value.decode('utf-8')) if buffer_index_value else 0,
         }
 
+        # Renditions transcoded from this channel's upstream and how far their buffers have got
+        renditions = sorted(r.decode('utf-8') for r in proxy_server.redis_client.smembers(RedisKeys.channel_renditions(channel_id)))
+        if renditions:
+            index_values = proxy_server.redis_client.mget(
+                [RedisKeys.buffer_index(RedisKeys.rendition_namespace(channel_id, r)) for r in renditions]
+            )
+            info['renditions'] = [
+                {'name': rendition, 'buffer_index': int(value.decode('utf-8')) if value else 0}
+                for rendition, value in zip(renditions, index_values)
+            ]
+
         # Add timing information
         state_changed_field = ChannelMetadataField.STATE_CHANGED_AT.encode('utf-8')
         if state_changed_field in metadata:
@@ -85,6 +98,13 @@ class ChannelStatus:
                 else:
                     info['avg_bitrate'] = f"{avg_bitrate:.2f} Kbps"
 
+        # Adaptive buffer chunk size and the ingest bitrate it was chosen from
+        ChannelStatus._add_chunk_size_info(info, metadata)
+        ChannelStatus._add_startup_info(info, metadata)
+        ChannelStatus._add_transcode_info(info, metadata)
+        ChannelStatus._add_upstream_info(info, metadata)
+        ChannelStatus._add_failover_info(info, metadata)
+        ChannelStatus._add_stream_quality_info(info, metadata)
         # Get client information
         client_set_key = RedisKeys.clients(channel_id)
         client_ids = proxy_server.redis_client.smembers(client_set_key)
@@ -126,6 +146,25 @@ class ChannelStatus:
                 if b'current_rate_KBps' in client_data:
                     client_info['current_rate_KBps'] = float(client_data[b'current_rate_KBps'].decode('utf-8'))
 
+                rendition_field = ChannelMetadataField.RENDITION.encode('utf-8')
+                if rendition_field in client_data:
+                    client_info['rendition'] = client_data[rendition_field].decode('utf-8')
+
+                # Add how far behind live the client is
+                if ChannelMetadataField.LAG_SECONDS.encode('utf-8') in client_data:
+                    lag = {
+                        'seconds': float(client_data[ChannelMetadataField.LAG_SECONDS.encode('utf-8')].decode('utf-8')),
+                        'bytes': int(client_data.get(ChannelMetadataField.LAG_BYTES.encode('utf-8'), b'0').decode('utf-8')),
+                        'skips': int(client_data.get(ChannelMetadataField.LAG_SKIPS.encode('utf-8'), b'0').decode('utf-8'))
+                    }
+                    histogram = client_data.get(ChannelMetadataField.LAG_HISTOGRAM.encode('utf-8'))
+                    if histogram:
+                        try:
+                            lag['histogram'] = json.loads(histogram.decode('utf-8'))
+                        except ValueError:
+                            pass
+                    client_info['lag'] = lag
+
                 clients.append(client_info)
 
         info['clients'] = clients
@@ -168,7 +207,8 @@ class ChannelStatus:
                                     'size': chunk_size,
                                     'ts_packets': ts_packets,
                                     'aligned': ts_aligned,
-                                    'first_byte': chunk_data[0] if chunk_size > 0 else None
+                                    'first_byte': chunk_data[0] if chunk_size > 0 else None,
+                                    'packets': inspect_packets(chunk_data).to_dict()
                                 }
                     else:
                         chunk_keys_missing.append(i)
@@ -227,6 +267,12 @@ class ChannelStatus:
                 'last_data_age': time.time() - manager.last_data_time
             }
 
+        # Local buffer statistics (in-memory ring vs Redis reads, ingest copies)
+        if channel_id in proxy_server.stream_buffers:
+            buffer = proxy_server.stream_buffers[channel_id]
+            info['local_buffer'] = buffer.get_read_stats()
+            info['ingest'] = buffer.get_write_stats()
+
         return info
 
     @staticmethod
@@ -246,102 +292,311 @@ class ChannelStatus:
             logger.error(f"Redis command error in ChannelStatus: {e}")
             return None
 
+    @staticmethod
+    def _add_chunk_size_info(info, metadata):
+        """Add buffer chunk size and ingest bitrate from channel metadata"""
+        chunk_size_field = ChannelMetadataField.BUFFER_CHUNK_SIZE.encode('utf-8')
+        if chunk_size_field in metadata:
+            chunk_size = int(metadata[chunk_size_field].decode('utf-8'))
+            info['buffer_chunk_size'] = chunk_size
+            info['buffer_chunk_packets'] = chunk_size // TS_PACKET_SIZE
+
+        bitrate_field = ChannelMetadataField.INGEST_BITRATE.encode('utf-8')
+        if bitrate_field in metadata:
+            ingest_bitrate = int(metadata[bitrate_field].decode('utf-8'))
+            info['ingest_bitrate_kbps'] = ingest_bitrate / 1000
+
+            # Stream time held by each chunk at the current bitrate
+            if ingest_bitrate > 0 and 'buffer_chunk_size' in info:
+                info['buffer_chunk_seconds'] = round(info['buffer_chunk_size'] * 8 / ingest_bitrate, 3)
+
+    @staticmethod
+    def _add_startup_info(info, metadata):
+        """Add channel startup timings (seconds from init) from channel metadata"""
+        startup = {}
+        for field in (ChannelMetadataField.TIME_TO_FIRST_BYTE,
+                      ChannelMetadataField.TIME_TO_FIRST_CHUNK,
+                      ChannelMetadataField.TIME_TO_KEYFRAME):
+            value = metadata.get(field.encode('utf-8'))
+            if value:
+                startup[field] = float(value.decode('utf-8'))
+        if startup:
+            info['startup'] = startup
+
+    @staticmethod
+    def _add_transcode_info(info, metadata):
+        """Add the transcoder's last reported progress from channel metadata"""
+        transcode = {}
+        for key, field in (('fps', ChannelMetadataField.TRANSCODE_FPS),
+                           ('speed', ChannelMetadataField.TRANSCODE_SPEED),
+                           ('bitrate_kbps', ChannelMetadataField.TRANSCODE_BITRATE)):
+            value = metadata.get(field.encode('utf-8'))
+            if value:
+                transcode[key] = float(value.decode('utf-8'))
+        if transcode:
+            info['transcode'] = transcode
+
+    @staticmethod
+    def _add_upstream_info(info, metadata):
+        """Add the host and timings of the latest upstream connection from channel metadata"""
+        host = metadata.get(ChannelMetadataField.UPSTREAM_HOST.encode('utf-8'))
+        if not host:
+            return
+        upstream = {'host': host.decode('utf-8')}
+        for key, field in (('connect_time', ChannelMetadataField.UPSTREAM_CONNECT_TIME),
+                           ('first_byte_time', ChannelMetadataField.UPSTREAM_FIRST_BYTE_TIME)):
+            value = metadata.get(field.encode('utf-8'))
+            if value:
+                upstream[key] = float(value.decode('utf-8'))
+        info['upstream'] = upstream
+
+    @staticmethod
+    def _add_failover_info(info, metadata):
+        """Add the warm standby and stream switch gap timings from channel metadata"""
+        failover = {}
+        standby_id = metadata.get(ChannelMetadataField.STANDBY_STREAM_ID.encode('utf-8'))
+        if standby_id:
+            failover['standby_stream_id'] = int(standby_id.decode('utf-8'))
+        for key, field in (('last_gap', ChannelMetadataField.STREAM_SWITCH_GAP),
+                           ('max_gap', ChannelMetadataField.STREAM_SWITCH_GAP_MAX)):
+            value = metadata.get(field.encode('utf-8'))
+            if value:
+                failover[key] = float(value.decode('utf-8'))
+        switches = metadata.get(ChannelMetadataField.STREAM_SWITCH_COUNT.encode('utf-8'))
+        if switches:
+            failover['switches'] = int(switches.decode('utf-8'))
+            failover['last_switch_warm'] = metadata.get(ChannelMetadataField.STREAM_SWITCH_WARM.encode('utf-8')) == b"1"
+        if failover:
+            info['failover'] = failover
+
+    @staticmethod
+    def _add_stream_quality_info(info, metadata):
+        """Add packet-level ingest counters (CC errors, null ratio, PCR gaps) from channel metadata"""
+        quality = {}
+        for key, field, cast in (('cc_errors', ChannelMetadataField.STREAM_CC_ERRORS, int),
+                                 ('sync_errors', ChannelMetadataField.STREAM_SYNC_ERRORS, int),
+                                 ('transport_errors', ChannelMetadataField.STREAM_TRANSPORT_ERRORS, int),
+                                 ('null_ratio', ChannelMetadataField.STREAM_NULL_RATIO, float),
+                                 ('pcr_interval_max', ChannelMetadataField.STREAM_PCR_INTERVAL_MAX, float)):
+            value = metadata.get(field.encode('utf-8'))
+            if value:
+                quality[key] = cast(value.decode('utf-8'))
+        if quality:
+            info['stream_quality'] = quality
+
     @staticmethod
     def get_basic_channel_info(channel_id):
         """Get basic channel information with Redis error handling"""
+        channels = ChannelStatus.get_basic_channel_info_bulk([channel_id])
+        return channels[0] if channels else None
+
+    @staticmethod
+    def get_basic_channel_info_bulk(channel_ids):
+        """
+        Get basic info for many channels in two pipelined round trips.
+
+        The first pipeline reads metadata, buffer index and client set for every
+        channel; the second reads the essentials of up to 10 clients per channel.
+
+        Returns:
+            list: Basic info dicts for channels that still have metadata
+        """
         proxy_server = ProxyServer.get_instance()
+        if not proxy_server.redis_client or not channel_ids:
+            return []
 
         try:
-            # Use _execute_redis_command for Redis operations
-            metadata_key = RedisKeys.channel_metadata(channel_id)
-            metadata = ChannelStatus._execute_redis_command(
-                lambda: proxy_server.redis_client.hgetall(metadata_key)
-            )
+            pipe = proxy_server.redis_client.pipeline(transaction=False)
+            for channel_id in channel_ids:
+                pipe.hgetall(RedisKeys.channel_metadata(channel_id))
+                pipe.get(RedisKeys.buffer_index(channel_id))
+                pipe.smembers(RedisKeys.clients(channel_id))
+            results = pipe.execute()
+
+            # Only channels with metadata are reported - get up to 10 clients each
+            channels = []
+            pipe = proxy_server.redis_client.pipeline(transaction=False)
+            for i, channel_id in enumerate(channel_ids):
+                metadata, buffer_index_value, client_ids = results[3 * i:3 * i + 3]
+                if not metadata:
+                    continue
+
+                client_count = len(client_ids or ())
+                client_ids = [client_id.decode('utf-8') for client_id in sorted(client_ids or ())[:10]]
+                for client_id in client_ids:
+                    pipe.hmget(RedisKeys.client_metadata(channel_id, client_id), 'user_agent', 'ip_address', 'connected_at')
+                channels.append((channel_id, metadata, buffer_index_value, client_count, client_ids))
+
+            client_rows = iter(pipe.execute())
+
+            infos = []
+            for channel_id, metadata, buffer_index_value, client_count, client_ids in channels:
+                info = ChannelStatus._build_basic_info(proxy_server, channel_id, metadata, buffer_index_value, client_count)
+                info['clients'] = [ChannelStatus._build_basic_client_info(client_id, next(client_rows)) for client_id in client_ids]
+                infos.append(info)
+            return infos
 
-            if not metadata:
-                return None
-
-            # Basic channel info only - omit diagnostics and details
-            buffer_index_key = RedisKeys.buffer_index(channel_id)
-            buffer_index_value = proxy_server.redis_client.get(buffer_index_key)
-
-            # Count clients (using efficient count method)
-            client_set_key = RedisKeys.clients(channel_id)
-            client_count = proxy_server.redis_client.scard(client_set_key) or 0
-
-            # Calculate uptime
-            created_at = float(metadata.get(ChannelMetadataField.INIT_TIME.encode('utf-8'), b'0').decode('utf-8'))
-            uptime = time.time() - created_at if created_at > 0 else 0
-
-            # Simplified info
-            info = {
-                'channel_id': channel_id,
-                'state': metadata.get(ChannelMetadataField.STATE.encode('utf-8'), b'unknown').decode('utf-8'),
-                'url': metadata.get(ChannelMetadataField.URL.encode('utf-8'), b'').decode('utf-8'),
-                'stream_profile': metadata.get(ChannelMetadataField.STREAM_PROFILE.encode('utf-8'), b'').decode('utf-8'),
-                'owner': metadata.get(ChannelMetadataField.OWNER.encode('utf-8'), b'unknown').decode('utf-8'),
-                'buffer_index': int(buffer_index_value.decode('utf-8')) if buffer_index_value else 0,
-                'client_count': client_count,
-                'uptime': uptime
-            }
+        except (ConnectionError, TimeoutError) as e:
+            logger.warning(f"Redis connection error in ChannelStatus: {e}")
+            return []
+        except Exception as e:
+            logger.error(f"Error getting channel info: {e}")
+            return []
 
-            # Add data throughput information to basic info
-            total_bytes_bytes = proxy_server.redis_client.hget(metadata_key, ChannelMetadataField.TOTAL_BYTES.encode('utf-8'))
-            if total_bytes_bytes:
-                total_bytes = int(total_bytes_bytes.decode('utf-8'))
-                info['total_bytes'] = total_bytes
+    @staticmethod
+    def _build_basic_info(proxy_server, channel_id, metadata, buffer_index_value, client_count):
+        """Build the basic info dict for a channel from its metadata"""
+        # Calculate uptime
+        created_at = float(metadata.get(ChannelMetadataField.INIT_TIME.encode('utf-8'), b'0').decode('utf-8'))
+        uptime = time.time() - created_at if created_at > 0 else 0
 
-                # Calculate and add bitrate
-                if uptime > 0:
-                    avg_bitrate = ChannelStatus._calculate_bitrate(total_bytes, uptime)
-                    info['avg_bitrate_kbps'] = avg_bitrate
+        # Simplified info
+        info = {
+            'channel_id': channel_id,
+            'state': metadata.get(ChannelMetadataField.STATE.encode('utf-8'), b'unknown').decode('utf-8'),
+            'url': metadata.get(ChannelMetadataField.URL.encode('utf-8'), b'').decode('utf-8'),
+            'stream_profile': metadata.get(ChannelMetadataField.STREAM_PROFILE.encode('utf-8'), b'').decode('utf-8'),
+            'owner': metadata.get(ChannelMetadataField.OWNER.encode('utf-8'), b'unknown').decode('utf-8'),
+            'buffer_index': int(buffer_index_value.decode('utf-8')) if buffer_index_value else 0,
+            'client_count': client_count,
+            'uptime': uptime
+        }
 
-                    # Format for display
-                    if avg_bitrate > 1000:
-                        info['avg_bitrate'] = f"{avg_bitrate / 1000:.2f} Mbps"
-                    else:
-                        info['avg_bitrate'] = f"{avg_bitrate:.2f} Kbps"
-
-            # Quick health check if available locally
-            if channel_id in proxy_server.stream_managers:
-                manager = proxy_server.stream_managers[channel_id]
-                info['healthy'] = manager.healthy
-
-            # Get concise client information
-            clients = []
-            client_ids = proxy_server.redis_client.smembers(client_set_key)
-
-            # Process only if we have clients and keep it limited
-            if client_ids:
-                # Get up to 10 clients for the basic view
-                for client_id in list(client_ids)[:10]:
-                    client_id_str = client_id.decode('utf-8')
-                    client_key = RedisKeys.client_metadata(channel_id, client_id_str)
-
-                    # Efficient way - just retrieve the essentials
-                    client_info = {
-                        'client_id': client_id_str,
-                        'user_agent': proxy_server.redis_client.hget(client_key, 'user_agent'),
-                        'ip_address': proxy_server.redis_client.hget(client_key, 'ip_address').decode('utf-8'),
-                    }
+        # Add data throughput information to basic info
+        total_bytes_bytes = metadata.get(ChannelMetadataField.TOTAL_BYTES.encode('utf-8'))
+        if total_bytes_bytes:
+            total_bytes = int(total_bytes_bytes.decode('utf-8'))
+            info['total_bytes'] = total_bytes
 
-                    if client_info['user_agent']:
-                        client_info['user_agent'] = client_info['user_agent'].decode('utf-8')
-                    else:
-                        client_info['user_agent'] = 'unknown'
+            # Calculate and add bitrate
+            if uptime > 0:
+                avg_bitrate = ChannelStatus._calculate_bitrate(total_bytes, uptime)
+                info['avg_bitrate_kbps'] = avg_bitrate
 
-                    # Just get connected_at for client age
-                    connected_at_bytes = proxy_server.redis_client.hget(client_key, 'connected_at')
-                    if connected_at_bytes:
-                        connected_at = float(connected_at_bytes.decode('utf-8'))
-                        client_info['connected_since'] = time.time() - connected_at
+                # Format for display
+                if avg_bitrate > 1000:
+                    info['avg_bitrate'] = f"{avg_bitrate / 1000:.2f} Mbps"
+                else:
+                    info['avg_bitrate'] = f"{avg_bitrate:.2f} Kbps"
 
-                    clients.append(client_info)
+        ChannelStatus._add_chunk_size_info(info, metadata)
+        ChannelStatus._add_startup_info(info, metadata)
 
-            # Add clients to info
-            info['clients'] = clients
+        # Quick health check if available locally, otherwise as last reported by the owner
+        if channel_id in proxy_server.stream_managers:
+            manager = proxy_server.stream_managers[channel_id]
+            info['healthy'] = manager.healthy
+        else:
+            healthy = metadata.get(ChannelMetadataField.STREAM_HEALTHY.encode('utf-8'))
+            if healthy is not None:
+                info['healthy'] = healthy == b'1'
 
-            return info
-        except Exception as e:
-            logger.error(f"Error getting channel info: {e}")
-            return None
+        return info
+
+    @staticmethod
+    def _build_basic_client_info(client_id, client_row):
+        """Build concise client info from (user_agent, ip_address, connected_at)"""
+        user_agent, ip_address, connected_at_bytes = client_row
+        client_info = {
+            'client_id': client_id,
+            'user_agent': user_agent.decode('utf-8') if user_agent else 'unknown',
+            'ip_address': ip_address.decode('utf-8') if ip_address else 'unknown',
+        }
+
+        # Just get connected_at for client age
+        if connected_at_bytes:
+            connected_at = float(connected_at_bytes.decode('utf-8'))
+            client_info['connected_since'] = time.time() - connected_at
+
+        return client_info
+
+    # Fields derived from the clock; they change every poll without a real change
+    VOLATILE_FIELDS = ('uptime', 'avg_bitrate_kbps', 'avg_bitrate')
+    VOLATILE_CLIENT_FIELDS = ('connected_since',)
+
+    @staticmethod
+    def _stable_view(info):
+        """Channel info without clock-derived fields, for change detection"""
+        stable = {k: v for k, v in info.items() if k not in ChannelStatus.VOLATILE_FIELDS and k != 'clients'}
+        stable['clients'] = [
+            {k: v for k, v in client.items() if k not in ChannelStatus.VOLATILE_CLIENT_FIELDS}
+            for client in info.get('clients', [])
+        ]
+        return stable
+
+    @staticmethod
+    def get_stats_sequence(redis_client):
+        """Sequence number of the last stats update sent on the updates feed (0 if none)"""
+        seq = redis_client.hget(RedisKeys.stats_baseline(), 'seq')
+        return int(seq) if seq else 0
+
+    @staticmethod
+    def build_stats_update(channels, redis_client, full_interval):
+        """
+        Encode channel stats for the updates feed as a full snapshot or a delta.
+
+        Deltas carry only channels whose non-volatile fields changed since the
+        previous update, plus the IDs of channels that went away. A full snapshot
+        is sent on the first call and every full_interval seconds so receivers
+        can resynchronise.
+
+        The previous update is kept in Redis rather than in the calling process,
+        since the stats task runs in several Celery workers and each must diff
+        against what was last sent, not what it last sent itself. Every payload
+        has a sequence number and deltas name the one they apply to, so a
+        receiver that missed an update knows to reload.
+
+        Args:
+            channels: Basic info dicts for all active channels
+            redis_client: Redis client holding the shared baseline
+            full_interval: Seconds between full snapshots
+
+        Returns:
+            dict: Stats payload
+        """
+        current = {
+            info['channel_id']: json.dumps(ChannelStatus._stable_view(info), sort_keys=True)
+            for info in channels
+        }
+        key = RedisKeys.stats_baseline()
+
+        with redis_client.pipeline() as pipe:
+            for _ in range(5):
+                try:
+                    pipe.watch(key)
+                    baseline = pipe.hgetall(key)
+                    now = time.time()
+                    seq = int(baseline[b'seq']) + 1 if baseline else 1
+                    send_full = not baseline or now - float(baseline[b'full_at']) >= full_interval
+
+                    pipe.multi()
+                    pipe.hset(key, mapping={
+                        'seq': seq,
+                        'full_at': now if send_full else baseline[b'full_at'],
+                        'channels': json.dumps(current),
+                    })
+                    pipe.expire(key, max(full_interval * 4, 60))
+                    pipe.execute()
+                    break
+                except WatchError:
+                    # Another worker sent an update in between - diff against that one
+                    continue
+            else:
+                # Still contended; a full snapshot is correct whatever the baseline
+                seq = 0
+                now = time.time()
+                send_full = True
+
+        if send_full:
+            return {'channels': channels, 'count': len(channels), 'full': True, 'seq': seq, 'timestamp': now}
+
+        previous = json.loads(baseline[b'channels'])
+        return {
+            'delta': True,
+            'updated': [info for info in channels if previous.get(info['channel_id']) != current[info['channel_id']]],
+            'removed': [channel_id for channel_id in previous if channel_id not in current],
+            'count': len(channels),
+            'seq': seq,
+            'base_seq': seq - 1,
+            'timestamp': now,
+        }
@@ -0,0 +1,145 @@
+"""Per-channel control state shared by all stream generators on a worker"""
+
+import threading
+import time
+from .constants import ChannelState, ChannelMetadataField, EventType
+from .config_helper import ConfigHelper
+from .redis_keys import RedisKeys
+from .utils import get_logger
+
+logger = get_logger()
+
+class ChannelStateWatcher:
+    """
+    Tracks channel stop flags, channel state and per-client stop requests.
+
+    Updated from pub/sub events by the ProxyServer event listener and
+    reconciled against Redis at a low frequency, so generators only
+    check in-memory flags instead of querying Redis per client.
+    """
+
+    TERMINAL_STATES = (ChannelState.ERROR, ChannelState.STOPPED, ChannelState.STOPPING)
+
+    def __init__(self, channel_id, redis_client=None):
+        self.channel_id = channel_id
+        self.redis_client = redis_client
+        self.poll_interval = ConfigHelper.channel_state_poll_interval()
+
+        self.stopping = False
+        self.state = None
+        self.stopped_clients = set()
+        self.watched_clients = set()
+
+        self.lock = threading.Lock()
+        self._reconcile_lock = threading.Lock()
+        self.last_reconciled = 0.0
+
+    def watch_client(self, client_id):
+        """Include a local client in reconciliation polls"""
+        with self.lock:
+            self.watched_clients.add(client_id)
+
+    def unwatch_client(self, client_id):
+        """Stop tracking a local client"""
+        with self.lock:
+            self.watched_clients.discard(client_id)
+            self.stopped_clients.discard(client_id)
+
+    def handle_event(self, event_type, data):
+        """Apply a control event received from the events channel"""
+        if event_type in (EventType.CHANNEL_STOP, EventType.CHANNEL_STOPPED):
+            self.mark_stopping()
+        elif event_type == EventType.CLIENT_STOP:
+            client_id = data.get("client_id")
+            if client_id:
+                with self.lock:
+                    self.stopped_clients.add(client_id)
+
+    def mark_stopping(self):
+        """Flag the channel as stopping for every local generator"""
+        self.stopping = True
+
+    def set_state(self, state):
+        """Record a channel state change made on this worker"""
+        self.state = state
+
+    def stop_reason(self, client_id):
+        """
+        Check whether a client should stop streaming.
+
+        Returns:
+            str: Reason to stop, or None to keep streaming
+        """
+        self._maybe_reconcile()
+
+        if self.stopping:
+            return "channel stop signal"
+        if self.state in self.TERMINAL_STATES:
+            return f"channel in {self.state} state"
+        if client_id in self.stopped_clients:
+            return "client stop signal"
+        return None
+
+    def reconcile_due(self):
+        """Whether the poll interval has elapsed since the last reconciliation"""
+        return time.time() - self.last_reconciled >= self.poll_interval
+
+    def _maybe_reconcile(self):
+        """Refresh from Redis if the poll interval elapsed - only one caller does the work"""
+        if not self.reconcile_due():
+            return
+        if not self._reconcile_lock.acquire(blocking=False):
+            return
+        try:
+            self.reconcile()
+        finally:
+            self._reconcile_lock.release()
+
+    def reconcile(self):
+        """Read stop flags and state for the channel and its local clients in one round trip"""
+        self.last_reconciled = time.time()
+        if not self.redis_client:
+            return
+
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            client_ids = self._queue_reconcile(pipe)
+            self._apply_reconcile(client_ids, pipe.execute())
+        except Exception as e:
+            logger.error(f"Error reconciling channel state for {self.channel_id}: {e}")
+
+    async def reconcile_async(self, async_redis):
+        """Async variant of reconcile for ASGI generators"""
+        self.last_reconciled = time.time()
+        if not async_redis:
+            return
+
+        try:
+            pipe = async_redis.pipeline(transaction=False)
+            client_ids = self._queue_reconcile(pipe)
+            self._apply_reconcile(client_ids, await pipe.execute())
+        except Exception as e:
+            logger.error(f"Error reconciling channel state for {self.channel_id}: {e}")
+
+    def _queue_reconcile(self, pipe):
+        """Queue reconciliation reads on a pipeline, returning the client IDs checked"""
+        with self.lock:
+            client_ids = list(self.watched_clients)
+
+        pipe.exists(RedisKeys.channel_stopping(self.channel_id))
+        pipe.hget(RedisKeys.channel_metadata(self.channel_id), ChannelMetadataField.STATE)
+        for client_id in client_ids:
+            pipe.exists(RedisKeys.client_stop(self.channel_id, client_id))
+        return client_ids
+
+    def _apply_reconcile(self, client_ids, results):
+        """Update in-memory flags from reconciliation results"""
+        if results[0]:
+            self.stopping = True
+        if results[1]:
+            self.state = results[1].decode('utf-8')
+
+        stopped = {client_id for client_id, flag in zip(client_ids, results[2:]) if flag}
+        if stopped:
+            with self.lock:
+                self.stopped_clients.update(stopped)
@@ -0,0 +1,41 @@
+"""Per-client lag accounting for the TS stream generators"""
+
+import json
+
+class LagHistogram:
+    """
+    Fixed-bucket histogram of how far behind live a client is, in seconds.
+
+    Counts are per bucket, not cumulative: each sample lands in the first
+    bucket whose upper bound it doesn't exceed, or the overflow bucket.
+    """
+
+    BOUNDS = (0.5, 1, 2, 5, 10, 20, 30)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.samples = 0
+        self.max_lag = 0.0
+
+    def observe(self, lag_seconds):
+        """Record one lag sample"""
+        for i, bound in enumerate(self.BOUNDS):
+            if lag_seconds <= bound:
+                self.counts[i] += 1
+                break
+        else:
+            self.counts[-1] += 1
+
+        self.samples += 1
+        if lag_seconds > self.max_lag:
+            self.max_lag = lag_seconds
+
+    def to_dict(self):
+        """Bucket counts keyed by upper bound ('+Inf' for overflow)"""
+        buckets = {f"{bound}": count for bound, count in zip(self.BOUNDS, self.counts)}
+        buckets['+Inf'] = self.counts[-1]
+        return {'buckets': buckets, 'samples': self.samples, 'max': round(self.max_lag, 3)}
+
+    def to_json(self):
+        """Compact JSON for storage in the client metadata hash"""
+        return json.dumps(self.to_dict(), separators=(',', ':'))
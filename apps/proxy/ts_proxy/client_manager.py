@@ -7,7 +7,7 @@ import json
 from typing import Set, Optional
 from apps.proxy.config import TSConfig as Config
 from redis.exceptions import ConnectionError, TimeoutError
-from .constants import EventType
+from .constants import EventType, ChannelMetadataField
 from .config_helper import ConfigHelper
 from .redis_keys import RedisKeys
 from .utils import get_logger
@@ -31,6 +31,11 @@ class ClientManager:
         self.heartbeat_interval = ConfigHelper.get('CLIENT_HEARTBEAT_INTERVAL', 10)
         self.last_heartbeat_time = {}
 
+        # Latest stats per local client, written to Redis in batches by the heartbeat thread
+        self.stats_flush_interval = ConfigHelper.client_stats_flush_interval()
+        self.pending_stats = {}
+        self.stats_lock = threading.Lock()
+
         # Start heartbeat thread for local clients
         self._start_heartbeat_thread()
         self._registered_clients = set()  # Track already registered client IDs
@@ -40,105 +45,178 @@ class ClientManager:
         def heartbeat_task():
             no_clients_count = 0  # Track consecutive empty cycles
             max_empty_cycles = 3  # Exit after this many consecutive empty checks
+            tick = min(self.heartbeat_interval, self.stats_flush_interval)
+            last_heartbeat = time.time()
+            last_stats_flush = time.time()
 
             logger.debug(f"Started heartbeat thread for channel {self.channel_id} (interval: {self.heartbeat_interval}s)")
 
             while True:
                 try:
-                    # Wait for the interval
-                    time.sleep(self.heartbeat_interval)
+                    # Wait for the next heartbeat or stats flush
+                    time.sleep(tick)
+                    current_time = time.time()
+
+                    if current_time - last_stats_flush >= self.stats_flush_interval:
+                        last_stats_flush = current_time
+                        self._flush_client_stats()
 
-                    # Send heartbeat for all local clients
+                    if current_time - last_heartbeat < self.heartbeat_interval:
+                        continue
+                    last_heartbeat = current_time
+
+                    # Snapshot local clients - Redis I/O below runs without holding self.lock
                     with self.lock:
-                        if not self.clients or not self.redis_client:
+                        client_ids = set(self.clients)
+
+                        if not client_ids or not self.redis_client:
                             # No clients left, increment our counter
                             no_clients_count += 1
 
-                            # If we've seen no clients for several consecutive checks, exit the thread
+                            # If we've seen no clients for several consecutive checks, exit the thread.
+                            # Deciding under self.lock means add_client either added its client before
+                            # this check or sees the thread gone afterwards and starts a new one.
                             if no_clients_count >= max_empty_cycles:
                                 logger.info(f"No clients for channel {self.channel_id} after {no_clients_count} consecutive checks, exiting heartbeat thread")
+                                self.heartbeat_thread = None
                                 return  # This exits the thread
 
                             # Skip this cycle if we have no clients
                             continue
-                        else:
-                            # Reset counter when we see clients
-                            no_clients_count = 0
-
-                        # IMPROVED GHOST DETECTION: Check for stale clients before sending heartbeats
-                        current_time = time.time()
-                        clients_to_remove = set()
-
-                        # First identify clients that should be removed
-                        for client_id in self.clients:
-                            client_key = f"ts_proxy:channel:{self.channel_id}:clients:{client_id}"
-
-                            # Check if client exists in Redis at all
-                            exists = self.redis_client.exists(client_key)
-                            if not exists:
-                                logger.debug(f"Client {client_id} no longer exists in Redis, removing locally")
-                                clients_to_remove.add(client_id)
-                                continue
-
-                            # Check for stale activity using last_active field
-                            last_active = self.redis_client.hget(client_key, "last_active")
-                            if last_active:
-                                last_active_time = float(last_active.decode('utf-8'))
-                                ghost_timeout = self.heartbeat_interval * getattr(Config, 'GHOST_CLIENT_MULTIPLIER', 5.0)
-
-                                if current_time - last_active_time > ghost_timeout:
-                                    logger.debug(f"Client {client_id} inactive for {current_time - last_active_time:.1f}s, removing as ghost")
-                                    clients_to_remove.add(client_id)
-
-                        # Remove ghost clients in a separate step
-                        for client_id in clients_to_remove:
-                            self.remove_client(client_id)
-
-                        if clients_to_remove:
-                            logger.info(f"Removed {len(clients_to_remove)} ghost clients from channel {self.channel_id}")
-
-                        # Now send heartbeats only for remaining clients
-                        pipe = self.redis_client.pipeline()
-                        current_time = time.time()
-
-                        for client_id in self.clients:
-                            # Skip clients we just marked for removal
-                            if client_id in clients_to_remove:
-                                continue
-
-                            # Skip if we just sent a heartbeat recently
-                            if client_id in self.last_heartbeat_time:
-                                time_since_heartbeat = current_time - self.last_heartbeat_time[client_id]
-                                if time_since_heartbeat < self.heartbeat_interval * 0.5:  # Only heartbeat at half interval minimum
-                                    continue
-
-                            # Only update clients that remain
-                            client_key = f"ts_proxy:channel:{self.channel_id}:clients:{client_id}"
-                            pipe.hset(client_key, "last_active", str(current_time))
-                            pipe.expire(client_key, self.client_ttl)
-
-                            # Keep client in the set with TTL
-                            pipe.sadd(self.client_set_key, client_id)
-                            pipe.expire(self.client_set_key, self.client_ttl)
-
-                            # Track last heartbeat locally
-                            self.last_heartbeat_time[client_id] = current_time
-
-                        # Execute all commands atomically
-                        pipe.execute()
-
-                        # Only notify if we have real clients
-                        if self.clients and not all(c in clients_to_remove for c in self.clients):
-                            self._notify_owner_of_activity()
+
+                    # Reset counter when we see clients
+                    no_clients_count = 0
+
+                    # Check for stale clients before sending heartbeats
+                    clients_to_remove = self._find_ghost_clients(client_ids)
+
+                    # Remove ghost clients in a separate step
+                    for client_id in clients_to_remove:
+                        self.remove_client(client_id)
+
+                    if clients_to_remove:
+                        logger.info(f"Removed {len(clients_to_remove)} ghost clients from channel {self.channel_id}")
+
+                    remaining = client_ids - clients_to_remove
+                    if remaining:
+                        self._send_heartbeats(remaining)
+                        self._notify_owner_of_activity()
 
                 except Exception as e:
                     logger.error(f"Error in client heartbeat thread: {e}")
 
         thread = threading.Thread(target=heartbeat_task, daemon=True)
         thread.name = f"client-heartbeat-{self.channel_id}"
+        self.heartbeat_thread = thread
         thread.start()
         logger.debug(f"Started client heartbeat thread for channel {self.channel_id} (interval: {self.heartbeat_interval}s)")
 
+    def _find_ghost_clients(self, client_ids):
+        """
+        Find local clients whose Redis record is gone or inactive, in one round trip.
+
+        Returns:
+            set: Client IDs to remove
+        """
+        client_ids = list(client_ids)
+        pipe = self.redis_client.pipeline(transaction=False)
+        for client_id in client_ids:
+            client_key = RedisKeys.client_metadata(self.channel_id, client_id)
+            pipe.exists(client_key)
+            pipe.hget(client_key, "last_active")
+        results = pipe.execute()
+
+        current_time = time.time()
+        ghost_timeout = self.heartbeat_interval * getattr(Config, 'GHOST_CLIENT_MULTIPLIER', 5.0)
+        clients_to_remove = set()
+
+        for i, client_id in enumerate(client_ids):
+            exists, last_active = results[2 * i], results[2 * i + 1]
+
+            # Check if client exists in Redis at all
+            if not exists:
+                logger.debug(f"Client {client_id} no longer exists in Redis, removing locally")
+                clients_to_remove.add(client_id)
+                continue
+
+            # Check for stale activity using last_active field
+            if last_active:
+                last_active_time = float(last_active.decode('utf-8'))
+                if current_time - last_active_time > ghost_timeout:
+                    logger.debug(f"Client {client_id} inactive for {current_time - last_active_time:.1f}s, removing as ghost")
+                    clients_to_remove.add(client_id)
+
+        return clients_to_remove
+
+    def _send_heartbeats(self, client_ids):
+        """Refresh presence for clients that haven't reported activity this interval"""
+        # Drop clients that disconnected while ghost detection ran so their keys aren't recreated
+        with self.lock:
+            client_ids = client_ids & self.clients
+        if not client_ids:
+            return
+
+        pipe = self.redis_client.pipeline()
+        current_time = time.time()
+
+        for client_id in client_ids:
+            # Skip clients whose stats flush or heartbeat already refreshed them recently
+            if client_id in self.last_heartbeat_time:
+                time_since_heartbeat = current_time - self.last_heartbeat_time[client_id]
+                if time_since_heartbeat < self.heartbeat_interval * 0.5:  # Only heartbeat at half interval minimum
+                    continue
+
+            client_key = RedisKeys.client_metadata(self.channel_id, client_id)
+            pipe.hset(client_key, "last_active", str(current_time))
+            pipe.expire(client_key, self.client_ttl)
+
+            # Track last heartbeat locally
+            self.last_heartbeat_time[client_id] = current_time
+
+        # Keep clients in the set with TTL
+        pipe.sadd(self.client_set_key, *client_ids)
+        pipe.expire(self.client_set_key, self.client_ttl)
+
+        # Execute all commands atomically
+        pipe.execute()
+
+    def update_client_stats(self, client_id, stats):
+        """Record the latest stats for a local client; written to Redis by the heartbeat thread"""
+        with self.stats_lock:
+            self.pending_stats[client_id] = stats
+
+    def _flush_client_stats(self):
+        """Write pending stats for all local clients in a single pipeline"""
+        with self.stats_lock:
+            if not self.pending_stats:
+                return
+            pending = self.pending_stats
+            self.pending_stats = {}
+
+        if not self.redis_client:
+            return
+
+        try:
+            current_time = time.time()
+            flushed = []
+            pipe = self.redis_client.pipeline(transaction=False)
+            for client_id, stats in pending.items():
+                # Stats may arrive just after a client left - don't recreate its key
+                if client_id not in self.clients:
+                    continue
+                client_key = RedisKeys.client_metadata(self.channel_id, client_id)
+
+                # Clients with fresh stats just sent data, so this doubles as their heartbeat
+                pipe.hset(client_key, mapping={**stats, "last_active": str(current_time)})
+                pipe.expire(client_key, self.client_ttl)
+                flushed.append(client_id)
+            pipe.execute()
+
+            for client_id in flushed:
+                self.last_heartbeat_time[client_id] = current_time
+        except Exception as e:
+            logger.error(f"Error flushing client stats for channel {self.channel_id}: {e}")
+
     def _execute_redis_command(self, command_func):
         """Execute Redis command with error handling"""
         if not self.redis_client:
@@ -175,7 +253,7 @@ class ClientManager:
         except Exception as e:
             logger.error(f"Error notifying owner of client activity: {e}")
 
-    def add_client(self, client_id, client_ip, user_agent=None):
+    def add_client(self, client_id, client_ip, user_agent=None, rendition=None):
         """Add a client with duplicate prevention"""
         if client_id in self._registered_clients:
             logger.debug(f"Client {client_id} already registered, skipping")
@@ -195,12 +273,19 @@ class ClientManager:
             "last_active": current_time,
             "worker_id": self.worker_id or "unknown"
         }
+        if rendition:
+            client_data[ChannelMetadataField.RENDITION] = rendition
 
         try:
             with self.lock:
                 # Store client in local set
                 self.clients.add(client_id)
 
+                # Heartbeat thread exits after the channel sits empty - restart it for new clients.
+                # Checked under self.lock so concurrent adds can't start two threads.
+                if self.heartbeat_thread is None or not self.heartbeat_thread.is_alive():
+                    self._start_heartbeat_thread()
+
                 # Store in Redis
                 if self.redis_client:
                     # FIXED: Store client data just once with proper key
@@ -258,6 +343,9 @@ class ClientManager:
             if client_id in self.last_heartbeat_time:
                 del self.last_heartbeat_time[client_id]
 
+            with self.stats_lock:
+                self.pending_stats.pop(client_id, None)
+
             self.last_active_time = time.time()
 
             if self.redis_client:
@@ -41,6 +41,16 @@ class ConfigHelper:
         """Get number of chunks to start behind"""
         return ConfigHelper.get('INITIAL_BEHIND_CHUNKS', 10)
 
+    @staticmethod
+    def join_at_keyframe():
+        """Check if new clients start at the latest keyframe"""
+        return ConfigHelper.get('JOIN_AT_KEYFRAME', True)
+
+    @staticmethod
+    def join_max_behind_seconds():
+        """Get how many seconds behind live a keyframe join point may be"""
+        return ConfigHelper.get('JOIN_MAX_BEHIND_SECONDS', 10.0)
+
     @staticmethod
     def keepalive_interval():
         """Get keepalive interval in seconds"""
@@ -51,11 +61,186 @@ class ConfigHelper:
         """Get cleanup check interval in seconds"""
         return ConfigHelper.get('CLEANUP_CHECK_INTERVAL', 3)
 
+    @staticmethod
+    def channel_registry_ttl():
+        """Get seconds without a heartbeat before a channel leaves the registry"""
+        return ConfigHelper.get('CHANNEL_REGISTRY_TTL', 30)
+
+    @staticmethod
+    def stats_full_snapshot_interval():
+        """Get seconds between full channel stats snapshots on the updates feed"""
+        return ConfigHelper.get('STATS_FULL_SNAPSHOT_INTERVAL', 30)
+
     @staticmethod
     def redis_chunk_ttl():
         """Get Redis chunk TTL in seconds"""
         return ConfigHelper.get('REDIS_CHUNK_TTL', 60)
 
+    @staticmethod
+    def local_buffer_chunks():
+        """Get number of recent chunks kept in memory by the writing worker"""
+        return ConfigHelper.get('LOCAL_BUFFER_CHUNKS', 64)
+
+    @staticmethod
+    def shared_memory_ring():
+        """Check if chunks are also published through a same-host shared memory ring"""
+        return ConfigHelper.get('SHARED_MEMORY_RING', False)
+
+    @staticmethod
+    def shared_memory_ring_slots():
+        """Get number of chunks kept in each channel's shared memory ring"""
+        return ConfigHelper.get('SHARED_MEMORY_RING_SLOTS', 32)
+
+    @staticmethod
+    def chunk_wait_timeout():
+        """Get max seconds a client waits for a new chunk notification"""
+        return ConfigHelper.get('CHUNK_WAIT_TIMEOUT', 1.0)
+
+    @staticmethod
+    def client_stats_flush_interval():
+        """Get seconds between batched client stats writes"""
+        return ConfigHelper.get('CLIENT_STATS_FLUSH_INTERVAL', 2)
+
+    @staticmethod
+    def client_rate_smoothing():
+        """Get time constant in seconds for the client rate moving average"""
+        return ConfigHelper.get('CLIENT_RATE_SMOOTHING', 5.0)
+
+    @staticmethod
+    def client_lag_policy():
+        """Get the policy applied to clients that fall too far behind live"""
+        return ConfigHelper.get('CLIENT_LAG_POLICY', 'skip_to_keyframe')
+
+    @staticmethod
+    def client_max_lag_seconds():
+        """Get how many seconds behind live a client may fall"""
+        return ConfigHelper.get('CLIENT_MAX_LAG_SECONDS', 15)
+
+    @staticmethod
+    def client_max_lag_bytes():
+        """Get how many bytes behind the buffer head a client may fall"""
+        return ConfigHelper.get('CLIENT_MAX_LAG_BYTES', 32 * 1024 * 1024)
+
+    @staticmethod
+    def channel_state_poll_interval():
+        """Get seconds between Redis reconciliations of channel control state"""
+        return ConfigHelper.get('CHANNEL_STATE_POLL_INTERVAL', 1.0)
+
+    @staticmethod
+    def adaptive_chunk_size():
+        """Check if buffer chunk size should follow the measured ingest bitrate"""
+        return ConfigHelper.get('ADAPTIVE_CHUNK_SIZE', True)
+
+    @staticmethod
+    def chunk_target_seconds():
+        """Get target stream duration per buffer chunk"""
+        return ConfigHelper.get('CHUNK_TARGET_SECONDS', 0.25)
+
+    @staticmethod
+    def min_buffer_chunk_size():
+        """Get lower bound for adaptive buffer chunk size in bytes"""
+        return ConfigHelper.get('MIN_BUFFER_CHUNK_SIZE', 188 * 87)
+
+    @staticmethod
+    def max_buffer_chunk_size():
+        """Get upper bound for adaptive buffer chunk size in bytes"""
+        return ConfigHelper.get('MAX_BUFFER_CHUNK_SIZE', 188 * 5577)
+
+    @staticmethod
+    def chunk_resize_threshold():
+        """Get relative change needed before the buffer chunk size is adjusted"""
+        return ConfigHelper.get('CHUNK_RESIZE_THRESHOLD', 0.25)
+
+    @staticmethod
+    def bitrate_sample_interval():
+        """Get seconds between ingest bitrate samples"""
+        return ConfigHelper.get('BITRATE_SAMPLE_INTERVAL', 1.0)
+
+    @staticmethod
+    def ts_inspection():
+        """Check if ingested chunks get packet-level quality counters"""
+        return ConfigHelper.get('TS_INSPECTION', True)
+
+    @staticmethod
+    def telemetry_flush_interval():
+        """Get seconds between coalesced channel telemetry writes"""
+        return ConfigHelper.get('TELEMETRY_FLUSH_INTERVAL', 1.0)
+
+    @staticmethod
+    def fast_start_enabled():
+        """Check if small-chunk fast start is used for new channels"""
+        return ConfigHelper.get('FAST_START_ENABLED', True)
+
+    @staticmethod
+    def fast_start_seconds():
+        """Get how long fast start chunking lasts after channel init"""
+        return ConfigHelper.get('FAST_START_SECONDS', 5)
+
+    @staticmethod
+    def fast_start_chunk_size():
+        """Get the chunk size used during fast start"""
+        return ConfigHelper.get('FAST_START_CHUNK_SIZE', 188 * 64)
+
+    @staticmethod
+    def fast_start_max_seek_bytes():
+        """Get the max bytes held back while looking for a start keyframe"""
+        return ConfigHelper.get('FAST_START_MAX_SEEK_BYTES', 188 * 4096)
+
+    @staticmethod
+    def fast_start_seek_timeout():
+        """Get the max seconds held back while looking for a start keyframe"""
+        return ConfigHelper.get('FAST_START_SEEK_TIMEOUT', 2.0)
+
+    @staticmethod
+    def transcode_read_size():
+        """Get the max bytes read from a transcoder per readiness event"""
+        return ConfigHelper.get('TRANSCODE_READ_SIZE', 188 * 1024)
+
+    @staticmethod
+    def transcode_read_timeout():
+        """Get max seconds to wait for transcoder output before rechecking state"""
+        return ConfigHelper.get('TRANSCODE_READ_TIMEOUT', 1.0)
+
+    @staticmethod
+    def max_renditions():
+        """Get how many renditions a channel may run besides passthrough"""
+        return ConfigHelper.get('MAX_RENDITIONS', 3)
+
+    @staticmethod
+    def rendition_idle_timeout():
+        """Get seconds a rendition keeps running without clients"""
+        return ConfigHelper.get('RENDITION_IDLE_TIMEOUT', 30)
+
+    @staticmethod
+    def rendition_queue_chunks():
+        """Get how many upstream reads are queued per rendition before dropping"""
+        return ConfigHelper.get('RENDITION_QUEUE_CHUNKS', 256)
+
+    @staticmethod
+    def standby_mode():
+        """Get how standby alternate streams are kept warm"""
+        return ConfigHelper.get('STANDBY_MODE', 'hold')
+
+    @staticmethod
+    def standby_probe_interval():
+        """Get seconds between standby checks in probe mode"""
+        return ConfigHelper.get('STANDBY_PROBE_INTERVAL', 30)
+
+    @staticmethod
+    def standby_probe_bytes():
+        """Get bytes a standby probe must read to count the stream as alive"""
+        return ConfigHelper.get('STANDBY_PROBE_BYTES', 188 * 64)
+
+    @staticmethod
+    def standby_stale_seconds():
+        """Get seconds without data after which a standby is not switched to"""
+        return ConfigHelper.get('STANDBY_STALE_SECONDS', 10)
+
+    @staticmethod
+    def standby_retry_interval():
+        """Get seconds before replacing a standby that failed"""
+        return ConfigHelper.get('STANDBY_RETRY_INTERVAL', 30)
+
     @staticmethod
     def chunk_size():
         """Get chunk size in bytes"""
@@ -28,6 +28,8 @@ class EventType:
     CLIENT_CONNECTED = "client_connected"
     CLIENT_DISCONNECTED = "client_disconnected"
     CLIENT_STOP = "client_stop"
+    CHUNK_AVAILABLE = "chunk_available"
+    RENDITION_REQUEST = "rendition_request"
 
 # Stream types
 class StreamType:
@@ -35,6 +37,17 @@ class StreamType:
     TS = "ts"
     UNKNOWN = "unknown"
 
+# What to do with a client that falls too far behind live
+class LagPolicy:
+    SKIP_TO_KEYFRAME = "skip_to_keyframe"
+    LIVE_EDGE = "live_edge"
+    DISCONNECT = "disconnect"
+
+# How a standby alternate stream is kept warm
+class StandbyMode:
+    HOLD = "hold"
+    PROBE = "probe"
+
 # Channel metadata field names stored in Redis
 class ChannelMetadataField:
     # Basic fields
@@ -58,10 +71,40 @@ class ChannelMetadataField:
     # Buffer and data tracking
     BUFFER_CHUNKS = "buffer_chunks"
     TOTAL_BYTES = "total_bytes"
+    BUFFER_CHUNK_SIZE = "buffer_chunk_size"
+    INGEST_BITRATE = "ingest_bitrate"
+    STREAM_HEALTHY = "stream_healthy"
+
+    # Packet-level stream quality on the ingest path (counts since the channel started)
+    STREAM_CC_ERRORS = "stream_cc_errors"
+    STREAM_SYNC_ERRORS = "stream_sync_errors"
+    STREAM_TRANSPORT_ERRORS = "stream_transport_errors"
+    STREAM_NULL_RATIO = "stream_null_ratio"
+    STREAM_PCR_INTERVAL_MAX = "stream_pcr_interval_max"  # Longest gap between PCRs in seconds
+
+    # Startup timing (seconds from channel init)
+    TIME_TO_FIRST_BYTE = "time_to_first_byte"
+    TIME_TO_FIRST_CHUNK = "time_to_first_chunk"
+    TIME_TO_KEYFRAME = "time_to_keyframe"
+
+    # Last upstream HTTP connection (seconds; connect time is 0 when a pooled connection was reused)
+    UPSTREAM_HOST = "upstream_host"
+    UPSTREAM_CONNECT_TIME = "upstream_connect_time"
+    UPSTREAM_FIRST_BYTE_TIME = "upstream_first_byte_time"
+
+    # Transcoder progress parsed from ffmpeg stderr
+    TRANSCODE_FPS = "transcode_fps"
+    TRANSCODE_SPEED = "transcode_speed"
+    TRANSCODE_BITRATE = "transcode_bitrate_kbps"
 
     # Stream switching
     STREAM_SWITCH_TIME = "stream_switch_time"
     STREAM_SWITCH_REASON = "stream_switch_reason"
+    STREAM_SWITCH_GAP = "stream_switch_gap"          # Seconds without data around the last switch
+    STREAM_SWITCH_GAP_MAX = "stream_switch_gap_max"
+    STREAM_SWITCH_COUNT = "stream_switch_count"
+    STREAM_SWITCH_WARM = "stream_switch_warm"        # "1" if the last switch used the standby
+    STANDBY_STREAM_ID = "standby_stream_id"          # Alternate currently kept warm, empty if none
 
     # Client metadata fields
     CONNECTED_AT = "connected_at"
@@ -74,6 +117,15 @@ class ChannelMetadataField:
     CHUNKS_SENT = "chunks_sent"
     STATS_UPDATED_AT = "stats_updated_at"
 
+    # Rendition a client is watching (absent for passthrough)
+    RENDITION = "rendition"
+
+    # Client lag tracking
+    LAG_SECONDS = "lag_seconds"
+    LAG_BYTES = "lag_bytes"
+    LAG_SKIPS = "lag_skips"
+    LAG_HISTOGRAM = "lag_histogram"
+
 # TS packet constants
 TS_PACKET_SIZE = 188
 TS_SYNC_BYTE = 0x47
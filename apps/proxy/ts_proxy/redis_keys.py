@@ -24,6 +24,11 @@ class RedisKeys:
         """Prefix for buffer chunks"""
         return f"ts_proxy:channel:{channel_id}:buffer:chunk:"
 
+    @staticmethod
+    def buffer_join_point(channel_id):
+        """Key for the latest keyframe join point hash"""
+        return f"ts_proxy:channel:{channel_id}:buffer:join_point"
+
     @staticmethod
     def channel_stopping(channel_id):
         """Key indicating channel is stopping"""
@@ -74,11 +79,31 @@ class RedisKeys:
         """Key for stream switch status"""
         return f"ts_proxy:channel:{channel_id}:switch_status"
 
+    @staticmethod
+    def channel_registry():
+        """Sorted set of active channel IDs scored by last heartbeat"""
+        return "ts_proxy:channels"
+
+    @staticmethod
+    def stats_baseline():
+        """Key for the channel stats last sent on the updates feed, which deltas are built against"""
+        return "ts_proxy:stats:baseline"
+
     @staticmethod
     def worker_heartbeat(worker_id):
         """Key for worker heartbeat"""
         return f"ts_proxy:worker:{worker_id}:heartbeat"
 
+    @staticmethod
+    def rendition_namespace(channel_id, rendition):
+        """Buffer namespace for a channel rendition - used in place of a channel ID for its buffer keys"""
+        return f"{channel_id}:rendition:{rendition}"
+
+    @staticmethod
+    def channel_renditions(channel_id):
+        """Set of renditions running for a channel"""
+        return f"ts_proxy:channel:{channel_id}:renditions"
+
     @staticmethod
     def transcode_active(channel_id):
         """Key indicating active transcode process"""
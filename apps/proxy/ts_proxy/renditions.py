@@ -0,0 +1,374 @@
+"""
+Rendition fan-out for the TS proxy.
+
+The channel owner feeds every upstream read to one transcoder process per
+rendition. Each rendition writes into its own StreamBuffer namespace, so a
+single provider connection can serve passthrough and transcoded clients.
+A rendition is named after an active StreamProfile whose {streamUrl}
+placeholder is replaced with the transcoder's stdin.
+"""
+
+import queue
+import subprocess
+import threading
+import time
+from apps.proxy.config import TSConfig as Config
+from core.models import StreamProfile
+from .stream_buffer import StreamBuffer
+from .redis_keys import RedisKeys
+from .transcode_reader import TranscodeReader
+from .ts_packets import find_sync
+from .constants import ChannelMetadataField, TS_PACKET_SIZE, TS_SYNC_BYTE
+from .config_helper import ConfigHelper
+from .utils import get_logger
+
+logger = get_logger()
+
+# Requests without a rendition (or naming this one) read the channel buffer directly
+PASSTHROUGH_RENDITION = "passthrough"
+
+def is_passthrough(rendition):
+    """Check if a requested rendition means the untouched upstream"""
+    return not rendition or rendition == PASSTHROUGH_RENDITION
+
+def reads_stream_url_as_input(profile):
+    """
+    Check if a profile passes {streamUrl} as an ffmpeg-style input (-i {streamUrl}).
+
+    Only such commands can be pointed at pipe:0 - others (streamlink, VLC)
+    would be handed a pipe name where they expect a URL.
+    """
+    parts = profile.parameters.split()
+    return any(part == "{streamUrl}" and parts[i - 1] == "-i" for i, part in enumerate(parts) if i > 0)
+
+def get_rendition_profile(rendition):
+    """
+    Look up the stream profile a rendition is named after.
+
+    Returns:
+        StreamProfile: The profile, or None if it doesn't exist or can't transcode from a pipe
+    """
+    profile = StreamProfile.objects.filter(name=rendition, is_active=True).first()
+    if not profile or profile.is_proxy() or profile.is_redirect():
+        return None
+    if not reads_stream_url_as_input(profile):
+        logger.warning(f"Stream profile {rendition} can't be used as a rendition: "
+                       f"its command doesn't read its input from -i {{streamUrl}}")
+        return None
+    return profile
+
+class RenditionPipeline:
+    """One transcoder process fed from the channel's ingest, writing a rendition buffer"""
+
+    def __init__(self, channel_id, rendition, command, redis_client):
+        self.channel_id = channel_id
+        self.rendition = rendition
+        self.command = command
+        self.buffer = StreamBuffer(RedisKeys.rendition_namespace(channel_id, rendition), redis_client=redis_client)
+        self.process = None
+        self.reader = None
+        self.running = False
+        self.last_demand = time.time()
+
+        # Reads are dropped rather than stalling the channel when the transcoder falls behind.
+        # Only whole packets are queued, so a drop never leaves a torn packet in the input
+        self.queue = queue.Queue(maxsize=ConfigHelper.rendition_queue_chunks())
+        self.partial_packet = b""
+        self.dropped_reads = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+        # Output bitrate sampling (drives the rendition buffer's chunk size)
+        self.bitrate_sample_interval = ConfigHelper.bitrate_sample_interval()
+        self.bitrate_sample_bytes = 0
+        self.bitrate_sample_start = time.time()
+
+    @property
+    def alive(self):
+        return self.running and self.process is not None and self.process.poll() is None
+
+    def start(self):
+        """Start the transcoder and its stdin/stdout threads"""
+        try:
+            self.process = subprocess.Popen(
+                self.command,
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                bufsize=TS_PACKET_SIZE * 64
+            )
+            self.reader = TranscodeReader(self.process, ConfigHelper.transcode_read_size())
+        except Exception as e:
+            logger.error(f"Error starting rendition {self.rendition} for channel {self.channel_id}: {e}")
+            return False
+
+        self.running = True
+        self.buffer.start_fast_start()
+
+        for target, name in ((self._write_input, "in"), (self._read_output, "out")):
+            thread = threading.Thread(target=target, daemon=True)
+            thread.name = f"rendition-{self.channel_id}-{self.rendition}-{name}"
+            thread.start()
+
+        logger.info(f"Started rendition {self.rendition} for channel {self.channel_id}: {' '.join(self.command)}")
+        return True
+
+    def feed(self, chunk):
+        """Queue an upstream read's whole packets for the transcoder without blocking ingest"""
+        if not self.running:
+            return
+
+        data = self.partial_packet + chunk if self.partial_packet else chunk
+        if data[:1] != bytes((TS_SYNC_BYTE,)):
+            # Unaligned read (stream start, source switch) - resume at the next packet boundary
+            offset = find_sync(data)
+            if offset < 0:
+                self.partial_packet = b""
+                return
+            data = data[offset:]
+
+        end = len(data) - len(data) % TS_PACKET_SIZE
+        self.partial_packet = data[end:]
+        if not end:
+            return
+
+        try:
+            self.queue.put_nowait(data[:end])
+        except queue.Full:
+            self.dropped_reads += 1
+            if self.dropped_reads % 100 == 1:
+                logger.warning(f"Rendition {self.rendition} for channel {self.channel_id} is falling behind, "
+                               f"dropped {self.dropped_reads} reads")
+
+    def _write_input(self):
+        """Copy queued upstream reads into the transcoder's stdin"""
+        try:
+            while self.running:
+                try:
+                    chunk = self.queue.get(timeout=1.0)
+                except queue.Empty:
+                    continue
+                self.process.stdin.write(chunk)
+                self.bytes_in += len(chunk)
+        except (BrokenPipeError, OSError, ValueError) as e:
+            if self.running:
+                logger.warning(f"Rendition {self.rendition} for channel {self.channel_id} stopped accepting input: {e}")
+        finally:
+            self.running = False
+
+    def _read_output(self):
+        """Copy transcoder output into the rendition buffer"""
+        try:
+            while self.running:
+                data = self.reader.read(ConfigHelper.transcode_read_timeout())
+                if data is None:
+                    continue
+                if not data:
+                    break
+                self.bytes_out += len(data)
+                self.buffer.add_chunk(data)
+                self._sample_bitrate(len(data))
+        except (OSError, ValueError) as e:
+            if self.running:
+                logger.warning(f"Error reading rendition {self.rendition} for channel {self.channel_id}: {e}")
+        finally:
+            if self.running:
+                reason = f": {self.reader.stderr_tail[-1]}" if self.reader.stderr_tail else ""
+                logger.warning(f"Rendition {self.rendition} for channel {self.channel_id} exited{reason}")
+            self.running = False
+            self.reader.close()
+
+    def _sample_bitrate(self, byte_count):
+        """Size the rendition's buffer chunks from its output bitrate"""
+        self.bitrate_sample_bytes += byte_count
+        now = time.time()
+        elapsed = now - self.bitrate_sample_start
+        if elapsed >= self.bitrate_sample_interval:
+            self.buffer.update_bitrate(self.bitrate_sample_bytes * 8 / elapsed)
+            self.bitrate_sample_bytes = 0
+            self.bitrate_sample_start = now
+
+    def stop(self):
+        """Stop the transcoder and release the buffer"""
+        self.running = False
+        if self.process:
+            for pipe in (self.process.stdin, self.process.stderr):
+                try:
+                    pipe.close()
+                except Exception:
+                    pass
+            try:
+                self.process.terminate()
+                self.process.wait(timeout=1.0)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+            except Exception as e:
+                logger.debug(f"Error terminating rendition {self.rendition} for channel {self.channel_id}: {e}")
+        self.buffer.stop()
+        logger.info(f"Stopped rendition {self.rendition} for channel {self.channel_id} "
+                    f"({self.bytes_in} bytes in, {self.bytes_out} bytes out, {self.dropped_reads} reads dropped)")
+
+class RenditionManager:
+    """
+    Runs a channel's renditions on the owner worker.
+
+    Pipelines start on first request, restart if their transcoder dies while
+    clients still want them, and stop once no client has asked for them for
+    RENDITION_IDLE_TIMEOUT.
+    """
+
+    # Seconds a caller waits for another thread's start of the same rendition
+    START_TIMEOUT = 10
+
+    def __init__(self, channel_id, redis_client, user_agent=None):
+        self.channel_id = channel_id
+        self.redis_client = redis_client
+        self.user_agent = user_agent or Config.DEFAULT_USER_AGENT
+        self.pipelines = {}
+        # Renditions whose transcoder is being started, set once the start finishes
+        self.starting = {}
+        self.stopped = False
+        self.lock = threading.Lock()
+
+    def ensure(self, rendition):
+        """
+        Get a running pipeline for a rendition, starting it if needed.
+
+        The profile lookup and transcoder spawn happen outside the lock, so
+        other renditions (and the channel's event handling) aren't held up by
+        a slow start. Callers asking for a rendition that is already starting
+        wait for that start instead of spawning a second transcoder.
+
+        Returns:
+            RenditionPipeline: The pipeline, or None if the rendition is unknown or the limit is reached
+        """
+        with self.lock:
+            if self.stopped:
+                return None
+
+            pipeline = self.pipelines.get(rendition)
+            if pipeline and pipeline.alive:
+                pipeline.last_demand = time.time()
+                return pipeline
+
+            started = self.starting.get(rendition)
+            if not started:
+                if pipeline:
+                    # Transcoder died - replace it
+                    del self.pipelines[rendition]
+                elif len(self.pipelines) + len(self.starting) >= ConfigHelper.max_renditions():
+                    logger.warning(f"Channel {self.channel_id} already runs {len(self.pipelines)} renditions, "
+                                   f"not starting {rendition}")
+                    return None
+                self.starting[rendition] = threading.Event()
+
+        if started:
+            started.wait(self.START_TIMEOUT)
+            with self.lock:
+                return self.pipelines.get(rendition)
+
+        if pipeline:
+            pipeline.stop()
+
+        try:
+            pipeline = self._start_pipeline(rendition)
+            with self.lock:
+                stopped = self.stopped
+                if pipeline and not stopped:
+                    self.pipelines[rendition] = pipeline
+            if pipeline and stopped:
+                # The channel stopped while this transcoder was starting
+                pipeline.stop()
+                return None
+            if pipeline and self.redis_client:
+                try:
+                    self.redis_client.sadd(RedisKeys.channel_renditions(self.channel_id), rendition)
+                except Exception as e:
+                    logger.error(f"Error recording rendition {rendition} for channel {self.channel_id}: {e}")
+            return pipeline
+        finally:
+            with self.lock:
+                self.starting.pop(rendition).set()
+
+    def ensure_in_background(self, rendition):
+        """Start a rendition from a thread that must not block, such as the event listener"""
+        thread = threading.Thread(target=self.ensure, args=(rendition,), daemon=True)
+        thread.name = f"rendition-start-{self.channel_id}-{rendition}"
+        thread.start()
+
+    def _start_pipeline(self, rendition):
+        """Look up a rendition's profile and start its transcoder"""
+        try:
+            profile = get_rendition_profile(rendition)
+        except Exception as e:
+            logger.error(f"Error looking up stream profile for rendition {rendition}: {e}")
+            return None
+        if not profile:
+            logger.warning(f"No usable stream profile for rendition {rendition} on channel {self.channel_id}")
+            return None
+
+        pipeline = RenditionPipeline(
+            self.channel_id,
+            rendition,
+            profile.build_command("pipe:0", self.user_agent),
+            self.redis_client
+        )
+        return pipeline if pipeline.start() else None
+
+    def feed(self, chunk):
+        """Hand an upstream read to every rendition"""
+        for pipeline in list(self.pipelines.values()):
+            pipeline.feed(chunk)
+
+    def requested_renditions(self):
+        """Get the renditions named by clients connected on any worker"""
+        if not self.redis_client:
+            return set()
+
+        try:
+            client_ids = self.redis_client.smembers(RedisKeys.clients(self.channel_id))
+            if not client_ids:
+                return set()
+
+            pipe = self.redis_client.pipeline(transaction=False)
+            for client_id in client_ids:
+                pipe.hget(RedisKeys.client_metadata(self.channel_id, client_id.decode('utf-8')),
+                          ChannelMetadataField.RENDITION)
+            return {value.decode('utf-8') for value in pipe.execute() if value}
+        except Exception as e:
+            logger.error(f"Error reading requested renditions for channel {self.channel_id}: {e}")
+            return set()
+
+    def reconcile(self):
+        """Restart renditions clients still want and stop the ones nobody has asked for"""
+        requested = self.requested_renditions()
+        for rendition in requested:
+            self.ensure(rendition)
+
+        idle_timeout = ConfigHelper.rendition_idle_timeout()
+        now = time.time()
+        for rendition, pipeline in list(self.pipelines.items()):
+            if rendition not in requested and now - pipeline.last_demand > idle_timeout:
+                logger.info(f"Rendition {rendition} for channel {self.channel_id} idle for {idle_timeout}s, stopping")
+                self.stop(rendition)
+
+    def stop(self, rendition):
+        """Stop one rendition"""
+        with self.lock:
+            pipeline = self.pipelines.pop(rendition, None)
+        if not pipeline:
+            return
+
+        pipeline.stop()
+        if self.redis_client:
+            try:
+                self.redis_client.srem(RedisKeys.channel_renditions(self.channel_id), rendition)
+            except Exception as e:
+                logger.error(f"Error removing rendition {rendition} for channel {self.channel_id}: {e}")
+
+    def stop_all(self):
+        """Stop every rendition for the channel"""
+        with self.lock:
+            self.stopped = True
+        for rendition in list(self.pipelines):
+            self.stop(rendition)
@@ -17,12 +17,16 @@ import os
 import json
 from typing import Dict, Optional, Set
 from apps.proxy.config import TSConfig as Config
+from apps.proxy import channel_ownership
 from apps.channels.models import Channel, Stream
 from core.utils import RedisClient
 from redis.exceptions import ConnectionError, TimeoutError
 from .stream_manager import StreamManager
 from .stream_buffer import StreamBuffer
 from .client_manager import ClientManager
+from .channel_watcher import ChannelStateWatcher
+from .channel_registry import ChannelRegistry
+from .renditions import RenditionManager
 from .redis_keys import RedisKeys
 from .constants import ChannelState, EventType, StreamType
 from .config_helper import ConfigHelper
@@ -51,6 +55,11 @@ class ProxyServer:
         self.stream_managers = {}
         self.stream_buffers = {}
         self.client_managers = {}
+        self.channel_watchers = {}
+
+        # Renditions - transcoders run on the owner, buffers keyed by rendition namespace on every worker
+        self.rendition_managers = {}
+        self.rendition_buffers = {}
 
         # Generate a unique worker ID
         import socket
@@ -181,6 +190,26 @@ class ProxyServer:
                             event_type = data.get("event")
                             channel_id = data.get("channel_id")
 
+                            if channel_id and event_type == EventType.CHUNK_AVAILABLE:
+                                # Wake local readers on workers that don't write this buffer
+                                buffer = self.stream_buffers.get(channel_id) or self.rendition_buffers.get(channel_id)
+                                if buffer:
+                                    buffer.notify_index(int(data.get("index", 0)))
+                                continue
+
+                            if channel_id and event_type == EventType.RENDITION_REQUEST:
+                                # Only the owner runs transcoders - started off this thread so a
+                                # slow spawn doesn't hold up every other channel's events
+                                renditions = self.rendition_managers.get(channel_id)
+                                if renditions and data.get("rendition"):
+                                    renditions.ensure_in_background(data["rendition"])
+                                continue
+
+                            # Every worker tracks stop requests for its local generators
+                            watcher = self.channel_watchers.get(channel_id) if channel_id else None
+                            if watcher:
+                                watcher.handle_event(event_type, data)
+
                             if channel_id and event_type:
                                 # For owner, update client status immediately
                                 if self.am_i_owner(channel_id):
@@ -356,6 +385,15 @@ class ProxyServer:
         thread.name = "redis-event-listener"
         thread.start()
 
+    def get_channel_watcher(self, channel_id):
+        """Get or create the control-state watcher shared by this worker's generators"""
+        watcher = self.channel_watchers.get(channel_id)
+        if watcher is None:
+            watcher = self.channel_watchers.setdefault(
+                channel_id, ChannelStateWatcher(channel_id, self.redis_client)
+            )
+        return watcher
+
     def get_channel_owner(self, channel_id):
         """Get the worker ID that owns this channel with proper error handling"""
         if not self.redis_client:
@@ -364,7 +402,7 @@ class ProxyServer:
         try:
             lock_key = RedisKeys.channel_owner(channel_id)
             return self._execute_redis_command(
-                lambda: self.redis_client.get(lock_key).decode('utf-8') if self.redis_client.get(lock_key) else None
+                lambda: channel_ownership.owner(self.redis_client, lock_key)
             )
         except Exception as e:
             logger.error(f"Error getting channel owner: {e}")
@@ -384,32 +422,23 @@ class ProxyServer:
             # Create a lock key with proper namespace
             lock_key = RedisKeys.channel_owner(channel_id)
 
-            # Use Redis SETNX for atomic locking with error handling
+            # SET NX with expiry, so the lock can't be left without a TTL
             acquired = self._execute_redis_command(
-                lambda: self.redis_client.setnx(lock_key, self.worker_id)
+                lambda: channel_ownership.claim(self.redis_client, lock_key, self.worker_id, ttl)
             )
 
             if acquired is None:  # Redis command failed
                 logger.warning(f"Redis command failed during ownership acquisition - assuming ownership")
                 return True
 
-            # If acquired, set expiry to prevent orphaned locks
             if acquired:
-                self._execute_redis_command(
-                    lambda: self.redis_client.expire(lock_key, ttl)
-                )
                 logger.info(f"Worker {self.worker_id} acquired ownership of channel {channel_id}")
                 return True
 
-            # If not acquired, check if we already own it (might be a retry)
-            current_owner = self._execute_redis_command(
-                lambda: self.redis_client.get(lock_key)
-            )
-            if current_owner and current_owner.decode('utf-8') == self.worker_id:
-                # Refresh TTL
-                self._execute_redis_command(
-                    lambda: self.redis_client.expire(lock_key, ttl)
-                )
+            # If not acquired, check if we already own it (might be a retry) and refresh the TTL
+            if self._execute_redis_command(
+                lambda: channel_ownership.renew(self.redis_client, lock_key, self.worker_id, ttl)
+            ):
                 logger.info(f"Worker {self.worker_id} refreshed ownership of channel {channel_id}")
                 return True
 
@@ -428,10 +457,8 @@ class ProxyServer:
         try:
             lock_key = RedisKeys.channel_owner(channel_id)
 
-            # Only delete if we're the current owner to prevent race conditions
-            current = self.redis_client.get(lock_key)
-            if current and current.decode('utf-8') == self.worker_id:
-                self.redis_client.delete(lock_key)
+            # Only delete if we're the current owner, checked atomically with the delete
+            if channel_ownership.release(self.redis_client, lock_key, self.worker_id):
                 logger.info(f"Released ownership of channel {channel_id}")
 
                 # Also ensure channel stopping key is set to signal clients
@@ -448,14 +475,8 @@ class ProxyServer:
             return False
 
         try:
-            lock_key = RedisKeys.channel_owner(channel_id)
-            current = self.redis_client.get(lock_key)
-
             # Only extend if we're still the owner
-            if current and current.decode('utf-8') == self.worker_id:
-                self.redis_client.expire(lock_key, ttl)
-                return True
-            return False
+            return channel_ownership.renew(self.redis_client, RedisKeys.channel_owner(channel_id), self.worker_id, ttl)
         except Exception as e:
             logger.error(f"Error extending ownership: {e}")
             return False
@@ -582,6 +603,9 @@ class ProxyServer:
             logger.debug(f"Created StreamBuffer for channel {channel_id}")
             self.stream_buffers[channel_id] = buffer
 
+            # Serve the first packets in small chunks from a clean start boundary
+            buffer.start_fast_start()
+
             # Only the owner worker creates the actual stream manager
             stream_manager = StreamManager(
                 channel_id,
@@ -595,6 +619,11 @@ class ProxyServer:
             logger.info(f"Created StreamManager for channel {channel_id} with stream ID {channel_stream_id}")
             self.stream_managers[channel_id] = stream_manager
 
+            # Renditions share this upstream connection
+            renditions = RenditionManager(channel_id, self.redis_client, user_agent=channel_user_agent)
+            stream_manager.renditions = renditions
+            self.rendition_managers[channel_id] = renditions
+
             # Create client manager with channel_id, redis_client AND worker_id
             client_manager = ClientManager(
                 channel_id=channel_id,
@@ -611,6 +640,7 @@ class ProxyServer:
 
             # If we're the owner, we need to set the channel state rather than starting a grace period immediately
             if self.am_i_owner(channel_id):
+                ChannelRegistry.register(self.redis_client, channel_id)
                 self.update_channel_state(channel_id, ChannelState.CONNECTING, {
                     "init_time": str(time.time()),
                     "owner": self.worker_id
@@ -629,6 +659,55 @@ class ProxyServer:
             self.release_ownership(channel_id)
             return False
 
+    def get_rendition_buffer(self, channel_id, rendition):
+        """
+        Get this worker's buffer for a channel rendition.
+
+        The owner starts the rendition's transcoder if it isn't running; other
+        workers ask the owner to and read the rendition's buffer from Redis.
+
+        Returns:
+            StreamBuffer: The rendition buffer, or None if the owner can't run it
+        """
+        namespace = RedisKeys.rendition_namespace(channel_id, rendition)
+
+        renditions = self.rendition_managers.get(channel_id)
+        if renditions:
+            pipeline = renditions.ensure(rendition)
+            if not pipeline:
+                return None
+            self.rendition_buffers[namespace] = pipeline.buffer
+            return pipeline.buffer
+
+        if self.redis_client:
+            try:
+                self.redis_client.publish(RedisKeys.events_channel(channel_id), json.dumps({
+                    "event": EventType.RENDITION_REQUEST,
+                    "channel_id": channel_id,
+                    "rendition": rendition,
+                    "worker_id": self.worker_id,
+                    "timestamp": time.time()
+                }))
+            except Exception as e:
+                logger.error(f"Error requesting rendition {rendition} for channel {channel_id}: {e}")
+                return None
+
+        buffer = self.rendition_buffers.get(namespace)
+        if not buffer:
+            buffer = StreamBuffer(namespace, redis_client=self.redis_client)
+            self.rendition_buffers[namespace] = buffer
+        return buffer
+
+    def _stop_renditions(self, channel_id):
+        """Stop a channel's transcoders (if owned here) and drop its local rendition buffers"""
+        renditions = self.rendition_managers.pop(channel_id, None)
+        if renditions:
+            renditions.stop_all()
+
+        prefix = RedisKeys.rendition_namespace(channel_id, "")
+        for namespace in [ns for ns in self.rendition_buffers if ns.startswith(prefix)]:
+            self.rendition_buffers.pop(namespace, None)
+
     def check_if_channel_exists(self, channel_id):
         """
         Check if a channel exists and is in a valid state.
@@ -744,6 +823,11 @@ class ProxyServer:
                 stop_key = RedisKeys.channel_stopping(channel_id)
                 self.redis_client.setex(stop_key, 10, "true")
 
+            # Local generators see the stop without waiting for a reconciliation poll
+            watcher = self.channel_watchers.pop(channel_id, None)
+            if watcher:
+                watcher.mark_stopping()
+
             # Only stop the actual stream manager if we're the owner
             if self.am_i_owner(channel_id):
                 logger.info(f"This worker ({self.worker_id}) is the owner - closing provider connection")
@@ -786,6 +870,8 @@ class ProxyServer:
                 del self.stream_managers[channel_id]
                 logger.info(f"Removed stream manager for channel {channel_id}")
 
+            self._stop_renditions(channel_id)
+
             # Stop buffer and ensure all its timers are cancelled - SAFE CHECK HERE
             if channel_id in self.stream_buffers:
                 buffer = self.stream_buffers[channel_id]
@@ -869,6 +955,11 @@ class ProxyServer:
                             # Extend ownership lease
                             self.extend_ownership(channel_id)
 
+                            # Keep renditions in line with what clients are watching
+                            renditions = self.rendition_managers.get(channel_id)
+                            if renditions:
+                                renditions.reconcile()
+
                             # Get channel state from metadata hash
                             channel_state = "unknown"
                             if self.redis_client:
@@ -1013,14 +1104,11 @@ class ProxyServer:
             return
 
         try:
-            # Get all active channel keys
-            channel_pattern = "ts_proxy:channel:*:metadata"
-            channel_keys = self.redis_client.keys(channel_pattern)
+            # Include stale entries - those are the channels whose owner stopped refreshing them
+            channel_ids = ChannelRegistry.get_channel_ids(self.redis_client, include_stale=True)
 
-            for key in channel_keys:
+            for channel_id in channel_ids:
                 try:
-                    channel_id = key.decode('utf-8').split(':')[2]
-
                     # Skip channels we already have locally
                     if channel_id in self.stream_buffers:
                         continue
@@ -1041,7 +1129,10 @@ class ProxyServer:
                             logger.info(f"Cleaning up orphaned channel {channel_id}")
                             self._clean_redis_keys(channel_id)
                 except Exception as e:
-                    logger.error(f"Error processing channel key {key}: {e}")
+                    logger.error(f"Error processing channel {channel_id}: {e}")
+
+            # Entries nobody has refreshed for a full TTL are gone for good
+            ChannelRegistry.prune(self.redis_client)
 
         except Exception as e:
             logger.error(f"Error checking orphaned channels: {e}")
@@ -1060,6 +1151,8 @@ class ProxyServer:
             return 0
 
         try:
+            ChannelRegistry.unregister(self.redis_client, channel_id)
+
             # Define key patterns to scan for
             patterns = [
                 f"ts_proxy:channel:{channel_id}:*",  # All channel keys
@@ -1092,8 +1185,12 @@ class ProxyServer:
         if not self.redis_client:
             return
 
+        # Keep every channel held by this worker in the active channel registry
+        local_channels = list(self.stream_buffers.keys())
+        ChannelRegistry.touch(self.redis_client, local_channels)
+
         # Refresh registry entries for channels we own
-        for channel_id in list(self.stream_buffers.keys()):
+        for channel_id in local_channels:
             # Use standard key pattern
             metadata_key = RedisKeys.channel_metadata(channel_id)
 
@@ -1134,6 +1231,10 @@ class ProxyServer:
             # Update the metadata
             self.redis_client.hset(metadata_key, mapping=update_data)
 
+            watcher = self.channel_watchers.get(channel_id)
+            if watcher:
+                watcher.set_state(new_state)
+
             # Log the transition
             logger.info(f"Channel {channel_id} state transition: {current_state or 'None'} -> {new_state}")
             return True
@@ -1159,6 +1260,12 @@ class ProxyServer:
                 del self.client_managers[channel_id]
                 logger.info(f"Non-owner cleanup: Removed client manager for channel {channel_id}")
 
+            self._stop_renditions(channel_id)
+
+            watcher = self.channel_watchers.pop(channel_id, None)
+            if watcher:
+                watcher.mark_stopping()
+
             return True
         except Exception as e:
             logger.error(f"Error cleaning up local resources: {e}", exc_info=True)
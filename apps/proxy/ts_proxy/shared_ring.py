@@ -0,0 +1,218 @@
+"""
+Shared-memory chunk ring for fan-out between worker processes on one host.
+
+The owner worker copies each chunk into a per-channel shared memory segment
+as well as Redis. Other workers on the same host map the segment and copy
+chunks out of it directly; Redis stays the source of truth for the buffer
+index and the fallback for anything the ring can't serve.
+
+Segments live on a tmpfs (/dev/shm) that is often small - 64MB by default in
+Docker - and touching pages of a segment the tmpfs can't back kills the
+process with SIGBUS. Rings are therefore only created when the space is there
+and are allocated up front, so running out fails cleanly at creation.
+"""
+
+import errno
+import hashlib
+import os
+import struct
+from multiprocessing import shared_memory, resource_tracker
+from .utils import get_logger
+
+logger = get_logger()
+
+# Segment header: magic, layout version, slot count, slot data size, owner token
+HEADER = struct.Struct("<4sIII16s")
+MAGIC = b"DTSR"
+VERSION = 2
+
+# Where POSIX shared memory lives on Linux, and the share of it rings leave for others
+SHM_PATH = "/dev/shm"
+SHM_RESERVE_FRACTION = 0.25
+
+# Slot header: seqlock sequence (odd while being written), chunk index, length
+SLOT_HEADER = struct.Struct("<QQI4x")
+
+def segment_name(channel_id):
+    """Shared memory name for a channel - short enough for every platform"""
+    return "dts_" + hashlib.sha1(str(channel_id).encode("utf-8")).hexdigest()[:16]
+
+def _attach(name):
+    """Map an existing segment without letting this process's tracker unlink it on exit"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 always registers the segment with the resource tracker
+        shm = shared_memory.SharedMemory(name=name)
+        try:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+        return shm
+
+def _check_free_space(size):
+    """Refuse a ring that would eat into the reserve kept free in shared memory"""
+    try:
+        stats = os.statvfs(SHM_PATH)
+    except OSError:
+        # No /dev/shm on this platform - creating the segment reports any shortage
+        return
+
+    free = stats.f_bavail * stats.f_frsize
+    reserve = stats.f_blocks * stats.f_frsize * SHM_RESERVE_FRACTION
+    if size > free - reserve:
+        raise OSError(errno.ENOSPC, f"{SHM_PATH} has {free} bytes free, a {size} byte ring would leave "
+                                    f"less than {SHM_RESERVE_FRACTION:.0%} of it")
+
+def _preallocate(shm, size):
+    """Back every page of a new segment now, so a full tmpfs fails here rather than with SIGBUS on write"""
+    fd = getattr(shm, "_fd", -1)
+    if fd >= 0 and hasattr(os, "posix_fallocate"):
+        os.posix_fallocate(fd, 0, size)
+
+class SharedChunkRing:
+    """
+    Fixed-size ring of chunk slots guarded by per-slot seqlocks.
+
+    There is a single writer (the channel owner). Readers never block it:
+    they copy a slot and retry via Redis if the sequence changed underneath
+    them or the slot now holds a different chunk.
+    """
+
+    def __init__(self, shm, slot_count, slot_size, token=None):
+        self.shm = shm
+        self.buf = shm.buf
+        self.slot_count = slot_count
+        self.slot_size = slot_size
+        self.slot_stride = SLOT_HEADER.size + slot_size
+        # Set on the writer only - identifies the segment it created
+        self.token = token
+
+    @property
+    def owner(self):
+        return self.token is not None
+
+    @classmethod
+    def create(cls, channel_id, slot_count, slot_size):
+        """
+        Create (or take over) the ring for a channel as its writer.
+
+        Raises:
+            OSError: If shared memory doesn't have room for the ring
+        """
+        name = segment_name(channel_id)
+        size = HEADER.size + slot_count * (SLOT_HEADER.size + slot_size)
+        _check_free_space(size)
+
+        try:
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            # Left behind by a previous owner - replace it so the layout matches ours
+            stale = _attach(name)
+            stale.close()
+            stale.unlink()
+            shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+
+        try:
+            _preallocate(shm, size)
+        except OSError:
+            shm.close()
+            shm.unlink()
+            raise
+
+        ring = cls(shm, slot_count, slot_size, token=os.urandom(16))
+        for slot in range(slot_count):
+            SLOT_HEADER.pack_into(ring.buf, ring._slot_offset(slot), 0, 0, 0)
+        HEADER.pack_into(ring.buf, 0, MAGIC, VERSION, slot_count, slot_size, ring.token)
+        logger.info(f"Created shared memory ring {name} for channel {channel_id} "
+                    f"({slot_count} slots of {slot_size} bytes)")
+        return ring
+
+    @classmethod
+    def attach(cls, channel_id):
+        """
+        Map the ring for a channel as a reader.
+
+        Returns:
+            SharedChunkRing: The ring, or None if no writer on this host has created one
+        """
+        try:
+            shm = _attach(segment_name(channel_id))
+        except FileNotFoundError:
+            return None
+
+        if shm.size < HEADER.size:
+            shm.close()
+            return None
+
+        magic, version, slot_count, slot_size, _ = HEADER.unpack_from(shm.buf, 0)
+        if magic != MAGIC or version != VERSION:
+            shm.close()
+            return None
+
+        return cls(shm, slot_count, slot_size)
+
+    def _slot_offset(self, slot):
+        return HEADER.size + slot * self.slot_stride
+
+    def write(self, chunk_index, data):
+        """
+        Copy a chunk into its slot.
+
+        Returns:
+            bool: False if the chunk is larger than a slot
+        """
+        length = len(data)
+        if length > self.slot_size:
+            return False
+
+        offset = self._slot_offset(chunk_index % self.slot_count)
+        seq = SLOT_HEADER.unpack_from(self.buf, offset)[0]
+
+        # Odd sequence marks the slot as being rewritten
+        SLOT_HEADER.pack_into(self.buf, offset, seq + 1, chunk_index, length)
+        data_offset = offset + SLOT_HEADER.size
+        self.buf[data_offset:data_offset + length] = data
+        SLOT_HEADER.pack_into(self.buf, offset, seq + 2, chunk_index, length)
+        return True
+
+    def read(self, chunk_index):
+        """
+        Copy a chunk out of the ring.
+
+        Returns:
+            bytes: The chunk, or None if its slot holds another chunk or is mid-write
+        """
+        offset = self._slot_offset(chunk_index % self.slot_count)
+        seq, slot_index, length = SLOT_HEADER.unpack_from(self.buf, offset)
+        if seq & 1 or slot_index != chunk_index or length > self.slot_size:
+            return None
+
+        data_offset = offset + SLOT_HEADER.size
+        data = bytes(self.buf[data_offset:data_offset + length])
+
+        # The writer lapped us while copying - the data may be torn
+        if SLOT_HEADER.unpack_from(self.buf, offset)[0] != seq:
+            return None
+        return data
+
+    def close(self):
+        """Unmap the ring, removing the segment if this process created it and it wasn't replaced since"""
+        self.buf = None
+        try:
+            self.shm.close()
+            if self.owner and self._segment_is_ours():
+                self.shm.unlink()
+        except Exception as e:
+            logger.debug(f"Error closing shared memory ring: {e}")
+
+    def _segment_is_ours(self):
+        """Check the segment under our name still carries our token - a new owner may have replaced it"""
+        try:
+            current = _attach(self.shm.name)
+        except FileNotFoundError:
+            return False
+        try:
+            return current.size >= HEADER.size and HEADER.unpack_from(current.buf, 0)[4] == self.token
+        finally:
+            current.close()
@@ -0,0 +1,261 @@
+"""
+Warm standby connections for instant stream failover.
+
+For channels flagged standby_failover the owner keeps the next alternate
+stream ready while the current one plays. In hold mode the standby stays
+connected and reads-and-discards, so a switch hands its live response to the
+StreamManager and the new stream is spliced in at the next packet boundary.
+In probe mode the alternate is only checked periodically, which costs less
+but still needs a fresh connect when switching.
+
+A standby counts against its M3U profile's max_streams like any other
+upstream connection, and is not started when the profile has no free slot.
+"""
+
+import itertools
+import threading
+import time
+from redis.exceptions import WatchError
+from apps.proxy.upstream_pool import get_upstream_pool
+from .constants import StandbyMode
+from .config_helper import ConfigHelper
+from .ts_packets import find_sync
+from .utils import get_logger
+
+logger = get_logger()
+
+def reserve_profile_slot(redis_client, profile_id, max_streams):
+    """
+    Take a connection slot on an M3U profile.
+
+    Returns:
+        bool: True if a slot was taken, False if the profile is full. Profiles
+        without a limit (max_streams 0) are never counted.
+    """
+    if not max_streams:
+        return True
+
+    key = f"profile_connections:{profile_id}"
+    if redis_client.incr(key) > max_streams:
+        redis_client.decr(key)
+        return False
+    return True
+
+def release_profile_slot(redis_client, profile_id):
+    """Give back a slot taken with reserve_profile_slot"""
+    key = f"profile_connections:{profile_id}"
+    with redis_client.pipeline() as pipe:
+        while True:
+            try:
+                # Decrement and clamp at zero in one transaction, so concurrent releases can't go negative
+                pipe.watch(key)
+                if int(pipe.get(key) or 0) <= 0:
+                    return
+                pipe.multi()
+                pipe.decr(key)
+                pipe.execute()
+                return
+            except WatchError:
+                # The count changed between the check and the decrement - look again
+                continue
+
+class StandbyHandoff:
+    """A held standby's live connection, ready for the StreamManager to read from"""
+
+    def __init__(self, url, response, chunks):
+        self.url = url
+        self.response = response
+        self.chunks = chunks
+
+class StandbyStream:
+    """Keeps one alternate stream warm for a channel"""
+
+    def __init__(self, channel_id, stream_info, redis_client, mode=None, chunk_size=None):
+        self.channel_id = channel_id
+        self.stream_info = stream_info
+        self.stream_id = stream_info['stream_id']
+        self.m3u_profile_id = stream_info['m3u_profile_id']
+        self.url = stream_info['url']
+        self.user_agent = stream_info['user_agent']
+        self.redis_client = redis_client
+        self.mode = mode or ConfigHelper.standby_mode()
+        self.chunk_size = chunk_size or ConfigHelper.chunk_size()
+
+        self.running = False
+        self.slot_reserved = False
+        self.ready = False
+        self.last_data_time = 0
+        self.bytes_discarded = 0
+
+        # Hold mode: the open response and the chunk iterator the StreamManager continues from
+        self.response = None
+        self.chunks = None
+        self.last_chunk = None
+        self.promote_requested = False
+        self.reader_done = threading.Event()
+
+    @property
+    def warm(self):
+        """Check if the standby delivered data recently enough to switch to"""
+        if not self.running or not self.ready:
+            return False
+        max_age = ConfigHelper.standby_stale_seconds()
+        if self.mode == StandbyMode.PROBE:
+            max_age += ConfigHelper.standby_probe_interval()
+        return time.time() - self.last_data_time < max_age
+
+    @property
+    def alive(self):
+        return self.running and not self.reader_done.is_set()
+
+    def start(self, max_streams):
+        """Reserve a profile slot and start keeping the stream warm"""
+        if self.redis_client:
+            try:
+                if not reserve_profile_slot(self.redis_client, self.m3u_profile_id, max_streams):
+                    logger.info(f"M3U profile {self.m3u_profile_id} has no free slot for a standby "
+                                f"on channel {self.channel_id}")
+                    return False
+                self.slot_reserved = bool(max_streams)
+            except Exception as e:
+                logger.error(f"Error reserving standby slot for channel {self.channel_id}: {e}")
+                return False
+
+        self.running = True
+        target = self._hold if self.mode == StandbyMode.HOLD else self._probe_loop
+        thread = threading.Thread(target=target, daemon=True)
+        thread.name = f"standby-{self.channel_id}-{self.stream_id}"
+        thread.start()
+
+        logger.info(f"Started {self.mode} standby for channel {self.channel_id} on stream {self.stream_id}")
+        return True
+
+    def _hold(self):
+        """Stay connected, reading and discarding until promoted or stopped"""
+        try:
+            response = get_upstream_pool().get(
+                self.url,
+                user_agent=self.user_agent,
+                stream=True,
+                timeout=(10, 60)
+            )
+            self.response = response
+            if response.status_code != 200:
+                logger.warning(f"Standby stream {self.stream_id} for channel {self.channel_id} "
+                               f"returned HTTP {response.status_code}")
+                return
+
+            self.chunks = response.iter_content(chunk_size=self.chunk_size)
+            for chunk in self.chunks:
+                if not chunk:
+                    continue
+                self.last_chunk = chunk
+                self.last_data_time = time.time()
+                self.ready = True
+                if self.promote_requested or not self.running:
+                    # Leave the iterator where it is - a promotion continues reading from it
+                    break
+                self.bytes_discarded += len(chunk)
+        except Exception as e:
+            if self.running:
+                logger.warning(f"Standby stream {self.stream_id} for channel {self.channel_id} failed: {e}")
+        finally:
+            if not self.promote_requested:
+                self.ready = False
+                self._close_response()
+            self.reader_done.set()
+
+    def _probe_loop(self):
+        """Check the stream periodically without holding a connection"""
+        try:
+            while self.running:
+                self._probe()
+                next_probe = time.time() + ConfigHelper.standby_probe_interval()
+                while self.running and time.time() < next_probe:
+                    time.sleep(0.5)
+        finally:
+            self.reader_done.set()
+
+    def _probe(self):
+        response = None
+        try:
+            response = get_upstream_pool().get(
+                self.url,
+                user_agent=self.user_agent,
+                stream=True,
+                timeout=(5, 10)
+            )
+            if response.status_code != 200:
+                logger.warning(f"Standby probe of stream {self.stream_id} for channel {self.channel_id} "
+                               f"returned HTTP {response.status_code}")
+                self.ready = False
+                return
+
+            probe_bytes = ConfigHelper.standby_probe_bytes()
+            data = bytearray()
+            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                data += chunk
+                if len(data) >= probe_bytes:
+                    break
+
+            self.ready = len(data) >= probe_bytes and find_sync(data) >= 0
+            if self.ready:
+                self.last_data_time = time.time()
+            else:
+                logger.warning(f"Standby probe of stream {self.stream_id} for channel {self.channel_id} "
+                               f"got {len(data)} bytes without TS sync")
+        except Exception as e:
+            self.ready = False
+            logger.warning(f"Standby probe of stream {self.stream_id} for channel {self.channel_id} failed: {e}")
+        finally:
+            if response is not None:
+                response.close()
+
+    def promote(self, timeout=1.0):
+        """
+        Take over the held connection for a switch.
+
+        The standby stops after this call either way; its profile slot is
+        released because the channel's own connection slot covers the stream.
+
+        Returns:
+            StandbyHandoff: The live connection starting at a packet boundary, or
+            None if the standby isn't held and warm
+        """
+        handoff = None
+        if self.mode == StandbyMode.HOLD and self.warm:
+            # The reader stops right after its next chunk, which is kept for the handoff
+            self.promote_requested = True
+            if self.reader_done.wait(timeout) and self.ready and self.chunks is not None:
+                pending = self.last_chunk
+                offset = find_sync(pending)
+                pending = pending[offset:] if offset >= 0 else b""
+                handoff = StandbyHandoff(self.url, self.response, itertools.chain((pending,), self.chunks))
+                self.response = None
+                self.chunks = None
+            else:
+                self.promote_requested = False
+
+        self.stop()
+        return handoff
+
+    def _close_response(self):
+        if self.response is not None:
+            try:
+                self.response.close()
+            except Exception as e:
+                logger.debug(f"Error closing standby response for channel {self.channel_id}: {e}")
+            self.response = None
+        self.chunks = None
+
+    def stop(self):
+        """Close the standby and give back its profile slot"""
+        self.running = False
+        self._close_response()
+
+        if self.slot_reserved and self.redis_client:
+            self.slot_reserved = False
+            try:
+                release_profile_slot(self.redis_client, self.m3u_profile_id)
+            except Exception as e:
+                logger.error(f"Error releasing standby slot for channel {self.channel_id}: {e}")
@@ -1,19 +1,32 @@
 """Buffer management for TS streams"""
 
+import asyncio
 import threading
 import logging
 import time
-from collections import deque
+import json
+from collections import deque, OrderedDict
 from typing import Optional, Deque
-import random
 from apps.proxy.config import TSConfig as Config
+from apps.proxy.ts_inspection import TSInspector
 from .redis_keys import RedisKeys
 from .config_helper import ConfigHelper
-from .constants import TS_PACKET_SIZE
+from .constants import TS_PACKET_SIZE, EventType, ChannelMetadataField
+from .ts_packets import (
+    find_sync, find_packet, find_last_packet, is_pat_start, random_access_indicator, RandomAccessTracker
+)
+from .shared_ring import SharedChunkRing
 from .utils import get_logger
 
 logger = get_logger()
 
+
+def _resolve_waiter(future):
+    """Complete an async chunk waiter unless it already timed out"""
+    if not future.done():
+        future.set_result(True)
+
+
 class StreamBuffer:
     """Manages stream data buffering with optimized chunk storage"""
 
@@ -27,9 +40,13 @@ class StreamBuffer:
         # STANDARDIZED KEYS: Use RedisKeys class instead of hardcoded patterns
         self.buffer_index_key = RedisKeys.buffer_index(channel_id) if channel_id else ""
         self.buffer_prefix = RedisKeys.buffer_chunk_prefix(channel_id) if channel_id else ""
+        self._chunk_key_prefix = self.buffer_prefix.encode('utf-8')
 
         self.chunk_ttl = ConfigHelper.redis_chunk_ttl()
 
+        # When self.index was last confirmed by Redis or a writer notification
+        self._index_refreshed_at = 0.0
+
         # Initialize from Redis if available
         if self.redis_client and channel_id:
             try:
@@ -37,64 +54,109 @@ class StreamBuffer:
                 if current_index:
                     self.index = int(current_index)
                     logger.info(f"Initialized buffer from Redis with index {self.index}")
+                self._index_refreshed_at = time.time()
             except Exception as e:
                 logger.error(f"Error initializing buffer from Redis: {e}")
 
-        self._write_buffer = bytearray()
         self.target_chunk_size = ConfigHelper.get('BUFFER_CHUNK_SIZE', TS_PACKET_SIZE * 5644)  # ~1MB default
+        self._allocate_write_buffer()
+
+        # Chunk size follows the ingest bitrate reported by the stream manager
+        self.adaptive_chunk_size = ConfigHelper.adaptive_chunk_size()
+        self.chunk_target_seconds = ConfigHelper.chunk_target_seconds()
+        self.min_chunk_size = ConfigHelper.min_buffer_chunk_size()
+        self.max_chunk_size = ConfigHelper.max_buffer_chunk_size()
+        self.chunk_resize_threshold = ConfigHelper.chunk_resize_threshold()
+        self.ingest_bitrate = 0
+
+        # Fast start: small chunks from a PAT/keyframe boundary right after channel init
+        self.fast_start_until = None
+        self._normal_chunk_size = self.target_chunk_size
+        self._seeking_start = False
+        self._seek_buffer = bytearray()
+        self._seek_scan_pos = 0
+        self._awaiting_keyframe = False
+        self.startup_started_at = None
+        self.startup_metrics = {}
+
+        # Keyframe join point: latest (chunk_index, offset, PAT/PMT bytes) for new clients
+        self.join_tracker = RandomAccessTracker()
+        self.join_point = None
+
+        # Continuity, null packet and PCR counters over every chunk written
+        self.inspector = TSInspector() if ConfigHelper.ts_inspection() else None
+
+        # Copy accounting for the ingest path
+        self.bytes_ingested = 0
+        self.bytes_copied = 0
 
         # Track timers for proper cleanup
         self.stopping = False
         self.fill_timers = []
 
+        # In-memory ring of recent chunks (only populated on the worker that writes them)
+        self.local_buffer_chunks = ConfigHelper.local_buffer_chunks()
+        self._local_chunks = OrderedDict()
+        self._is_writer = False
+
+        # Read statistics for local ring vs Redis
+        self.local_hits = 0
+        self.local_misses = 0
+        self.bytes_from_memory = 0
+        self.bytes_from_redis = 0
+
+        # Optional shared memory ring so same-host workers skip Redis for chunk data
+        self.shared_ring_enabled = ConfigHelper.shared_memory_ring()
+        self.shared_ring = None
+        self._shared_ring_retry_at = 0.0
+        self._shared_ring_misses = 0
+        self.shared_hits = 0
+        self.bytes_from_shared_memory = 0
+
+        # When recent chunk indexes became available, for client lag in seconds
+        self._index_times = OrderedDict()
+        self._index_times_lock = threading.Lock()
+
+        # Readers block on this until a new chunk index is available
+        self._chunk_available = threading.Condition()
+        self._async_waiters = set()
+
+    def _allocate_write_buffer(self):
+        """Preallocate the accumulator that assembles packet-aligned chunks in place"""
+        # Chunks must hold whole TS packets so readers never see a split packet
+        self.target_chunk_size = max(
+            self.TS_PACKET_SIZE,
+            (self.target_chunk_size // self.TS_PACKET_SIZE) * self.TS_PACKET_SIZE
+        )
+        self._write_buffer = bytearray(self.target_chunk_size)
+        self._write_view = memoryview(self._write_buffer)
+        self._write_pos = 0
+
     def add_chunk(self, chunk):
         """Add data with optimized Redis storage and TS packet alignment"""
         if not chunk:
             return False
 
         try:
-            # Accumulate partial packets between chunks
-            if not hasattr(self, '_partial_packet'):
-                self._partial_packet = bytearray()
-
-            # Combine with any previous partial packet
-            combined_data = bytearray(self._partial_packet) + bytearray(chunk)
-
-            # Calculate complete packets
-            complete_packets_size = (len(combined_data) // self.TS_PACKET_SIZE) * self.TS_PACKET_SIZE
+            data = memoryview(chunk).cast('B')
+            self.bytes_ingested += len(data)
+            self._record_startup_metric(ChannelMetadataField.TIME_TO_FIRST_BYTE)
 
-            if complete_packets_size == 0:
-                # Not enough data for a complete packet
-                self._partial_packet = combined_data
-                return True
-
-            # Split into complete packets and remainder
-            complete_packets = combined_data[:complete_packets_size]
-            self._partial_packet = combined_data[complete_packets_size:]
-
-            # Add completed packets to write buffer
-            self._write_buffer.extend(complete_packets)
-
-            # Only write to Redis when we have enough data for an optimized chunk
-            writes_done = 0
             with self.lock:
-                while len(self._write_buffer) >= self.target_chunk_size:
-                    # Extract a full chunk
-                    chunk_data = self._write_buffer[:self.target_chunk_size]
-                    self._write_buffer = self._write_buffer[self.target_chunk_size:]
+                if self._seeking_start:
+                    # Hold data back until a clean start boundary is found
+                    data = self._seek_start_boundary(data)
+                    if data is None:
+                        return True
 
-                    # Write optimized chunk to Redis
-                    if self.redis_client:
-                        chunk_index = self.redis_client.incr(self.buffer_index_key)
-                        chunk_key = RedisKeys.buffer_chunk(self.channel_id, chunk_index)
-                        self.redis_client.setex(chunk_key, self.chunk_ttl, bytes(chunk_data))
+                writes_done = self._write_locked(data)
 
-                        # Update local tracking
-                        self.index = chunk_index
-                        writes_done += 1
+                if self.fast_start_until and time.time() >= self.fast_start_until:
+                    writes_done += self._end_fast_start_locked()
 
             if writes_done > 0:
                 logger.debug(f"Added {writes_done} chunks ({self.target_chunk_size} bytes each) to Redis for channel {self.channel_id} at index {self.index}")
+                self._notify_new_chunks()
 
             return True
 
@@ -102,12 +164,257 @@ class StreamBuffer:
             logger.error(f"Error adding chunk to buffer: {e}")
             return False
 
-    def get_chunks(self, start_index=None):
-        """Get chunks from the buffer with detailed logging"""
+    def discard_partial_packet(self):
+        """Drop a trailing partial packet so data from a new connection starts on a packet boundary"""
+        with self.lock:
+            self._write_pos -= self._write_pos % self.TS_PACKET_SIZE
+            if self.inspector:
+                # The new source numbers its packets independently
+                self.inspector.reset()
+
+    def _write_locked(self, data):
+        """Copy data into the accumulator, flushing each full chunk. Caller holds self.lock."""
+        total = len(data)
+        offset = 0
+        writes_done = 0
+
+        while offset < total:
+            # Copy as much as fits straight into the accumulator
+            take = min(self.target_chunk_size - self._write_pos, total - offset)
+            self._write_view[self._write_pos:self._write_pos + take] = data[offset:offset + take]
+            self._write_pos += take
+            offset += take
+            self.bytes_copied += take
+
+            if self._write_pos < self.target_chunk_size:
+                break
+
+            # Accumulator is full - since its size is a multiple of 188 the
+            # chunk is packet aligned and any partial packet stays in the carry
+            chunk_bytes = bytes(self._write_view)
+            self.bytes_copied += len(chunk_bytes)
+            self._write_pos = 0
+
+            random_access = self.join_tracker.scan(chunk_bytes)
+            if self.inspector:
+                self.inspector.inspect(chunk_bytes)
+            if self._awaiting_keyframe and random_access >= 0:
+                self._awaiting_keyframe = False
+                self._record_startup_metric(ChannelMetadataField.TIME_TO_KEYFRAME)
+
+            # Write optimized chunk to Redis
+            if self.redis_client:
+                chunk_index = self.redis_client.incr(self.buffer_index_key)
+                chunk_key = self._chunk_key_prefix + b'%d' % chunk_index
+                self.redis_client.setex(chunk_key, self.chunk_ttl, chunk_bytes)
+                # This worker writes the chunks, so its own index and join point are authoritative
+                self._is_writer = True
+
+                # Keep the same bytes object in memory for local readers
+                self._store_local_chunk(chunk_index, chunk_bytes)
+                if self.shared_ring_enabled:
+                    self._store_shared_chunk(chunk_index, chunk_bytes)
+
+                # Update local tracking
+                self.index = chunk_index
+                writes_done += 1
+
+                if random_access >= 0:
+                    self._set_join_point(chunk_index, random_access)
+
+                if self.startup_started_at and ChannelMetadataField.TIME_TO_FIRST_CHUNK not in self.startup_metrics:
+                    self._record_startup_metric(ChannelMetadataField.TIME_TO_FIRST_CHUNK)
+
+        return writes_done
+
+    def _set_join_point(self, chunk_index, offset):
+        """Publish a chunk's random access point as the join point for new clients"""
+        psi = self.join_tracker.psi
+        if psi is None:
+            return
+
+        self.join_point = (chunk_index, offset, psi)
         try:
-            request_id = f"req_{random.randint(1000, 9999)}"
-            logger.debug(f"[{request_id}] get_chunks called with start_index={start_index}")
+            join_key = RedisKeys.buffer_join_point(self.channel_id)
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.hset(join_key, mapping={'index': chunk_index, 'offset': offset, 'psi': psi})
+            pipe.expire(join_key, self.chunk_ttl)
+            pipe.execute()
+        except Exception as e:
+            logger.debug(f"Error storing join point for channel {self.channel_id}: {e}")
+
+    def get_join_point(self):
+        """
+        Get the latest point where a new client can start decoding cleanly.
+
+        Returns:
+            tuple: (chunk_index, byte_offset, psi_bytes) or None if no keyframe is known
+        """
+        if self._is_writer or not self.redis_client:
+            return self.join_point
+
+        try:
+            return self._parse_join_point(self.redis_client.hgetall(RedisKeys.buffer_join_point(self.channel_id)))
+        except Exception as e:
+            logger.debug(f"Error reading join point for channel {self.channel_id}: {e}")
+        return None
+
+    async def get_join_point_async(self, async_redis):
+        """Async variant of get_join_point for ASGI generators"""
+        if self._is_writer or not async_redis:
+            return self.join_point
+
+        try:
+            return self._parse_join_point(await async_redis.hgetall(RedisKeys.buffer_join_point(self.channel_id)))
+        except Exception as e:
+            logger.debug(f"Error reading join point for channel {self.channel_id}: {e}")
+        return None
+
+    def _parse_join_point(self, data):
+        """Turn the join point hash read from Redis into a (chunk_index, byte_offset, psi_bytes) tuple"""
+        if data and b'index' in data and b'psi' in data:
+            return int(data[b'index']), int(data[b'offset']), data[b'psi']
+        return None
+
+    def update_bitrate(self, bitrate_bps):
+        """
+        Pick a chunk size that holds chunk_target_seconds of stream at the given bitrate.
+
+        Returns:
+            bool: True if the chunk size changed
+        """
+        self.ingest_bitrate = bitrate_bps
+        if not self.adaptive_chunk_size or bitrate_bps <= 0:
+            return False
+
+        ideal = int(bitrate_bps / 8 * self.chunk_target_seconds)
+        ideal = max(self.min_chunk_size, min(self.max_chunk_size, ideal))
+        ideal = (ideal // self.TS_PACKET_SIZE) * self.TS_PACKET_SIZE
+
+        # Hysteresis so bitrate jitter doesn't reallocate the accumulator constantly
+        if abs(ideal - self._normal_chunk_size) <= self._normal_chunk_size * self.chunk_resize_threshold:
+            return False
 
+        with self.lock:
+            old_size = self._normal_chunk_size
+            self._normal_chunk_size = ideal
+
+            # During fast start the new size is applied when the window ends
+            writes_done = 0 if self.fast_start_until else self._resize_locked(ideal)
+
+        logger.info(f"Buffer chunk size for channel {self.channel_id} changed {old_size} -> {ideal} bytes "
+                    f"(ingest {bitrate_bps / 1000000:.2f} Mbps)")
+
+        if writes_done > 0:
+            self._notify_new_chunks()
+        return True
+
+    def _resize_locked(self, new_size):
+        """Reallocate the accumulator at a new chunk size. Caller holds self.lock."""
+        pending = bytes(self._write_view[:self._write_pos])
+        self.target_chunk_size = new_size
+        self._allocate_write_buffer()
+
+        # Carry buffered data over - a smaller size may flush it right away
+        return self._write_locked(memoryview(pending)) if pending else 0
+
+    def start_fast_start(self):
+        """
+        Enter low-latency start mode for a freshly initialized channel.
+
+        The first data is held back until a PAT (ideally followed by a keyframe)
+        is found, then flushed in small chunks for FAST_START_SECONDS before
+        switching back to normal chunking.
+        """
+        self.startup_started_at = time.time()
+        self.startup_metrics = {}
+        self._awaiting_keyframe = True
+
+        if not ConfigHelper.fast_start_enabled():
+            return
+
+        with self.lock:
+            self.fast_start_until = self.startup_started_at + ConfigHelper.fast_start_seconds()
+            self._seeking_start = True
+            self._seek_buffer = bytearray()
+            self._seek_scan_pos = 0
+            self._resize_locked(ConfigHelper.fast_start_chunk_size())
+
+        logger.info(f"Fast start enabled for channel {self.channel_id} ({self.target_chunk_size} byte chunks)")
+
+    def _seek_start_boundary(self, data):
+        """
+        Buffer data until a clean start point is found. Caller holds self.lock.
+
+        Prefers the last PAT before the first keyframe, then a keyframe, then a PAT.
+        Gives up after FAST_START_MAX_SEEK_BYTES or FAST_START_SEEK_TIMEOUT seconds and
+        starts at the first packet boundary.
+
+        Returns:
+            memoryview: Data from the chosen boundary, or None to keep waiting
+        """
+        buf = self._seek_buffer
+        buf.extend(data)
+
+        sync = find_sync(buf)
+        if sync < 0:
+            if len(buf) > ConfigHelper.fast_start_max_seek_bytes():
+                # Not TS at all - don't hold data back forever
+                sync = 0
+            else:
+                return None
+
+        # Only scan packets not checked on a previous call
+        scan_from = sync if self._seek_scan_pos < sync else self._seek_scan_pos
+        keyframe = find_packet(buf, random_access_indicator, scan_from)
+        whole_packets = (len(buf) - sync) // TS_PACKET_SIZE
+        self._seek_scan_pos = sync + whole_packets * TS_PACKET_SIZE
+
+        if keyframe >= 0:
+            self._awaiting_keyframe = False
+            self._record_startup_metric(ChannelMetadataField.TIME_TO_KEYFRAME)
+            pat = find_last_packet(buf, is_pat_start, sync, keyframe)
+            start = pat if pat >= 0 else keyframe
+            boundary = "PAT+keyframe" if pat >= 0 else "keyframe"
+        elif (len(buf) >= ConfigHelper.fast_start_max_seek_bytes() or
+              time.time() - self.startup_started_at >= ConfigHelper.fast_start_seek_timeout()):
+            pat = find_packet(buf, is_pat_start, sync)
+            start = pat if pat >= 0 else sync
+            boundary = "PAT" if pat >= 0 else "packet"
+        else:
+            return None
+
+        logger.info(f"Fast start for channel {self.channel_id} beginning at {boundary} boundary "
+                    f"(skipped {start} of {len(buf)} buffered bytes)")
+        self._seeking_start = False
+        self._seek_buffer = bytearray()
+        self._seek_scan_pos = 0
+        return memoryview(buf)[start:]
+
+    def _end_fast_start_locked(self):
+        """Switch from fast start back to normal chunking. Caller holds self.lock."""
+        self.fast_start_until = None
+        self._awaiting_keyframe = False
+        logger.info(f"Fast start finished for channel {self.channel_id}, using {self._normal_chunk_size} byte chunks")
+        return self._resize_locked(self._normal_chunk_size)
+
+    def _record_startup_metric(self, field):
+        """Record seconds since start_fast_start for a startup milestone, once"""
+        if not self.startup_started_at or field in self.startup_metrics:
+            return
+
+        elapsed = round(time.time() - self.startup_started_at, 3)
+        self.startup_metrics[field] = elapsed
+
+        if self.redis_client:
+            try:
+                self.redis_client.hset(RedisKeys.channel_metadata(self.channel_id), field, str(elapsed))
+            except Exception as e:
+                logger.debug(f"Error storing {field} for channel {self.channel_id}: {e}")
+
+    def get_chunks(self, start_index=None):
+        """Get chunks from the buffer, reading more the further behind start_index is"""
+        try:
             if not self.redis_client:
                 logger.error("Redis not available, cannot retrieve chunks")
                 return []
@@ -115,10 +422,8 @@ class StreamBuffer:
             # If no start_index provided, use most recent chunks
             if start_index is None:
                 start_index = max(0, self.index - 10)  # Start closer to current position
-                logger.debug(f"[{request_id}] No start_index provided, using {start_index}")
 
-            # Get current index from Redis
-            current_index = int(self.redis_client.get(self.buffer_index_key) or 0)
+            current_index = self._current_index()
 
             # Calculate range of chunks to retrieve
             start_id = start_index + 1
@@ -127,52 +432,27 @@ class StreamBuffer:
             # Adaptive chunk retrieval based on how far behind
             if chunks_behind > 100:
                 fetch_count = 15
-                logger.debug(f"[{request_id}] Client very behind ({chunks_behind} chunks), fetching {fetch_count}")
             elif chunks_behind > 50:
                 fetch_count = 10
-                logger.debug(f"[{request_id}] Client moderately behind ({chunks_behind} chunks), fetching {fetch_count}")
             elif chunks_behind > 20:
                 fetch_count = 5
-                logger.debug(f"[{request_id}] Client slightly behind ({chunks_behind} chunks), fetching {fetch_count}")
             else:
                 fetch_count = 3
-                logger.debug(f"[{request_id}] Client up-to-date (only {chunks_behind} chunks behind), fetching {fetch_count}")
 
             end_id = min(current_index + 1, start_id + fetch_count)
-
             if start_id >= end_id:
-                logger.debug(f"[{request_id}] No new chunks to fetch (start_id={start_id}, end_id={end_id})")
                 return []
 
-            # Log the range we're retrieving
-            logger.debug(f"[{request_id}] Retrieving chunks {start_id} to {end_id-1} (total: {end_id-start_id})")
-
-            # Directly fetch from Redis using pipeline for efficiency
-            pipe = self.redis_client.pipeline()
-            for idx in range(start_id, end_id):
-                chunk_key = RedisKeys.buffer_chunk(self.channel_id, idx)
-                pipe.get(chunk_key)
-
-            results = pipe.execute()
-
-            # Process results
+            results = self.redis_client.mget(self._chunk_keys(range(start_id, end_id)))
             chunks = [result for result in results if result is not None]
 
-            # Count non-None results
-            found_chunks = len(chunks)
-            missing_chunks = len(results) - found_chunks
-
-            if missing_chunks > 0:
-                logger.debug(f"[{request_id}] Missing {missing_chunks}/{len(results)} chunks in Redis")
-
             # Update local tracking
             if chunks:
-                self.index = end_id - 1
+                self.index = max(self.index, end_id - 1)
 
-            # Final log message
-            chunk_sizes = [len(c) for c in chunks]
-            total_bytes = sum(chunk_sizes) if chunks else 0
-            logger.debug(f"[{request_id}] Returning {len(chunks)} chunks ({total_bytes} bytes)")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"get_chunks({start_index}) for channel {self.channel_id}: {chunks_behind} chunks behind, "
+                             f"returning {len(chunks)}/{len(results)} chunks ({sum(len(c) for c in chunks)} bytes)")
 
             return chunks
 
@@ -187,46 +467,357 @@ class StreamBuffer:
                 logger.error("Redis not available, cannot retrieve chunks")
                 return []
 
-            # Calculate range to retrieve
-            start_id = start_index + 1
-            end_id = start_id + count
-
-            # Get current buffer position
-            current_index = int(self.redis_client.get(self.buffer_index_key) or 0)
-
-            # If requesting beyond current buffer, return what we have
-            if start_id > current_index:
+            read_range = self._exact_read_range(start_index, count, self._current_index())
+            if not read_range:
                 return []
+            start_id, end_id = read_range
 
-            # Cap end at current buffer position
-            end_id = min(end_id, current_index + 1)
+            # Serve from the in-memory ring first, fall back to Redis for the rest
+            results, missing = self._read_local_chunks(start_id, end_id)
+            if missing:
+                self._merge_redis_chunks(results, missing, self.redis_client.mget(self._chunk_keys(missing)))
 
-            # Directly fetch from Redis using pipeline
-            pipe = self.redis_client.pipeline()
-            for idx in range(start_id, end_id):
-                chunk_key = RedisKeys.buffer_chunk(self.channel_id, idx)
-                pipe.get(chunk_key)
+            return self._ordered_chunks(results, start_id, end_id)
 
-            results = pipe.execute()
+        except Exception as e:
+            logger.error(f"Error getting exact chunks: {e}", exc_info=True)
+            return []
 
-            # Filter out None results
-            chunks = [result for result in results if result is not None]
+    async def get_chunks_exact_async(self, start_index, count, async_redis):
+        """Async variant of get_chunks_exact for ASGI generators"""
+        try:
+            if self._index_is_fresh():
+                current_index = self.index
+            else:
+                current_index = self._refresh_index(await async_redis.get(self.buffer_index_key))
 
-            # Update local index if needed
-            if chunks and start_id + len(chunks) - 1 > self.index:
-                self.index = start_id + len(chunks) - 1
+            read_range = self._exact_read_range(start_index, count, current_index)
+            if not read_range:
+                return []
+            start_id, end_id = read_range
 
-            return chunks
+            results, missing = self._read_local_chunks(start_id, end_id)
+            if missing:
+                self._merge_redis_chunks(results, missing, await async_redis.mget(self._chunk_keys(missing)))
+
+            return self._ordered_chunks(results, start_id, end_id)
 
         except Exception as e:
             logger.error(f"Error getting exact chunks: {e}", exc_info=True)
             return []
 
+    def _index_is_fresh(self):
+        """Check if self.index can be trusted without asking Redis"""
+        return self._is_writer or time.time() - self._index_refreshed_at < self.INDEX_CACHE_SECONDS
+
+    def _refresh_index(self, value):
+        """Adopt the buffer index read from Redis, returning it"""
+        current_index = int(value or 0)
+        if current_index > self.index:
+            self.index = current_index
+        self._index_refreshed_at = time.time()
+        return current_index
+
+    def _current_index(self):
+        """
+        Get the current buffer index.
+
+        The writer always knows it and other workers learn it from chunk
+        notifications; Redis is only asked when neither has updated it within
+        INDEX_CACHE_SECONDS, in case a notification was missed.
+        """
+        if self._index_is_fresh():
+            return self.index
+        return self._refresh_index(self.redis_client.get(self.buffer_index_key))
+
+    def _chunk_keys(self, indexes):
+        """Redis keys for chunk indexes, built from the precomputed channel prefix"""
+        prefix = self._chunk_key_prefix
+        return [prefix + b'%d' % idx for idx in indexes]
+
+    def _exact_read_range(self, start_index, count, current_index):
+        """Calculate the (start_id, end_id) chunk range to read, or None if nothing is available"""
+        start_id = start_index + 1
+        end_id = start_id + count
+
+        # If requesting beyond current buffer, return what we have
+        if start_id > current_index:
+            return None
+
+        # Cap end at current buffer position
+        return start_id, min(end_id, current_index + 1)
+
+    def _read_local_chunks(self, start_id, end_id):
+        """Serve chunks from the in-memory ring, returning hits and the indexes that are missing"""
+        results = {}
+        missing = []
+        for idx in range(start_id, end_id):
+            chunk = self._local_chunks.get(idx)
+            if chunk is not None:
+                results[idx] = chunk
+            else:
+                missing.append(idx)
+
+        if results:
+            self.local_hits += len(results)
+            self.bytes_from_memory += sum(len(c) for c in results.values())
+        if missing:
+            self.local_misses += len(missing)
+            if self.shared_ring_enabled and not self._is_writer:
+                missing = self._read_shared_chunks(results, missing)
+
+        return results, missing
+
+    def _read_shared_chunks(self, results, missing):
+        """Serve chunks from the same-host shared memory ring, returning the indexes still missing"""
+        ring = self._get_shared_ring()
+        if not ring:
+            return missing
+
+        still_missing = []
+        for idx in missing:
+            chunk = ring.read(idx)
+            if chunk is not None:
+                results[idx] = chunk
+                self.shared_hits += 1
+                self.bytes_from_shared_memory += len(chunk)
+            else:
+                still_missing.append(idx)
+
+        # A ring that never has what we ask for was likely replaced by a new owner
+        if still_missing and len(still_missing) == len(missing):
+            self._shared_ring_misses += 1
+            if self._shared_ring_misses >= 50:
+                logger.debug(f"Shared memory ring for channel {self.channel_id} keeps missing, remapping")
+                self._close_shared_ring()
+        else:
+            self._shared_ring_misses = 0
+
+        return still_missing
+
+    def _get_shared_ring(self):
+        """Map the channel's shared memory ring if a writer on this host created one"""
+        if self.shared_ring or time.time() < self._shared_ring_retry_at:
+            return self.shared_ring
+
+        try:
+            self.shared_ring = SharedChunkRing.attach(self.channel_id)
+        except Exception as e:
+            logger.debug(f"Error attaching shared memory ring for channel {self.channel_id}: {e}")
+            self.shared_ring = None
+
+        if not self.shared_ring:
+            # Owner is on another host or hasn't written yet - Redis serves everything meanwhile
+            self._shared_ring_retry_at = time.time() + 5
+        return self.shared_ring
+
+    def _shared_slot_size(self, chunk_length=0):
+        """Slot size for the shared ring: the settled chunk size plus headroom for small resizes"""
+        size = max(self._normal_chunk_size, chunk_length)
+        size += size // 4
+        return -(-size // self.TS_PACKET_SIZE) * self.TS_PACKET_SIZE
+
+    def _store_shared_chunk(self, chunk_index, chunk_bytes):
+        """Copy a chunk into the shared memory ring, creating it on first use"""
+        try:
+            ring = self.shared_ring
+            chunk_length = len(chunk_bytes)
+            # Slots follow the chunk size - rebuild when chunks outgrow them or shrink well below
+            if ring and (chunk_length > ring.slot_size or ring.slot_size > 2 * self._shared_slot_size()):
+                self._close_shared_ring()
+                ring = None
+            if not ring:
+                ring = SharedChunkRing.create(self.channel_id, ConfigHelper.shared_memory_ring_slots(),
+                                              self._shared_slot_size(chunk_length))
+                self.shared_ring = ring
+            ring.write(chunk_index, chunk_bytes)
+        except Exception as e:
+            logger.warning(f"Disabling shared memory ring for channel {self.channel_id}, readers use Redis: {e}")
+            self.shared_ring_enabled = False
+            self._close_shared_ring()
+
+    def _close_shared_ring(self):
+        """Unmap the shared memory ring (and remove it if we created it)"""
+        ring, self.shared_ring = self.shared_ring, None
+        self._shared_ring_misses = 0
+        if ring:
+            ring.close()
+
+    def _merge_redis_chunks(self, results, missing, fetched):
+        """Add chunks fetched from Redis to the results"""
+        for idx, result in zip(missing, fetched):
+            if result is not None:
+                results[idx] = result
+                self.bytes_from_redis += len(result)
+
+    def _ordered_chunks(self, results, start_id, end_id):
+        """Filter out missing chunks while keeping index order"""
+        chunks = [results[idx] for idx in range(start_id, end_id) if idx in results]
+
+        # Update local index if needed
+        if chunks and start_id + len(chunks) - 1 > self.index:
+            self.index = start_id + len(chunks) - 1
+
+        return chunks
+
+    def _store_local_chunk(self, chunk_index, chunk_bytes):
+        """Keep a chunk in the in-memory ring, evicting the oldest entries"""
+        if self.local_buffer_chunks <= 0:
+            return
+
+        self._local_chunks[chunk_index] = chunk_bytes
+        while len(self._local_chunks) > self.local_buffer_chunks:
+            self._local_chunks.popitem(last=False)
+
+    def _wake_readers(self):
+        """Wake threads blocked in wait_for_chunks and coroutines in wait_for_chunks_async"""
+        with self._chunk_available:
+            self._chunk_available.notify_all()
+            waiters = self._async_waiters
+            self._async_waiters = set()
+
+        for loop, future in waiters:
+            try:
+                loop.call_soon_threadsafe(_resolve_waiter, future)
+            except RuntimeError:
+                # Event loop already closed
+                pass
+
+    def _notify_new_chunks(self):
+        """Wake local readers and tell other workers a new chunk index exists"""
+        self._record_index_time(self.index)
+        self._wake_readers()
+
+        if self.redis_client:
+            try:
+                event_data = {
+                    "event": EventType.CHUNK_AVAILABLE,
+                    "channel_id": self.channel_id,
+                    "index": self.index
+                }
+                self.redis_client.publish(RedisKeys.events_channel(self.channel_id), json.dumps(event_data))
+            except Exception as e:
+                logger.debug(f"Error publishing chunk notification for channel {self.channel_id}: {e}")
+
+    def notify_index(self, index):
+        """Record a chunk index announced by the writing worker and wake local readers"""
+        if index <= self.index:
+            return
+
+        self.index = index
+        self._index_refreshed_at = time.time()
+        self._record_index_time(index)
+        self._wake_readers()
+
+    def _record_index_time(self, index):
+        """Remember when a chunk index became available"""
+        with self._index_times_lock:
+            self._index_times[index] = time.time()
+            while len(self._index_times) > self.INDEX_TIME_HISTORY:
+                self._index_times.popitem(last=False)
+
+    def chunk_age(self, index):
+        """
+        Get how long ago a chunk became available.
+
+        Chunks flushed together share the time of the last index announced;
+        chunks older than the tracked history report the oldest known time.
+
+        Returns:
+            float: Seconds since the chunk was available, 0.0 if it isn't yet
+        """
+        if index > self.index:
+            return 0.0
+
+        available_at = None
+        with self._index_times_lock:
+            for idx in reversed(self._index_times):
+                if idx < index:
+                    break
+                available_at = self._index_times[idx]
+            if available_at is None and self._index_times:
+                available_at = next(iter(self._index_times.values()))
+
+        return time.time() - available_at if available_at else 0.0
+
+    def wait_for_chunks(self, client_index, timeout):
+        """
+        Block until the buffer has advanced beyond client_index or timeout expires.
+
+        Returns:
+            bool: True if new chunks are available
+        """
+        with self._chunk_available:
+            if self.index > client_index or self.stopping:
+                return self.index > client_index
+            self._chunk_available.wait(timeout)
+        return self.index > client_index
+
+    async def wait_for_chunks_async(self, client_index, timeout):
+        """
+        Async variant of wait_for_chunks - suspends the coroutine instead of a thread.
+
+        Returns:
+            bool: True if new chunks are available
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        waiter = (loop, future)
+
+        with self._chunk_available:
+            if self.index > client_index or self.stopping:
+                return self.index > client_index
+            self._async_waiters.add(waiter)
+
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._chunk_available:
+                self._async_waiters.discard(waiter)
+
+        return self.index > client_index
+
+    def get_read_stats(self):
+        """Get hit rate and byte counters for the in-memory ring vs Redis"""
+        total_reads = self.local_hits + self.local_misses
+        return {
+            'ring_chunks': len(self._local_chunks),
+            'ring_capacity': self.local_buffer_chunks,
+            'hits': self.local_hits,
+            'misses': self.local_misses,
+            'hit_rate': round(self.local_hits / total_reads, 4) if total_reads else 0.0,
+            'bytes_from_memory': self.bytes_from_memory,
+            'shared_memory_ring': bool(self.shared_ring),
+            'shared_hits': self.shared_hits,
+            'bytes_from_shared_memory': self.bytes_from_shared_memory,
+            'bytes_from_redis': self.bytes_from_redis,
+        }
+
+    def get_write_stats(self):
+        """Get copy accounting for the ingest path"""
+        return {
+            'chunk_size': self.target_chunk_size,
+            'adaptive_chunk_size': self.adaptive_chunk_size,
+            'ingest_bitrate': self.ingest_bitrate,
+            'fast_start': bool(self.fast_start_until),
+            'startup': dict(self.startup_metrics),
+            'pending_bytes': self._write_pos,
+            'bytes_ingested': self.bytes_ingested,
+            'bytes_copied': self.bytes_copied,
+            'copies_per_byte': round(self.bytes_copied / self.bytes_ingested, 3) if self.bytes_ingested else 0.0,
+            'stream_quality': self.inspector.totals.to_dict() if self.inspector else None,
+        }
+
     def stop(self):
         """Stop the buffer and cancel all timers"""
         # Set stopping flag first to prevent new timer creation
         self.stopping = True
 
+        # Wake any readers blocked waiting for new chunks
+        self._wake_readers()
+
         # Cancel all pending timers
         timers_cancelled = 0
         for timer in list(self.fill_timers):
@@ -245,12 +836,12 @@ class StreamBuffer:
 
         try:
             # Flush any remaining data in the write buffer
-            if hasattr(self, '_write_buffer') and len(self._write_buffer) > 0:
-                # Ensure remaining data is aligned to TS packets
-                complete_size = (len(self._write_buffer) // 188) * 188
+            if self._write_pos > 0:
+                # Ensure remaining data is aligned to TS packets, dropping the carry
+                complete_size = (self._write_pos // self.TS_PACKET_SIZE) * self.TS_PACKET_SIZE
 
                 if complete_size > 0:
-                    final_chunk = self._write_buffer[:complete_size]
+                    final_chunk = bytes(self._write_view[:complete_size])
 
                     # Write final chunk to Redis
                     with self.lock:
@@ -258,61 +849,96 @@ class StreamBuffer:
                             try:
                                 chunk_index = self.redis_client.incr(self.buffer_index_key)
                                 chunk_key = f"{self.buffer_prefix}{chunk_index}"
-                                self.redis_client.setex(chunk_key, self.chunk_ttl, bytes(final_chunk))
+                                self.redis_client.setex(chunk_key, self.chunk_ttl, final_chunk)
                                 self.index = chunk_index
                                 logger.info(f"Flushed final chunk of {len(final_chunk)} bytes to Redis")
                             except Exception as e:
                                 logger.error(f"Error flushing final chunk: {e}")
 
                 # Clear buffers
-                self._write_buffer = bytearray()
-                if hasattr(self, '_partial_packet'):
-                    self._partial_packet = bytearray()
+                self._write_pos = 0
+
+            # Release memory held by the local ring
+            self._local_chunks.clear()
+            self.join_point = None
+            self._close_shared_ring()
 
         except Exception as e:
             logger.error(f"Error during buffer stop: {e}")
 
+    # Chunk availability times kept for client lag measurement
+    INDEX_TIME_HISTORY = 256
+
+    # Readers trust a notified buffer index this long before re-reading it from Redis
+    INDEX_CACHE_SECONDS = 1.0
+
+    # Limits for get_optimized_client_data
+    MIN_CLIENT_CHUNKS = 3                   # Minimum chunks to read for efficiency
+    MAX_CLIENT_CHUNKS = 20                  # Safety limit to prevent memory spikes
+    TARGET_CLIENT_SIZE = 1024 * 1024        # Target ~1MB per response (typical media buffer)
+    MAX_CLIENT_SIZE = 2 * 1024 * 1024       # Hard cap at 2MB
+
     def get_optimized_client_data(self, client_index):
         """Get optimal amount of data for client streaming based on position and target size"""
-        # Define limits
-        MIN_CHUNKS = 3                      # Minimum chunks to read for efficiency
-        MAX_CHUNKS = 20                     # Safety limit to prevent memory spikes
-        TARGET_SIZE = 1024 * 1024           # Target ~1MB per response (typical media buffer)
-        MAX_SIZE = 2 * 1024 * 1024          # Hard cap at 2MB
+        chunks_behind, chunk_count = self._client_read_plan(client_index)
+
+        # Retrieve chunks
+        chunks = self.get_chunks_exact(client_index, chunk_count)
+
+        # If we're under target and have more chunks available, get more
+        additional = self._additional_chunk_count(chunks, chunks_behind, chunk_count)
+        if additional:
+            more_chunks = self.get_chunks_exact(client_index + chunk_count, additional)
+            chunk_count = self._extend_client_data(chunks, more_chunks, chunk_count, additional)
+
+        return chunks, client_index + chunk_count
+
+    async def get_optimized_client_data_async(self, client_index, async_redis):
+        """Async variant of get_optimized_client_data for ASGI generators"""
+        chunks_behind, chunk_count = self._client_read_plan(client_index)
 
+        chunks = await self.get_chunks_exact_async(client_index, chunk_count, async_redis)
+
+        additional = self._additional_chunk_count(chunks, chunks_behind, chunk_count)
+        if additional:
+            more_chunks = await self.get_chunks_exact_async(client_index + chunk_count, additional, async_redis)
+            chunk_count = self._extend_client_data(chunks, more_chunks, chunk_count, additional)
+
+        return chunks, client_index + chunk_count
+
+    def _client_read_plan(self, client_index):
+        """Determine how far behind a client is and how many chunks to read first"""
         # Calculate how far behind we are
         chunks_behind = self.index - client_index
 
         # Determine optimal chunk count
-        if chunks_behind <= MIN_CHUNKS:
+        if chunks_behind <= self.MIN_CLIENT_CHUNKS:
             # Not much data, retrieve what's available
             chunk_count = max(1, chunks_behind)
-        elif chunks_behind <= MAX_CHUNKS:
+        elif chunks_behind <= self.MAX_CLIENT_CHUNKS:
             # Reasonable amount behind, catch up completely
             chunk_count = chunks_behind
         else:
-            # Way behind, retrieve MAX_CHUNKS to avoid memory pressure
-            chunk_count = MAX_CHUNKS
+            # Way behind, retrieve MAX_CLIENT_CHUNKS to avoid memory pressure
+            chunk_count = self.MAX_CLIENT_CHUNKS
 
-        # Retrieve chunks
-        chunks = self.get_chunks_exact(client_index, chunk_count)
+        return chunks_behind, chunk_count
 
-        # Check total size
+    def _additional_chunk_count(self, chunks, chunks_behind, chunk_count):
+        """How many more chunks to read when the first read is under the target size"""
         total_size = sum(len(c) for c in chunks)
+        if total_size < self.TARGET_CLIENT_SIZE and chunks_behind > chunk_count:
+            return min(self.MAX_CLIENT_CHUNKS - chunk_count, chunks_behind - chunk_count)
+        return 0
 
-        # If we're under target and have more chunks available, get more
-        if total_size < TARGET_SIZE and chunks_behind > chunk_count:
-            # Calculate how many more chunks we can get
-            additional = min(MAX_CHUNKS - chunk_count, chunks_behind - chunk_count)
-            more_chunks = self.get_chunks_exact(client_index + chunk_count, additional)
-
-            # Check if adding more would exceed MAX_SIZE
-            additional_size = sum(len(c) for c in more_chunks)
-            if total_size + additional_size <= MAX_SIZE:
-                chunks.extend(more_chunks)
-                chunk_count += additional
-
-        return chunks, client_index + chunk_count
+    def _extend_client_data(self, chunks, more_chunks, chunk_count, additional):
+        """Append the extra chunks if they fit under the size cap, returning the new chunk count"""
+        total_size = sum(len(c) for c in chunks)
+        additional_size = sum(len(c) for c in more_chunks)
+        if total_size + additional_size <= self.MAX_CLIENT_SIZE:
+            chunks.extend(more_chunks)
+            chunk_count += additional
+        return chunk_count
 
     # Add a new method to safely create timers
     def schedule_timer(self, delay, callback, *args, **kwargs):
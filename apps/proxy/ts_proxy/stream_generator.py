@@ -4,6 +4,7 @@ This module handles generating and delivering video streams to clients.
 """
 
 import time
+import math
 import logging
 import threading
 from apps.proxy.config import TSConfig as Config
@@ -11,7 +12,9 @@ from .server import ProxyServer
 from .utils import create_ts_packet, get_logger
 from .redis_keys import RedisKeys
 from .utils import get_logger
-from .constants import ChannelMetadataField
+from .constants import ChannelMetadataField, LagPolicy
+from .client_lag import LagHistogram
+from .config_helper import ConfigHelper
 
 logger = get_logger()
 
@@ -21,7 +24,7 @@ class StreamGenerator:
     data delivery, and cleanup.
     """
 
-    def __init__(self, channel_id, client_id, client_ip, client_user_agent, channel_initializing=False):
+    def __init__(self, channel_id, client_id, client_ip, client_user_agent, channel_initializing=False, rendition=None):
         """
         Initialize the stream generator with client and channel details.
 
@@ -31,24 +34,40 @@ class StreamGenerator:
             client_ip: Client's IP address
             client_user_agent: User agent string from client
             channel_initializing: Whether the channel is still initializing
+            rendition: Rendition to stream instead of the upstream passthrough
         """
         self.channel_id = channel_id
         self.client_id = client_id
         self.client_ip = client_ip
         self.client_user_agent = client_user_agent
         self.channel_initializing = channel_initializing
+        self.rendition = rendition
+        self.rendition_namespace = RedisKeys.rendition_namespace(channel_id, rendition) if rendition else None
 
         # Performance and state tracking
         self.stream_start_time = time.time()
         self.bytes_sent = 0
         self.chunks_sent = 0
         self.local_index = 0
+        self.join_point = None
         self.consecutive_empty = 0
 
         # Add tracking for current transfer rate calculation
         self.last_stats_time = time.time()
         self.last_stats_bytes = 0
         self.current_rate = 0.0
+        self.rate_smoothing = ConfigHelper.client_rate_smoothing()
+
+        # Lag bounds and what to do when a slow client exceeds them
+        self.lag_policy = ConfigHelper.client_lag_policy()
+        self.max_lag_seconds = ConfigHelper.client_max_lag_seconds()
+        self.max_lag_bytes = ConfigHelper.client_max_lag_bytes()
+        self.lag_histogram = LagHistogram()
+        self.lag_seconds = 0.0
+        self.lag_bytes = 0
+        self.lag_skips = 0
+        self.chunks_skipped = 0
+        self.avg_chunk_bytes = 0
 
     def generate(self):
         """
@@ -67,7 +86,7 @@ class StreamGenerator:
 
             # First handle initialization if needed
             if self.channel_initializing:
-                channel_ready = self._wait_for_initialization()
+                channel_ready = yield from self._wait_for_initialization()
                 if not channel_ready:
                     # If initialization failed or timed out, we've already sent error packets
                     return
@@ -147,11 +166,15 @@ class StreamGenerator:
         proxy_server = ProxyServer.get_instance()
 
         # Get buffer - stream manager may not exist in this worker
-        buffer = proxy_server.stream_buffers.get(self.channel_id)
+        if self.rendition:
+            buffer = proxy_server.rendition_buffers.get(self.rendition_namespace)
+        else:
+            buffer = proxy_server.stream_buffers.get(self.channel_id)
         stream_manager = proxy_server.stream_managers.get(self.channel_id)
 
         if not buffer:
-            logger.error(f"[{self.client_id}] No buffer found for channel {self.channel_id}")
+            logger.error(f"[{self.client_id}] No buffer found for channel {self.channel_id}" +
+                         (f" rendition {self.rendition}" if self.rendition else ""))
             return False
 
         # Client state tracking - use config for initial position
@@ -159,9 +182,17 @@ class StreamGenerator:
         current_buffer_index = buffer.index
         self.local_index = max(0, current_buffer_index - initial_behind)
 
+        # Prefer starting at a keyframe so players don't decode mid-GOP
+        if ConfigHelper.join_at_keyframe():
+            self._select_join_point(buffer)
+
         # Store important objects as instance variables
         self.buffer = buffer
+        self.avg_chunk_bytes = buffer.target_chunk_size
         self.stream_manager = stream_manager
+        self.client_manager = proxy_server.client_managers.get(self.channel_id)
+        self.watcher = proxy_server.get_channel_watcher(self.channel_id)
+        self.watcher.watch_client(self.client_id)
         self.last_yield_time = time.time()
         self.empty_reads = 0
         self.consecutive_empty = 0
@@ -170,6 +201,33 @@ class StreamGenerator:
         logger.info(f"[{self.client_id}] Starting stream at index {self.local_index} (buffer at {buffer.index})")
         return True
 
+    def _select_join_point(self, buffer):
+        """Start at the buffer's latest keyframe if it is recent enough"""
+        join_point = buffer.get_join_point()
+        if not join_point:
+            return
+
+        join_index, offset, psi = join_point
+        # Chunks vary from fast-start slivers to CHUNK_TARGET_SECONDS, so bound by time, not chunk count
+        seconds_behind = buffer.chunk_age(join_index)
+        if join_index > buffer.index or seconds_behind > ConfigHelper.join_max_behind_seconds():
+            logger.debug(f"[{self.client_id}] Keyframe at chunk {join_index} ({seconds_behind:.1f}s old) "
+                         f"too far from buffer head {buffer.index}")
+            return
+
+        self.local_index = join_index - 1
+        self.join_point = join_point
+        logger.info(f"[{self.client_id}] Joining at keyframe in chunk {join_index} (offset {offset})")
+
+    def _apply_join_point(self, chunks):
+        """Trim the first chunk to the join keyframe and prepend PAT/PMT"""
+        join_index, offset, psi = self.join_point
+        self.join_point = None
+
+        chunks = list(chunks)
+        chunks[0] = psi + chunks[0][offset:]
+        return chunks
+
     def _stream_data_generator(self):
         """Generate stream data chunks based on buffer contents."""
         # Main streaming loop
@@ -178,9 +236,16 @@ class StreamGenerator:
             if not self._check_resources():
                 break
 
+            # Keep slow clients within the lag bounds before reading
+            if not self._enforce_lag_policy():
+                break
+
             # Get chunks at client's position using improved strategy
             chunks, next_index = self.buffer.get_optimized_client_data(self.local_index)
 
+            if chunks and self.join_point:
+                chunks = self._apply_join_point(chunks)
+
             if chunks:
                 yield from self._process_chunks(chunks, next_index)
                 self.local_index = next_index
@@ -199,11 +264,14 @@ class StreamGenerator:
                     self.bytes_sent += len(keepalive_packet)
                     self.last_yield_time = time.time()
                     self.consecutive_empty = 0  # Reset consecutive counter but keep total empty_reads
-                    time.sleep(Config.KEEPALIVE_INTERVAL)
-                else:
-                    # Standard wait with backoff
+                    self.buffer.wait_for_chunks(self.local_index, Config.KEEPALIVE_INTERVAL)
+                elif self.buffer.index > self.local_index:
+                    # Buffer is ahead but chunks weren't readable yet - back off
                     sleep_time = min(0.1 * self.consecutive_empty, 1.0)
                     time.sleep(sleep_time)
+                else:
+                    # At buffer head - block until the writer announces a new chunk
+                    self.buffer.wait_for_chunks(self.local_index, ConfigHelper.chunk_wait_timeout())
 
                 # Log empty reads periodically
                 if self.empty_reads % 50 == 0:
@@ -219,6 +287,71 @@ class StreamGenerator:
                 if self._is_timeout():
                     break
 
+    def _enforce_lag_policy(self):
+        """
+        Measure how far behind live the client is and apply the lag policy when
+        it exceeds CLIENT_MAX_LAG_SECONDS or CLIENT_MAX_LAG_BYTES.
+
+        Returns:
+            bool: False if the client should be disconnected
+        """
+        if not self._lag_exceeded():
+            return True
+
+        join_point = None
+        if self.lag_policy == LagPolicy.SKIP_TO_KEYFRAME:
+            join_point = self.buffer.get_join_point()
+        return self._apply_lag_policy(join_point)
+
+    def _lag_exceeded(self):
+        """Measure the client's lag, returning True if it is past the configured bounds"""
+        lag_chunks = self.buffer.index - self.local_index
+        if lag_chunks <= 0:
+            self.lag_seconds = 0.0
+            self.lag_bytes = 0
+        else:
+            self.lag_seconds = self.buffer.chunk_age(self.local_index + 1)
+            self.lag_bytes = int(lag_chunks * self.avg_chunk_bytes)
+        self.lag_histogram.observe(self.lag_seconds)
+
+        if self.lag_seconds <= self.max_lag_seconds and self.lag_bytes <= self.max_lag_bytes:
+            return False
+
+        logger.warning(f"[{self.client_id}] Client {self.lag_seconds:.1f}s / {self.lag_bytes} bytes behind live, "
+                       f"applying {self.lag_policy} policy")
+        return True
+
+    def _apply_lag_policy(self, join_point):
+        """
+        Disconnect or skip a lagging client forward.
+
+        Args:
+            join_point: Latest join point for SKIP_TO_KEYFRAME, None otherwise
+
+        Returns:
+            bool: False if the client should be disconnected
+        """
+        if self.lag_policy == LagPolicy.DISCONNECT:
+            return False
+
+        if self.lag_policy == LagPolicy.SKIP_TO_KEYFRAME:
+            if join_point and join_point[0] > self.local_index + 1:
+                self._skip_to(join_point[0] - 1)
+                self.join_point = join_point
+                return True
+
+        # Live edge - also the fallback when no newer keyframe is known
+        self._skip_to(max(self.local_index, self.buffer.index - 1))
+        return True
+
+    def _skip_to(self, index):
+        """Move the client forward, dropping the chunks in between"""
+        skipped = index - self.local_index
+        self.lag_skips += 1
+        self.chunks_skipped += skipped
+        self.local_index = index
+        logger.info(f"[{self.client_id}] Skipped {skipped} chunks to index {index} (buffer at {self.buffer.index})")
+
     def _check_resources(self):
         """Check if required resources still exist."""
         proxy_server = ProxyServer.get_instance()
@@ -232,35 +365,21 @@ class StreamGenerator:
             logger.info(f"[{self.client_id}] Client manager no longer exists, terminating stream")
             return False
 
-        # Check if this specific client has been stopped (Redis keys, etc.)
-        if proxy_server.redis_client:
-            # Channel stop check - with extended key set
-            stop_key = RedisKeys.channel_stopping(self.channel_id)
-            if proxy_server.redis_client.exists(stop_key):
-                logger.info(f"[{self.client_id}] Detected channel stop signal, terminating stream")
-                return False
-
-            # Also check channel state in metadata
-            metadata_key = RedisKeys.channel_metadata(self.channel_id)
-            metadata = proxy_server.redis_client.hgetall(metadata_key)
-            if metadata and b'state' in metadata:
-                state = metadata[b'state'].decode('utf-8')
-                if state in ['error', 'stopped', 'stopping']:
-                    logger.info(f"[{self.client_id}] Channel in {state} state, terminating stream")
-                    return False
+        if self.rendition and self.rendition_namespace not in proxy_server.rendition_buffers:
+            logger.info(f"[{self.client_id}] Rendition {self.rendition} buffer no longer exists, terminating stream")
+            return False
 
-            # Client stop check
-            client_stop_key = RedisKeys.client_stop(self.channel_id, self.client_id)
-            if proxy_server.redis_client.exists(client_stop_key):
-                logger.info(f"[{self.client_id}] Detected client stop signal, terminating stream")
-                return False
-
-            # Also check if client has been removed from client_manager
-            if self.channel_id in proxy_server.client_managers:
-                client_manager = proxy_server.client_managers[self.channel_id]
-                if self.client_id not in client_manager.clients:
-                    logger.info(f"[{self.client_id}] Client no longer in client manager, terminating stream")
-                    return False
+        # Stop flags, channel state and client stop requests are tracked per channel
+        stop_reason = self.watcher.stop_reason(self.client_id)
+        if stop_reason:
+            logger.info(f"[{self.client_id}] Detected {stop_reason}, terminating stream")
+            return False
+
+        # Also check if client has been removed from client_manager
+        client_manager = proxy_server.client_managers.get(self.channel_id)
+        if not client_manager or self.client_id not in client_manager.clients:
+            logger.info(f"[{self.client_id}] Client no longer in client manager, terminating stream")
+            return False
 
         return True
 
@@ -269,7 +388,6 @@ class StreamGenerator:
         # Process and send chunks
         total_size = sum(len(c) for c in chunks)
         logger.debug(f"[{self.client_id}] Retrieved {len(chunks)} chunks ({total_size} bytes) from index {self.local_index+1} to {next_index}")
-        proxy_server = ProxyServer.get_instance()
 
         # Send the chunks to the client
         for chunk in chunks:
@@ -277,6 +395,7 @@ class StreamGenerator:
                 yield chunk
                 self.bytes_sent += len(chunk)
                 self.chunks_sent += 1
+                self.avg_chunk_bytes += 0.2 * (len(chunk) - self.avg_chunk_bytes)
                 logger.debug(f"[{self.client_id}] Sent chunk {self.chunks_sent} ({len(chunk)} bytes) to client")
 
                 current_time = time.time()
@@ -285,12 +404,18 @@ class StreamGenerator:
                 elapsed_total = current_time - self.stream_start_time
                 avg_rate = self.bytes_sent / elapsed_total / 1024 if elapsed_total > 0 else 0
 
-                # Calculate current rate (since last measurement)
+                # Calculate current rate as an exponentially weighted moving average so
+                # bursty chunk delivery doesn't make the reported rate jump around
                 elapsed_current = current_time - self.last_stats_time
                 bytes_since_last = self.bytes_sent - self.last_stats_bytes
 
                 if elapsed_current > 0:
-                    self.current_rate = bytes_since_last / elapsed_current / 1024
+                    instant_rate = bytes_since_last / elapsed_current / 1024
+                    if self.current_rate == 0.0:
+                        self.current_rate = instant_rate
+                    else:
+                        alpha = 1.0 - math.exp(-elapsed_current / self.rate_smoothing)
+                        self.current_rate += alpha * (instant_rate - self.current_rate)
 
                 # Update last stats values
                 self.last_stats_time = current_time
@@ -300,21 +425,19 @@ class StreamGenerator:
                     logger.debug(f"[{self.client_id}] Stats: {self.chunks_sent} chunks, {self.bytes_sent/1024:.1f} KB, "
                                 f"avg: {avg_rate:.1f} KB/s, current: {self.current_rate:.1f} KB/s")
 
-                # Store stats in Redis client metadata
-                if proxy_server.redis_client:
-                    try:
-                        client_key = RedisKeys.client_metadata(self.channel_id, self.client_id)
-                        stats = {
-                            ChannelMetadataField.CHUNKS_SENT: str(self.chunks_sent),
-                            ChannelMetadataField.BYTES_SENT: str(self.bytes_sent),
-                            ChannelMetadataField.AVG_RATE_KBPS: str(round(avg_rate, 1)),
-                            ChannelMetadataField.CURRENT_RATE_KBPS: str(round(self.current_rate, 1)),
-                            ChannelMetadataField.STATS_UPDATED_AT: str(current_time)
-                        }
-                        proxy_server.redis_client.hset(client_key, mapping=stats)
-                        # No need to set expiration as client heartbeat will refresh this key
-                    except Exception as e:
-                        logger.warning(f"[{self.client_id}] Failed to store stats in Redis: {e}")
+                # Hand stats to the client manager - its heartbeat thread batches the Redis writes
+                if self.client_manager:
+                    self.client_manager.update_client_stats(self.client_id, {
+                        ChannelMetadataField.CHUNKS_SENT: str(self.chunks_sent),
+                        ChannelMetadataField.BYTES_SENT: str(self.bytes_sent),
+                        ChannelMetadataField.AVG_RATE_KBPS: str(round(avg_rate, 1)),
+                        ChannelMetadataField.CURRENT_RATE_KBPS: str(round(self.current_rate, 1)),
+                        ChannelMetadataField.STATS_UPDATED_AT: str(current_time),
+                        ChannelMetadataField.LAG_SECONDS: str(round(self.lag_seconds, 3)),
+                        ChannelMetadataField.LAG_BYTES: str(self.lag_bytes),
+                        ChannelMetadataField.LAG_SKIPS: str(self.lag_skips),
+                        ChannelMetadataField.LAG_HISTOGRAM: self.lag_histogram.to_json()
+                    })
 
             except Exception as e:
                 logger.error(f"[{self.client_id}] Error sending chunk to client: {e}")
@@ -360,6 +483,8 @@ class StreamGenerator:
         """Clean up resources and report final statistics."""
         # Client cleanup
         elapsed = time.time() - self.stream_start_time
+        if getattr(self, 'watcher', None):
+            self.watcher.unwatch_client(self.client_id)
         local_clients = 0
         total_clients = 0
         proxy_server = ProxyServer.get_instance()
@@ -430,10 +555,10 @@ class StreamGenerator:
             shutdown_thread.daemon = True
             shutdown_thread.start()
 
-def create_stream_generator(channel_id, client_id, client_ip, client_user_agent, channel_initializing=False):
+def create_stream_generator(channel_id, client_id, client_ip, client_user_agent, channel_initializing=False, rendition=None):
     """
     Factory function to create a new stream generator.
     Returns a function that can be passed to StreamingHttpResponse.
     """
-    generator = StreamGenerator(channel_id, client_id, client_ip, client_user_agent, channel_initializing)
+    generator = StreamGenerator(channel_id, client_id, client_ip, client_user_agent, channel_initializing, rendition)
     return generator.generate
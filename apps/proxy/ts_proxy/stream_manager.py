@@ -9,12 +9,16 @@ import subprocess
 from typing import Optional, List
 from django.shortcuts import get_object_or_404
 from apps.proxy.config import TSConfig as Config
+from apps.proxy.upstream_pool import get_upstream_pool
 from apps.channels.models import Channel, Stream
 from apps.m3u.models import M3UAccount, M3UAccountProfile
 from core.models import UserAgent, CoreSettings
 from .stream_buffer import StreamBuffer
 from .utils import detect_stream_type, get_logger
 from .redis_keys import RedisKeys
+from .telemetry import ChannelTelemetryWriter
+from .transcode_reader import TranscodeReader
+from .standby import StandbyStream
 from .constants import ChannelState, EventType, StreamType, ChannelMetadataField, TS_PACKET_SIZE
 from .config_helper import ConfigHelper
 from .url_utils import get_alternate_streams, get_stream_info_for_switch, get_stream_object
@@ -36,6 +40,9 @@ class StreamManager:
         self.current_response = None
         self.current_session = None
         self.url_switching = False
+        # Set whenever no URL switch is in progress, so the stream thread can wait for one to finish
+        self.url_switch_done = threading.Event()
+        self.url_switch_done.set()
         # Store worker_id for ownership checks
         self.worker_id = worker_id
 
@@ -43,6 +50,7 @@ class StreamManager:
         self.socket = None
         self.transcode = transcode
         self.transcode_process = None
+        self.transcode_reader = None
 
         # User agent for connection
         self.user_agent = user_agent or Config.DEFAULT_USER_AGENT
@@ -94,34 +102,36 @@ class StreamManager:
         # Add this flag for tracking transcoding process status
         self.transcode_process_active = False
 
-        # Add tracking for data throughput
-        self.bytes_processed = 0
-        self.last_bytes_update = time.time()
-        self.bytes_update_interval = 5  # Update Redis every 5 seconds
-
-    def _create_session(self):
-        """Create and configure requests session with optimal settings"""
-        session = requests.Session()
-
-        # Configure session headers
-        session.headers.update({
-            'User-Agent': self.user_agent,
-            'Connection': 'keep-alive'
-        })
-
-        # Set up connection pooling for better performance
-        adapter = requests.adapters.HTTPAdapter(
-            pool_connections=1,     # Single connection for this stream
-            pool_maxsize=1,         # Max size of connection pool
-            max_retries=3,          # Auto-retry for failed requests
-            pool_block=False        # Don't block when pool is full
+        # Coalesced Redis writes for last-data time, byte totals and health
+        self.telemetry = ChannelTelemetryWriter(
+            self.channel_id,
+            getattr(buffer, 'redis_client', None),
+            flush_interval=ConfigHelper.telemetry_flush_interval()
         )
-
-        # Apply adapter to both HTTP and HTTPS
-        session.mount('http://', adapter)
-        session.mount('https://', adapter)
-
-        return session
+        self.reported_healthy = None
+
+        # Ingest bitrate sampling (drives adaptive buffer chunk size)
+        self.bitrate_sample_interval = ConfigHelper.bitrate_sample_interval()
+        self.bitrate_sample_bytes = 0
+        self.bitrate_sample_start = time.time()
+        self.ingest_bitrate = 0
+
+        # Rendition transcoders fed from this connection (set by the server on the owner)
+        self.renditions = None
+
+        # Warm standby on the next alternate stream (channels flagged standby_failover)
+        self.standby_enabled = False
+        self.standby = None
+        self.standby_retry_at = 0
+        self.standby_handoff = None
+        self.standby_lock = threading.Lock()
+        self.current_chunks = None
+
+        # Switch gap tracking - time from the old stream's last data to the new stream's first
+        self.switch_gap_start = None
+        self.switch_used_standby = False
+        self.switch_count = 0
+        self.switch_gap_max = 0.0
 
     def run(self):
         """Main execution loop using HTTP streaming with improved connection handling and stream switching"""
@@ -133,7 +143,7 @@ class StreamManager:
         max_stream_switches = ConfigHelper.max_stream_switches()  # Prevent infinite switching loops
 
         try:
-
+            self.standby_enabled = self._standby_requested()
 
             # Start health monitor thread
             health_thread = threading.Thread(target=self._monitor_health, daemon=True)
@@ -201,6 +211,9 @@ class StreamManager:
                         if self.retry_count >= self.max_retries:
                             url_failed = True
                             logger.warning(f"Maximum retry attempts ({self.max_retries}) reached for URL: {self.url}")
+                        elif self.standby_handoff:
+                            # A switch handed us a live standby connection - take it over right away
+                            logger.info(f"Switching to warm standby for channel {self.channel_id}")
                         else:
                             # Wait with exponential backoff before retrying
                             timeout = min(.25 * self.retry_count, 3)  # Cap at 3 seconds
@@ -257,6 +270,8 @@ class StreamManager:
 
             self._buffer_check_timers.clear()
 
+            self._stop_standby()
+
             # Make sure transcode process is terminated
             if self.transcode_process_active:
                 logger.info("Ensuring transcode process is terminated in finally block")
@@ -326,14 +341,15 @@ class StreamManager:
             self.transcode_process = subprocess.Popen(
                 self.transcode_cmd,
                 stdout=subprocess.PIPE,
-                stderr=subprocess.DEVNULL,  # Suppress error logs
-                bufsize=188 * 64            # Buffer optimized for TS packets
+                stderr=subprocess.PIPE,     # Parsed for progress by the transcode reader
+                bufsize=0                   # The reader does its own large reads
             )
 
             # Set flag that transcoding process is active
             self.transcode_process_active = True
 
             self.socket = self.transcode_process.stdout  # Read from std output
+            self.transcode_reader = TranscodeReader(self.transcode_process, ConfigHelper.transcode_read_size())
             self.connected = True
 
             # Set connection start time for stability tracking
@@ -353,17 +369,35 @@ class StreamManager:
         try:
             logger.debug(f"Using TS Proxy to connect to stream: {self.url}")
 
-            # Create new session for each connection attempt
-            session = self._create_session()
-            self.current_session = session
+            # Drop any partial packet left by the previous connection so the new data starts aligned
+            self.buffer.discard_partial_packet()
+
+            handoff = self._take_standby_handoff()
+            if handoff:
+                # Continue reading the standby's already open connection
+                self.current_response = handoff.response
+                self.current_chunks = handoff.chunks
+                self.connected = True
+                self.healthy = True
+                self.connection_start_time = time.time()
+                logger.info(f"Took over warm standby connection for channel {self.channel_id}")
+                self._set_waiting_for_clients()
+                return True
+
+            # Borrow the host's pooled session so reconnects can reuse a connection and cached DNS
+            upstream_pool = get_upstream_pool()
+            self.current_session = upstream_pool.session_for(self.url)
 
             # Stream the URL with proper timeout handling
-            response = session.get(
+            response = upstream_pool.get(
                 self.url,
+                user_agent=self.user_agent,
                 stream=True,
                 timeout=(10, 60)  # 10s connect timeout, 60s read timeout
             )
             self.current_response = response
+            self.current_chunks = response.iter_content(chunk_size=self.chunk_size)
+            self._record_upstream_timing(response)
 
             if response.status_code == 200:
                 self.connected = True
@@ -390,27 +424,54 @@ class StreamManager:
             self._close_connection()
             return False
 
+    def _record_upstream_timing(self, response):
+        """Publish connect and first-byte timings of the latest upstream request"""
+        try:
+            host = get_upstream_pool().host_key(self.url)
+            connect_time = response.upstream_connect_time
+            logger.debug(f"Upstream {host} answered in {response.upstream_first_byte_time * 1000:.0f}ms "
+                         f"({'new connection' if connect_time is not None else 'reused connection'})")
+            self.telemetry.set_fields({
+                ChannelMetadataField.UPSTREAM_HOST: host,
+                ChannelMetadataField.UPSTREAM_CONNECT_TIME: f"{connect_time or 0:.4f}",
+                ChannelMetadataField.UPSTREAM_FIRST_BYTE_TIME: f"{response.upstream_first_byte_time:.4f}"
+            })
+        except Exception as e:
+            logger.error(f"Error recording upstream timing: {e}")
+
     def _update_bytes_processed(self, chunk_size):
-        """Update the total bytes processed in Redis metadata"""
+        """Count ingested bytes and sample the ingest bitrate; Redis writes go through the telemetry writer"""
         try:
-            # Update local counter
-            self.bytes_processed += chunk_size
+            self.telemetry.count_bytes(chunk_size)
+            self.bitrate_sample_bytes += chunk_size
 
-            # Only update Redis periodically to reduce overhead
+            # Sample ingest bitrate and let the buffer size its chunks from it
             now = time.time()
-            if now - self.last_bytes_update >= self.bytes_update_interval:
-                if hasattr(self.buffer, 'redis_client') and self.buffer.redis_client:
-                    # Update channel metadata with total bytes
-                    metadata_key = RedisKeys.channel_metadata(self.channel_id)
-
-                    # Use hincrby to atomically increment the total_bytes field
-                    self.buffer.redis_client.hincrby(metadata_key, ChannelMetadataField.TOTAL_BYTES, self.bytes_processed)
-
-                    # Reset local counter after updating Redis
-                    self.bytes_processed = 0
-                    self.last_bytes_update = now
-
-                    logger.debug(f"Updated {ChannelMetadataField.TOTAL_BYTES} in Redis for channel {self.channel_id}")
+            sample_elapsed = now - self.bitrate_sample_start
+            if sample_elapsed >= self.bitrate_sample_interval:
+                sample_bitrate = self.bitrate_sample_bytes * 8 / sample_elapsed
+                if self.ingest_bitrate:
+                    # Smooth out bursty reads
+                    self.ingest_bitrate = 0.7 * self.ingest_bitrate + 0.3 * sample_bitrate
+                else:
+                    self.ingest_bitrate = sample_bitrate
+                self.bitrate_sample_bytes = 0
+                self.bitrate_sample_start = now
+                self.buffer.update_bitrate(self.ingest_bitrate)
+
+                self.telemetry.set_fields({
+                    ChannelMetadataField.BUFFER_CHUNK_SIZE: str(self.buffer.target_chunk_size),
+                    ChannelMetadataField.INGEST_BITRATE: str(int(self.ingest_bitrate))
+                })
+                if self.buffer.inspector:
+                    quality = self.buffer.inspector.totals
+                    self.telemetry.set_fields({
+                        ChannelMetadataField.STREAM_CC_ERRORS: str(quality.cc_errors),
+                        ChannelMetadataField.STREAM_SYNC_ERRORS: str(quality.sync_errors),
+                        ChannelMetadataField.STREAM_TRANSPORT_ERRORS: str(quality.transport_errors),
+                        ChannelMetadataField.STREAM_NULL_RATIO: f"{quality.null_ratio:.4f}",
+                        ChannelMetadataField.STREAM_PCR_INTERVAL_MAX: f"{quality.pcr_interval_max:.4f}"
+                    })
         except Exception as e:
             logger.error(f"Error updating bytes processed: {e}")
 
@@ -418,11 +479,11 @@ class StreamManager:
         """Process stream data until disconnect or error"""
         try:
             if self.transcode:
-                # Handle transcoded stream data
+                # Handle transcoded stream data - fetch_chunk waits for output readiness
                 while self.running and self.connected:
                     if self.fetch_chunk():
                         self.last_data_time = time.time()
-                    else:
+                    elif not self.transcode_reader:
                         if not self.running:
                             break
                         time.sleep(0.1)
@@ -430,7 +491,7 @@ class StreamManager:
                 # Handle direct HTTP connection
                 chunk_count = 0
                 try:
-                    for chunk in self.current_response.iter_content(chunk_size=self.chunk_size):
+                    for chunk in self.current_chunks:
                         # Check if we've been asked to stop
                         if self.stop_requested or self.url_switching:
                             break
@@ -442,15 +503,17 @@ class StreamManager:
 
                             # Add chunk to buffer with TS packet alignment
                             success = self.buffer.add_chunk(chunk)
+                            if self.renditions:
+                                self.renditions.feed(chunk)
 
                             if success:
                                 self.last_data_time = time.time()
                                 chunk_count += 1
+                                if self.switch_gap_start is not None:
+                                    self._record_switch_gap()
 
-                                # Update last data timestamp in Redis
-                                if hasattr(self.buffer, 'redis_client') and self.buffer.redis_client:
-                                    last_data_key = RedisKeys.last_data(self.buffer.channel_id)
-                                    self.buffer.redis_client.set(last_data_key, str(time.time()), ex=60)
+                                # Last data timestamp reaches Redis on the next telemetry flush
+                                self.telemetry.mark_data()
                 except (AttributeError, ConnectionError) as e:
                     if self.stop_requested or self.url_switching:
                         logger.debug(f"Expected connection error during shutdown/URL switch: {e}")
@@ -477,13 +540,7 @@ class StreamManager:
             except Exception as e:
                 logger.debug(f"Error closing response: {e}")
 
-        if self.current_session:
-            try:
-                self.current_session.close()
-            except Exception as e:
-                logger.debug(f"Error closing session: {e}")
-
-        # Clear references
+        # Clear references (the session belongs to the shared upstream pool)
         self.socket = None
         self.current_response = None
         self.current_session = None
@@ -496,6 +553,12 @@ class StreamManager:
         # Add at the beginning of your stop method
         self.stopping = True
 
+        # Give back the standby's connection and profile slot
+        self._stop_standby()
+
+        # Write out any telemetry still pending
+        self.telemetry.flush()
+
         # Release stream resources if we're the owner
         if self.current_stream_id and hasattr(self, 'worker_id') and self.worker_id:
             if hasattr(self.buffer, 'redis_client') and self.buffer.redis_client:
@@ -531,12 +594,8 @@ class StreamManager:
             except Exception:
                 pass
 
-        # Also close the session
-        if hasattr(self, 'current_session') and self.current_session:
-            try:
-                self.current_session.close()
-            except Exception:
-                pass
+        # The session is shared with other channels on the same host - just let go of it
+        self.current_session = None
 
         # Explicitly close socket/transcode resources
         self._close_socket()
@@ -554,6 +613,7 @@ class StreamManager:
 
         # CRITICAL: Set a flag to prevent immediate reconnection with old URL
         self.url_switching = True
+        self.url_switch_done.clear()
 
         # Check which type of connection we're using and close it properly
         if self.transcode or self.socket:
@@ -584,6 +644,7 @@ class StreamManager:
 
         # Done with URL switch
         self.url_switching = False
+        self.url_switch_done.set()
         logger.info(f"Stream switch completed for channel {self.buffer.channel_id}")
 
         return True
@@ -616,8 +677,16 @@ class StreamManager:
                     # Track consecutive unhealthy checks
                     consecutive_unhealthy_checks += 1
 
+                    standby = self.standby
+                    if standby and standby.warm and health_recovery_attempts < max_health_recovery_attempts:
+                        # Switching to a warm standby is cheaper than waiting out more checks or reconnecting
+                        logger.warning(f"Switching channel {self.channel_id} to warm standby stream {standby.stream_id}")
+                        health_recovery_attempts += 1
+                        reconnect_attempts = 0
+                        threading.Thread(target=self._attempt_health_recovery, daemon=True).start()
+
                     # After several unhealthy checks in a row, try recovery
-                    if consecutive_unhealthy_checks >= 3 and health_recovery_attempts < max_health_recovery_attempts:
+                    elif consecutive_unhealthy_checks >= 3 and health_recovery_attempts < max_health_recovery_attempts:
                         # Calculate how long the stream was stable before failing
                         connection_start_time = getattr(self, 'connection_start_time', 0)
                         stable_time = self.last_data_time - connection_start_time if connection_start_time > 0 else 0
@@ -653,11 +722,33 @@ class StreamManager:
                 if self.healthy:
                     consecutive_unhealthy_checks = 0
 
+                # Publish health changes and flush telemetry even when no data is arriving
+                if self.healthy != self.reported_healthy:
+                    self.reported_healthy = self.healthy
+                    self.telemetry.set_fields({ChannelMetadataField.STREAM_HEALTHY: "1" if self.healthy else "0"})
+                self.telemetry.maybe_flush()
+
+                if self.standby_enabled:
+                    self._maintain_standby()
+
             except Exception as e:
                 logger.error(f"Error in health monitor: {e}")
 
             time.sleep(self.health_check_interval)
 
+    def _attempt_health_recovery(self):
+        """Switch to the next stream after the current one failed health checks"""
+        try:
+            if self.url_switching:
+                logger.info("URL switching already in progress, skipping health recovery")
+                return
+
+            logger.info(f"Attempting stream switch for unhealthy channel {self.channel_id}")
+            if not self._try_next_stream(reason="health_check_failed"):
+                logger.warning(f"Health recovery found no stream to switch to for channel {self.channel_id}")
+        except Exception as e:
+            logger.error(f"Error in health recovery attempt: {e}", exc_info=True)
+
     def _attempt_reconnect(self):
         """Attempt to reconnect to the current stream"""
         try:
@@ -710,13 +801,8 @@ class StreamManager:
                 logger.debug(f"Error closing response: {e}")
             self.current_response = None
 
-        # Close session if it exists
-        if hasattr(self, 'current_session') and self.current_session:
-            try:
-                self.current_session.close()
-            except Exception as e:
-                logger.debug(f"Error closing session: {e}")
-            self.current_session = None
+        # Release the pooled session without closing it - other channels may be using it
+        self.current_session = None
 
     def _close_socket(self):
         """Close socket and transcode resources as needed"""
@@ -726,6 +812,10 @@ class StreamManager:
             return
 
         # Otherwise handle socket and transcode resources
+        if self.transcode_reader:
+            self.transcode_reader.close()
+            self.transcode_reader = None
+
         if self.socket:
             try:
                 self.socket.close()
@@ -738,6 +828,12 @@ class StreamManager:
 
         # Enhanced transcode process cleanup with more aggressive termination
         if self.transcode_process:
+            if self.transcode_process.stderr:
+                try:
+                    self.transcode_process.stderr.close()
+                except Exception:
+                    pass
+
             try:
                 # First try polite termination
                 logger.debug(f"Terminating transcode process for channel {self.channel_id}")
@@ -792,6 +888,9 @@ class StreamManager:
         if not self.connected or not self.socket:
             return False
 
+        if self.transcode_reader:
+            return self._fetch_transcode_output()
+
         try:
             # Read data chunk - no need to align with TS packet size anymore
             try:
@@ -818,11 +917,12 @@ class StreamManager:
 
             # Add directly to buffer without TS-specific processing
             success = self.buffer.add_chunk(chunk)
+            if self.renditions:
+                self.renditions.feed(chunk)
 
-            # Update last data timestamp in Redis if successful
-            if success and hasattr(self.buffer, 'redis_client') and self.buffer.redis_client:
-                last_data_key = RedisKeys.last_data(self.buffer.channel_id)
-                self.buffer.redis_client.set(last_data_key, str(time.time()), ex=60)
+            # Last data timestamp reaches Redis on the next telemetry flush
+            if success:
+                self.telemetry.mark_data()
 
             return True
 
@@ -837,6 +937,60 @@ class StreamManager:
             logger.error(f"Error in fetch_chunk: {e}")
             return False
 
+    def _fetch_transcode_output(self):
+        """Wait for transcoder output and hand it straight to the buffer's accumulator"""
+        reader = self.transcode_reader
+        try:
+            data = reader.read(ConfigHelper.transcode_read_timeout())
+            self._publish_transcode_progress(reader)
+
+            if data is None:
+                return False
+
+            if not data:
+                # Transcoder exited - show why if it said anything
+                if reader.stderr_tail:
+                    logger.warning(f"Transcode process for channel {self.channel_id} ended: {reader.stderr_tail[-1]}")
+                else:
+                    logger.warning("Transcode process closed its output")
+                self._close_socket()
+                self.connected = False
+                return False
+
+            self._update_bytes_processed(len(data))
+
+            # The buffer copies the data, so the reader's buffer can be reused next read
+            success = self.buffer.add_chunk(data)
+            if self.renditions and self.renditions.pipelines:
+                self.renditions.feed(bytes(data))
+
+            # Last data timestamp reaches Redis on the next telemetry flush
+            if success:
+                self.telemetry.mark_data()
+
+            return True
+
+        except (OSError, ValueError) as e:
+            logger.error(f"Transcode read error: {e}")
+            self._close_socket()
+            self.connected = False
+            return False
+
+    def _publish_transcode_progress(self, reader):
+        """Queue changed ffmpeg progress for the next telemetry flush"""
+        progress = reader.take_progress()
+        if not progress:
+            return
+
+        fields = {}
+        if 'fps' in progress:
+            fields[ChannelMetadataField.TRANSCODE_FPS] = str(progress['fps'])
+        if 'speed' in progress:
+            fields[ChannelMetadataField.TRANSCODE_SPEED] = str(progress['speed'])
+        if 'bitrate_kbps' in progress:
+            fields[ChannelMetadataField.TRANSCODE_BITRATE] = str(progress['bitrate_kbps'])
+        self.telemetry.set_fields(fields)
+
     def _set_waiting_for_clients(self):
         """Set channel state to waiting for clients AFTER buffer has enough chunks"""
         try:
@@ -934,10 +1088,12 @@ class StreamManager:
             logger.error(f"Error in buffer check: {e}")
             return False
 
-    def _try_next_stream(self):
+    def _try_next_stream(self, reason="max_retries_exceeded"):
         """
         Try to switch to the next available stream for this channel.
 
+        A warm standby is preferred when its stream is one of the candidates.
+
         Returns:
             bool: True if successfully switched to a new stream, False otherwise
         """
@@ -962,21 +1118,41 @@ class StreamManager:
                     logger.warning(f"All {len(alternate_streams)} alternate streams have been tried for channel {self.channel_id}")
                 return False
 
-            # Get the next stream to try
-            next_stream = untried_streams[0]
-            stream_id = next_stream['stream_id']
+            # Get the next stream to try, claiming the standby if it is warm and still a candidate
+            with self.standby_lock:
+                standby = self.standby
+                if standby and standby.warm and any(s['stream_id'] == standby.stream_id for s in untried_streams):
+                    self.standby = None
+                else:
+                    standby = None
+
+            if standby:
+                stream_id = standby.stream_id
+                stream_info = standby.stream_info
+                logger.info(f"Switching to warm standby stream ID {stream_id} for channel {self.channel_id}")
+            else:
+                next_stream = untried_streams[0]
+                stream_id = next_stream['stream_id']
+
+                # Get stream info including URL
+                logger.info(f"Trying next stream ID {stream_id} for channel {self.channel_id}")
+                stream_info = get_stream_info_for_switch(self.channel_id, stream_id)
 
             # Add to tried streams
             self.tried_stream_ids.add(stream_id)
 
-            # Get stream info including URL
-            logger.info(f"Trying next stream ID {stream_id} for channel {self.channel_id}")
-            stream_info = get_stream_info_for_switch(self.channel_id, stream_id)
-
             if 'error' in stream_info or not stream_info.get('url'):
                 logger.error(f"Error getting info for stream {stream_id}: {stream_info.get('error', 'No URL')}")
                 return False
 
+            # Measure the gap from the old stream's last data to the new stream's first
+            self.switch_gap_start = self.last_data_time
+            self.switch_used_standby = standby is not None
+            if standby:
+                # Held standbys hand over their open connection, probed ones just connect next
+                self.standby_handoff = standby.promote()
+                self.telemetry.set_fields({ChannelMetadataField.STANDBY_STREAM_ID: ""})
+
             # Update URL and user agent
             new_url = stream_info['url']
             new_user_agent = stream_info['user_agent']
@@ -1001,7 +1177,7 @@ class StreamManager:
                     ChannelMetadataField.M3U_PROFILE: stream_info['m3u_profile_id'],
                     ChannelMetadataField.STREAM_ID: str(stream_id),
                     ChannelMetadataField.STREAM_SWITCH_TIME: str(time.time()),
-                    ChannelMetadataField.STREAM_SWITCH_REASON: "max_retries_exceeded"
+                    ChannelMetadataField.STREAM_SWITCH_REASON: reason
                 })
 
                 # Log the switch
@@ -1011,6 +1187,7 @@ class StreamManager:
             switch_result = self.update_url(new_url)
             if not switch_result:
                 logger.error(f"Failed to update URL for stream ID {stream_id}")
+                self.switch_gap_start = None
                 return False
 
             logger.info(f"Successfully switched to stream ID {stream_id} with URL {new_url}")
@@ -1019,3 +1196,108 @@ class StreamManager:
         except Exception as e:
             logger.error(f"Error trying next stream for channel {self.channel_id}: {e}", exc_info=True)
             return False
+
+    def _standby_requested(self):
+        """Check if the channel is flagged to keep a warm standby stream"""
+        try:
+            channel = get_stream_object(self.channel_id)
+            return isinstance(channel, Channel) and channel.standby_failover
+        except Exception as e:
+            logger.error(f"Error checking standby setting for channel {self.channel_id}: {e}")
+            return False
+
+    def _maintain_standby(self):
+        """Keep a standby warm on the next alternate stream, replacing it if it fails"""
+        try:
+            with self.standby_lock:
+                standby = self.standby
+                if standby and standby.alive and standby.stream_id != self.current_stream_id and not self.transcode:
+                    return
+                if standby:
+                    # Dead, switched to by other means, or no longer usable for this connection type
+                    self.standby = None
+            if standby:
+                logger.info(f"Dropping standby stream {standby.stream_id} for channel {self.channel_id}")
+                standby.stop()
+                self.telemetry.set_fields({ChannelMetadataField.STANDBY_STREAM_ID: ""})
+                self.standby_retry_at = time.time() + ConfigHelper.standby_retry_interval()
+                return
+
+            # Handed-over connections are read directly, so transcoded channels don't get a standby
+            if self.transcode or not self.connected or self.url_switching or time.time() < self.standby_retry_at:
+                return
+            self.standby_retry_at = time.time() + ConfigHelper.standby_retry_interval()
+
+            standby = self._start_standby()
+            if standby:
+                with self.standby_lock:
+                    self.standby = standby
+                self.telemetry.set_fields({ChannelMetadataField.STANDBY_STREAM_ID: str(standby.stream_id)})
+        except Exception as e:
+            logger.error(f"Error maintaining standby for channel {self.channel_id}: {e}")
+
+    def _start_standby(self):
+        """Start a standby on the first untried alternate whose M3U profile has a free slot"""
+        redis_client = getattr(self.buffer, 'redis_client', None)
+        for candidate in get_alternate_streams(self.channel_id, self.current_stream_id):
+            if candidate['stream_id'] in self.tried_stream_ids:
+                continue
+
+            stream_info = get_stream_info_for_switch(self.channel_id, candidate['stream_id'])
+            if 'error' in stream_info or not stream_info.get('url') or stream_info['transcode']:
+                continue
+
+            profile = M3UAccountProfile.objects.filter(id=stream_info['m3u_profile_id']).first()
+            if not profile or not profile.is_active:
+                continue
+
+            standby = StandbyStream(self.channel_id, stream_info, redis_client, chunk_size=self.chunk_size)
+            if standby.start(profile.max_streams):
+                return standby
+        return None
+
+    def _stop_standby(self):
+        """Close the standby and any connection it handed over but that wasn't taken"""
+        with self.standby_lock:
+            standby, self.standby = self.standby, None
+            handoff, self.standby_handoff = self.standby_handoff, None
+
+        if standby:
+            standby.stop()
+            self.telemetry.set_fields({ChannelMetadataField.STANDBY_STREAM_ID: ""})
+        if handoff:
+            try:
+                handoff.response.close()
+            except Exception as e:
+                logger.debug(f"Error closing standby handoff: {e}")
+
+    def _take_standby_handoff(self):
+        """Get the standby connection handed over for the URL being connected, if any"""
+        if not self.standby_handoff:
+            return None
+
+        # The switching thread may still be moving self.url to the standby's URL
+        self.url_switch_done.wait(1.0)
+
+        with self.standby_lock:
+            handoff, self.standby_handoff = self.standby_handoff, None
+        if handoff and handoff.url != self.url:
+            handoff.response.close()
+            return None
+        return handoff
+
+    def _record_switch_gap(self):
+        """Publish how long clients went without data around the last stream switch"""
+        gap = time.time() - self.switch_gap_start
+        self.switch_gap_start = None
+        self.switch_count += 1
+        self.switch_gap_max = max(self.switch_gap_max, gap)
+
+        logger.info(f"Stream switch for channel {self.channel_id} left a {gap * 1000:.0f}ms gap "
+                    f"({'warm standby' if self.switch_used_standby else 'cold connect'})")
+        self.telemetry.set_fields({
+            ChannelMetadataField.STREAM_SWITCH_GAP: f"{gap:.4f}",
+            ChannelMetadataField.STREAM_SWITCH_GAP_MAX: f"{self.switch_gap_max:.4f}",
+            ChannelMetadataField.STREAM_SWITCH_COUNT: str(self.switch_count),
+            ChannelMetadataField.STREAM_SWITCH_WARM: "1" if self.switch_used_standby else "0"
+        })
@@ -0,0 +1,85 @@
+"""Coalesced Redis writes for per-channel ingest telemetry"""
+
+import threading
+import time
+from .constants import ChannelMetadataField
+from .redis_keys import RedisKeys
+from .utils import get_logger
+
+logger = get_logger()
+
+class ChannelTelemetryWriter:
+    """
+    Collects last-data timestamps, byte counters and channel metadata fields
+    in memory and writes them to Redis in one pipeline per flush interval.
+
+    The stream thread records every upstream read here instead of issuing
+    its own Redis commands; the health monitor flushes when data stops so
+    state changes still reach Redis.
+    """
+
+    def __init__(self, channel_id, redis_client, flush_interval=1.0, last_data_ttl=60):
+        self.channel_id = channel_id
+        self.redis_client = redis_client
+        self.flush_interval = flush_interval
+        self.last_data_ttl = last_data_ttl
+
+        self.lock = threading.Lock()
+        self.last_data_time = None
+        self.pending_bytes = 0
+        self.pending_fields = {}
+        self.last_flush = time.time()
+        self.flushes = 0
+
+    def count_bytes(self, byte_count):
+        """Add ingested bytes to the channel's total_bytes counter"""
+        with self.lock:
+            self.pending_bytes += byte_count
+
+    def mark_data(self):
+        """Record that upstream data was just buffered, flushing if due"""
+        self.last_data_time = time.time()
+        self.maybe_flush()
+
+    def set_fields(self, fields):
+        """Queue channel metadata fields, keeping only the latest value of each"""
+        with self.lock:
+            self.pending_fields.update(fields)
+
+    def maybe_flush(self):
+        """Flush if the flush interval has elapsed"""
+        if time.time() - self.last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Write everything pending in a single pipeline"""
+        with self.lock:
+            self.last_flush = time.time()
+            last_data_time = self.last_data_time
+            pending_bytes = self.pending_bytes
+            pending_fields = self.pending_fields
+            self.last_data_time = None
+            self.pending_bytes = 0
+            self.pending_fields = {}
+
+        if not self.redis_client or (last_data_time is None and not pending_bytes and not pending_fields):
+            return
+
+        try:
+            metadata_key = RedisKeys.channel_metadata(self.channel_id)
+            pipe = self.redis_client.pipeline(transaction=False)
+            if last_data_time is not None:
+                pipe.set(RedisKeys.last_data(self.channel_id), str(last_data_time), ex=self.last_data_ttl)
+            if pending_bytes:
+                pipe.hincrby(metadata_key, ChannelMetadataField.TOTAL_BYTES, pending_bytes)
+            if pending_fields:
+                pipe.hset(metadata_key, mapping=pending_fields)
+            pipe.execute()
+            self.flushes += 1
+        except Exception as e:
+            logger.error(f"Error flushing telemetry for channel {self.channel_id}: {e}")
+
+            # Keep the byte count so totals stay accurate after a Redis hiccup
+            with self.lock:
+                self.pending_bytes += pending_bytes
+                self.pending_fields = {**pending_fields, **self.pending_fields}
@@ -0,0 +1,150 @@
+"""Readiness-based reading of transcoder stdout/stderr pipes"""
+
+import os
+import re
+import selectors
+import time
+from collections import deque
+from .utils import get_logger
+
+logger = get_logger()
+
+# ffmpeg progress lines look like "frame= 250 fps= 25 q=-1.0 size= 2048kB time=00:00:10.00 bitrate=1677.7kbits/s speed=1.00x"
+PROGRESS_PAIR = re.compile(r"(\w+)=\s*(\S+)")
+LINE_BREAK = re.compile(rb"[\r\n]")
+
+class TranscodeReader:
+    """
+    Reads a transcoder's output with a selector instead of blocking reads.
+
+    stdout is read with readinto() into one preallocated buffer, so each
+    read is a single syscall of up to read_size bytes. stderr is drained
+    on the same selector; ffmpeg progress is parsed from it and any other
+    lines are kept so the last few can be logged when the process exits.
+    """
+
+    STDERR_TAIL_LINES = 20
+
+    def __init__(self, process, read_size):
+        self.process = process
+        self.read_buffer = bytearray(read_size)
+        self.read_view = memoryview(self.read_buffer)
+
+        # Use the raw pipes - a buffered reader would hide data from the selector
+        self.stdout = getattr(process.stdout, 'raw', process.stdout)
+        self.stderr = getattr(process.stderr, 'raw', process.stderr) if process.stderr else None
+
+        self.selector = selectors.DefaultSelector()
+        os.set_blocking(self.stdout.fileno(), False)
+        self.selector.register(self.stdout, selectors.EVENT_READ, "stdout")
+        if self.stderr:
+            os.set_blocking(self.stderr.fileno(), False)
+            self.selector.register(self.stderr, selectors.EVENT_READ, "stderr")
+
+        self._stderr_partial = b""
+        self.stderr_tail = deque(maxlen=self.STDERR_TAIL_LINES)
+        self.progress = {}
+        self._progress_changed = False
+        self.reads = 0
+        self.bytes_read = 0
+
+    def read(self, timeout):
+        """
+        Wait up to timeout seconds for transcoder output.
+
+        Returns:
+            memoryview: Data read (only valid until the next call), b'' at end of
+            stream, or None if nothing arrived in time
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            events = self.selector.select(max(0, remaining))
+            if not events:
+                return None
+
+            data = None
+            for key, _ in events:
+                if key.data == "stderr":
+                    self._read_stderr()
+                else:
+                    data = self._read_stdout()
+
+            if data is not None:
+                return data
+            if remaining <= 0:
+                return None
+
+    def _read_stdout(self):
+        try:
+            count = self.stdout.readinto(self.read_view)
+        except BlockingIOError:
+            return None
+        if count is None:
+            return None
+        if count == 0:
+            return b""
+
+        self.reads += 1
+        self.bytes_read += count
+        return self.read_view[:count]
+
+    def _read_stderr(self):
+        try:
+            data = os.read(self.stderr.fileno(), 4096)
+        except BlockingIOError:
+            return
+        if not data:
+            self.selector.unregister(self.stderr)
+            self.stderr = None
+            return
+
+        # Progress lines end with \r, log lines with \n
+        lines = LINE_BREAK.split(self._stderr_partial + data)
+        self._stderr_partial = lines.pop()
+        for line in lines:
+            self._parse_line(line.decode("utf-8", "replace").strip())
+
+    def _parse_line(self, text):
+        if not text:
+            return
+
+        fields = dict(PROGRESS_PAIR.findall(text))
+        if ("frame" in fields or "size" in fields) and ("speed" in fields or "bitrate" in fields):
+            progress = {}
+            fps = _parse_number(fields.get("fps"))
+            if fps is not None:
+                progress["fps"] = fps
+            speed = _parse_number(fields.get("speed", "").rstrip("x"))
+            if speed is not None:
+                progress["speed"] = speed
+            bitrate = _parse_number(fields.get("bitrate", "").replace("kbits/s", ""))
+            if bitrate is not None:
+                progress["bitrate_kbps"] = bitrate
+
+            if progress:
+                self.progress.update(progress)
+                self._progress_changed = True
+        else:
+            self.stderr_tail.append(text)
+
+    def take_progress(self):
+        """Get the latest progress if it changed since the last call, otherwise None"""
+        if not self._progress_changed:
+            return None
+        self._progress_changed = False
+        return dict(self.progress)
+
+    def close(self):
+        """Stop watching the pipes (closing them is left to the process owner)"""
+        try:
+            self.selector.close()
+        except Exception as e:
+            logger.debug(f"Error closing transcode reader selector: {e}")
+
+def _parse_number(value):
+    """Parse an ffmpeg progress value, None for N/A or garbage"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
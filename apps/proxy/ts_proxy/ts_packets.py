@@ -0,0 +1,198 @@
+"""MPEG-TS packet and PSI inspection helpers"""
+
+from .constants import TS_PACKET_SIZE, TS_SYNC_BYTE
+
+# Well-known PIDs
+PAT_PID = 0x0000
+
+# PMT stream_type values carrying video (MPEG-1/2/4, H.264, HEVC, AVS, Dirac, VC-1)
+VIDEO_STREAM_TYPES = frozenset((0x01, 0x02, 0x10, 0x1B, 0x24, 0x42, 0xD1, 0xEA))
+
+# Maps header byte 1 to 1 where payload_unit_start_indicator is set, for strided scans
+_PAYLOAD_UNIT_START = bytes(1 if b & 0x40 else 0 for b in range(256))
+
+def packet_pid(data, offset=0):
+    """Get the 13-bit PID of the packet at offset"""
+    return ((data[offset + 1] & 0x1F) << 8) | data[offset + 2]
+
+def payload_unit_start(data, offset=0):
+    """Check the payload_unit_start_indicator of the packet at offset"""
+    return bool(data[offset + 1] & 0x40)
+
+def random_access_indicator(data, offset=0):
+    """Check the adaptation field random_access_indicator (set on keyframes by most muxers)"""
+    adaptation_control = (data[offset + 3] >> 4) & 0x03
+    if adaptation_control not in (2, 3):
+        return False
+    if data[offset + 4] == 0:
+        return False
+    return bool(data[offset + 5] & 0x40)
+
+def is_pat_start(data, offset=0):
+    """Check if the packet at offset starts a PAT section"""
+    return packet_pid(data, offset) == PAT_PID and payload_unit_start(data, offset)
+
+def find_sync(data, start=0):
+    """
+    Find the first packet boundary at or after start.
+
+    A boundary is a sync byte that is repeated one packet later (or is the
+    last packet in data). Returns -1 if no boundary is found.
+    """
+    length = len(data)
+    for offset in range(start, min(start + TS_PACKET_SIZE, length)):
+        if data[offset] != TS_SYNC_BYTE:
+            continue
+        next_offset = offset + TS_PACKET_SIZE
+        if next_offset >= length or data[next_offset] == TS_SYNC_BYTE:
+            return offset
+    return -1
+
+def find_packet(data, predicate, start=0, end=None):
+    """
+    Find the first whole packet from a packet-aligned start that matches predicate.
+
+    Returns:
+        int: Offset of the matching packet, or -1
+    """
+    end = len(data) if end is None else min(end, len(data))
+    for offset in range(start, end - TS_PACKET_SIZE + 1, TS_PACKET_SIZE):
+        if data[offset] == TS_SYNC_BYTE and predicate(data, offset):
+            return offset
+    return -1
+
+def find_last_packet(data, predicate, start=0, end=None):
+    """Find the last whole packet in [start, end) that matches predicate, or -1"""
+    found = -1
+    end = len(data) if end is None else min(end, len(data))
+    for offset in range(start, end - TS_PACKET_SIZE + 1, TS_PACKET_SIZE):
+        if data[offset] == TS_SYNC_BYTE and predicate(data, offset):
+            found = offset
+    return found
+
+def section_start(data, offset=0):
+    """
+    Get the offset of the PSI section starting in the packet at offset.
+
+    Returns:
+        int: Section offset (after the pointer field), or -1 if the packet has no payload
+    """
+    payload = offset + 4
+    adaptation_control = (data[offset + 3] >> 4) & 0x03
+    if adaptation_control == 2:
+        return -1
+    if adaptation_control == 3:
+        payload += 1 + data[offset + 4]
+    section = payload + 1 + data[payload] if payload < offset + TS_PACKET_SIZE else -1
+    return section if 0 <= section < offset + TS_PACKET_SIZE - 3 else -1
+
+def _section_end(data, section, offset):
+    """End of a section's data (before the CRC), clamped to the packet"""
+    section_length = ((data[section + 1] & 0x0F) << 8) | data[section + 2]
+    return min(section + 3 + section_length - 4, offset + TS_PACKET_SIZE)
+
+def pat_pmt_pids(data, offset=0):
+    """
+    Get the PMT PIDs listed in a single-packet PAT section.
+
+    Returns:
+        set: PMT PIDs (the NIT entry for program 0 is skipped)
+    """
+    section = section_start(data, offset)
+    if section < 0 or data[section] != 0x00:
+        return set()
+
+    pids = set()
+    end = _section_end(data, section, offset)
+    for entry in range(section + 8, end - 3, 4):
+        program_number = (data[entry] << 8) | data[entry + 1]
+        if program_number != 0:
+            pids.add(((data[entry + 2] & 0x1F) << 8) | data[entry + 3])
+    return pids
+
+def pmt_video_pids(data, offset=0):
+    """
+    Get the elementary PIDs carrying video in a single-packet PMT section.
+
+    Returns:
+        set: Video PIDs
+    """
+    section = section_start(data, offset)
+    if section < 0 or data[section] != 0x02:
+        return set()
+
+    pids = set()
+    end = _section_end(data, section, offset)
+    program_info_length = ((data[section + 10] & 0x0F) << 8) | data[section + 11]
+    entry = section + 12 + program_info_length
+    while entry + 5 <= end:
+        if data[entry] in VIDEO_STREAM_TYPES:
+            pids.add(((data[entry + 1] & 0x1F) << 8) | data[entry + 2])
+        es_info_length = ((data[entry + 3] & 0x0F) << 8) | data[entry + 4]
+        entry += 5 + es_info_length
+    return pids
+
+class RandomAccessTracker:
+    """
+    Follows PAT/PMT across packet-aligned chunks and finds random access points.
+
+    A random access point is a payload-unit start with the random_access_indicator
+    set on a video PID (any PID until a PMT listing video has been seen).
+    Only single-packet PAT/PMT sections are tracked, which covers typical streams.
+    """
+
+    def __init__(self):
+        self.pat = None
+        self.pmt_pids = set()
+        self.pmts = {}
+        self.video_pids = set()
+
+    @property
+    def psi(self):
+        """PAT followed by every PMT it lists, or None until all have been seen"""
+        if not self.pat or not self.pmt_pids or set(self.pmts) != self.pmt_pids:
+            return None
+        return self.pat + b''.join(self.pmts[pid] for pid in sorted(self.pmts))
+
+    def scan(self, chunk):
+        """
+        Update PSI state from a chunk.
+
+        Returns:
+            int: Offset of the last random access point in the chunk, or -1
+        """
+        start = find_sync(chunk)
+        if start < 0:
+            return -1
+
+        found = -1
+        end = start + (len(chunk) - start) // TS_PACKET_SIZE * TS_PACKET_SIZE
+        # Only payload unit starts matter - find them from every packet's header byte 1 at
+        # once instead of visiting each packet
+        unit_starts = bytes(chunk[start + 1:end:TS_PACKET_SIZE]).translate(_PAYLOAD_UNIT_START)
+        index = unit_starts.find(1)
+        while index >= 0:
+            offset = start + index * TS_PACKET_SIZE
+            index = unit_starts.find(1, index + 1)
+            if chunk[offset] != TS_SYNC_BYTE:
+                continue
+
+            pid = packet_pid(chunk, offset)
+            if pid == PAT_PID:
+                self._update_pat(chunk, offset)
+            elif pid in self.pmt_pids:
+                self.pmts[pid] = bytes(chunk[offset:offset + TS_PACKET_SIZE])
+                self.video_pids = set().union(*(pmt_video_pids(pmt) for pmt in self.pmts.values()))
+            elif random_access_indicator(chunk, offset) and (not self.video_pids or pid in self.video_pids):
+                found = offset
+        return found
+
+    def _update_pat(self, chunk, offset):
+        """Record a PAT and drop PMTs for programs it no longer lists"""
+        pids = pat_pmt_pids(chunk, offset)
+        if not pids:
+            return
+        self.pat = bytes(chunk[offset:offset + TS_PACKET_SIZE])
+        if pids != self.pmt_pids:
+            self.pmt_pids = pids
+            self.pmts = {pid: pmt for pid, pmt in self.pmts.items() if pid in pids}
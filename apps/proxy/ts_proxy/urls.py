@@ -5,6 +5,7 @@ app_name = 'ts_proxy'
 
 urlpatterns = [
     path('stream/<str:channel_id>', views.stream_ts, name='stream'),
+    path('stream_async/<str:channel_id>', views.stream_ts_async, name='stream_async'),
     path('change_stream/<str:channel_id>', views.change_stream, name='change_stream'),
     path('status', views.channel_status, name='channel_status'),
     path('status/<str:channel_id>', views.channel_status, name='channel_status_detail'),
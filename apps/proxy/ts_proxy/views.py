@@ -2,14 +2,15 @@ import json
 import threading
 import time
 import random
-import re
-from django.http import StreamingHttpResponse, JsonResponse, HttpResponseRedirect
+from django.http import StreamingHttpResponse, JsonResponse, HttpResponseRedirect, HttpResponseNotAllowed
 from django.views.decorators.csrf import csrf_exempt
 from django.shortcuts import get_object_or_404
 from apps.proxy.config import TSConfig as Config
 from .server import ProxyServer
 from .channel_status import ChannelStatus
+from .channel_registry import ChannelRegistry
 from .stream_generator import create_stream_generator
+from .async_stream_generator import create_async_stream_generator
 from .utils import get_client_ip
 from .redis_keys import RedisKeys
 import logging
@@ -22,8 +23,10 @@ from .constants import ChannelState, EventType, StreamType, ChannelMetadataField
 from .config_helper import ConfigHelper
 from .services.channel_service import ChannelService
 from .url_utils import generate_stream_url, transform_url, get_stream_info_for_switch, get_stream_object, get_alternate_streams
+from .renditions import is_passthrough, get_rendition_profile
 from .utils import get_logger
 from uuid import UUID
+from asgiref.sync import sync_to_async
 
 logger = get_logger()
 
@@ -31,8 +34,64 @@ logger = get_logger()
 @api_view(['GET'])
 def stream_ts(request, channel_id):
     """Stream TS data to client with immediate response and keep-alive packets during initialization"""
+    error_response, client_info = _prepare_stream_client(request, channel_id)
+    if error_response is not None:
+        return error_response
+
+    # Create a stream generator for this client
+    generate = create_stream_generator(channel_id, *client_info)
+
+    # Return the StreamingHttpResponse from the main function
+    response = StreamingHttpResponse(
+        streaming_content=generate(),
+        content_type='video/mp2t'
+    )
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+async def stream_ts_async(request, channel_id):
+    """
+    ASGI variant of stream_ts served by daphne.
+
+    Initialization and client registration are shared with stream_ts; the stream
+    itself is an async generator so waiting viewers don't hold a thread or greenlet.
+    """
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+
+    # Initialization may block on upstream connects and the database - run it in a
+    # worker thread without serializing other viewers behind it
+    error_response, client_info = await sync_to_async(_prepare_stream_client, thread_sensitive=False)(request, channel_id)
+    if error_response is not None:
+        return error_response
+
+    generate = create_async_stream_generator(channel_id, *client_info)
+
+    response = StreamingHttpResponse(
+        streaming_content=generate(),
+        content_type='video/mp2t'
+    )
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+def _prepare_stream_client(request, channel_id):
+    """
+    Initialize the channel if needed and register the requesting client.
+
+    Returns:
+        tuple: (error_response, client_info) - error_response is set when the request
+        can't be streamed, otherwise client_info is
+        (client_id, client_ip, client_user_agent, channel_initializing, rendition)
+    """
     channel = get_stream_object(channel_id)
 
+    # Optional transcoded output sharing the channel's upstream connection
+    rendition = request.GET.get('rendition')
+    if is_passthrough(rendition):
+        rendition = None
+    elif not get_rendition_profile(rendition):
+        return JsonResponse({'error': f"Unknown rendition '{rendition}'"}, status=404), None
+
     client_user_agent = None
     proxy_server = ProxyServer.get_instance()
 
@@ -137,7 +196,7 @@ def stream_ts(request, channel_id):
                 return JsonResponse({
                     'error': error_msg,
                     'waited': wait_duration
-                }, status=503)  # 503 Service Unavailable is appropriate here
+                }, status=503), None  # 503 Service Unavailable is appropriate here
 
             # Get the stream ID from the channel
             stream_id, m3u_profile_id, _ = channel.get_stream()
@@ -146,7 +205,7 @@ def stream_ts(request, channel_id):
             # Generate transcode command if needed
             stream_profile = channel.get_stream_profile()
             if stream_profile.is_redirect():
-                return HttpResponseRedirect(stream_url)
+                return HttpResponseRedirect(stream_url), None
 
             # Initialize channel with the stream's user agent (not the client's)
             success = ChannelService.initialize_channel(
@@ -154,7 +213,7 @@ def stream_ts(request, channel_id):
             )
 
             if not success:
-                return JsonResponse({'error': 'Failed to initialize channel'}, status=500)
+                return JsonResponse({'error': 'Failed to initialize channel'}, status=500), None
 
             # If we're the owner, wait for connection to establish
             if proxy_server.am_i_owner(channel_id):
@@ -165,10 +224,10 @@ def stream_ts(request, channel_id):
                     while not manager.connected:
                         if time.time() - wait_start > timeout:
                             proxy_server.stop_channel(channel_id)
-                            return JsonResponse({'error': 'Connection timeout'}, status=504)
+                            return JsonResponse({'error': 'Connection timeout'}, status=504), None
                         if not manager.should_retry():
                             proxy_server.stop_channel(channel_id)
-                            return JsonResponse({'error': 'Failed to connect'}, status=502)
+                            return JsonResponse({'error': 'Failed to connect'}, status=502), None
                         time.sleep(0.1)
 
             logger.info(f"[{client_id}] Successfully initialized channel {channel_id}")
@@ -209,32 +268,25 @@ def stream_ts(request, channel_id):
             success = proxy_server.initialize_channel(url, channel_id, stream_user_agent or client_user_agent, use_transcode)
             if not success:
                 logger.error(f"[{client_id}] Failed to initialize channel {channel_id} locally")
-                return JsonResponse({'error': 'Failed to initialize channel locally'}, status=500)
+                return JsonResponse({'error': 'Failed to initialize channel locally'}, status=500), None
 
             logger.info(f"[{client_id}] Successfully initialized channel {channel_id} locally")
 
+        # Start (or ask the owner to start) the requested rendition
+        if rendition and not proxy_server.get_rendition_buffer(channel_id, rendition):
+            return JsonResponse({'error': f"Rendition '{rendition}' is not available for this channel"}, status=503), None
+
         # Register client
         buffer = proxy_server.stream_buffers[channel_id]
         client_manager = proxy_server.client_managers[channel_id]
-        client_manager.add_client(client_id, client_ip, client_user_agent)
-        logger.info(f"[{client_id}] Client registered with channel {channel_id}")
+        client_manager.add_client(client_id, client_ip, client_user_agent, rendition=rendition)
+        logger.info(f"[{client_id}] Client registered with channel {channel_id}" + (f" (rendition {rendition})" if rendition else ""))
 
-        # Create a stream generator for this client
-        generate = create_stream_generator(
-            channel_id, client_id, client_ip, client_user_agent, channel_initializing
-        )
-
-        # Return the StreamingHttpResponse from the main function
-        response = StreamingHttpResponse(
-            streaming_content=generate(),
-            content_type='video/mp2t'
-        )
-        response['Cache-Control'] = 'no-cache'
-        return response
+        return None, (client_id, client_ip, client_user_agent, channel_initializing, rendition)
 
     except Exception as e:
         logger.error(f"Error in stream_ts: {e}", exc_info=True)
-        return JsonResponse({'error': str(e)}, status=500)
+        return JsonResponse({'error': str(e)}, status=500), None
 
 @csrf_exempt
 @api_view(['POST'])
@@ -310,26 +362,14 @@ def channel_status(request, channel_id=None):
             else:
                 return JsonResponse({'error': f'Channel {channel_id} not found'}, status=404)
         else:
-            # Basic info for all channels
-            channel_pattern = "ts_proxy:channel:*:metadata"
-            all_channels = []
-
-            # Extract channel IDs from keys
-            cursor = 0
-            while True:
-                cursor, keys = proxy_server.redis_client.scan(cursor, match=channel_pattern)
-                for key in keys:
-                    channel_id_match = re.search(r"ts_proxy:channel:(.*):metadata", key.decode('utf-8'))
-                    if channel_id_match:
-                        ch_id = channel_id_match.group(1)
-                        channel_info = ChannelStatus.get_basic_channel_info(ch_id)
-                        if channel_info:
-                            all_channels.append(channel_info)
-
-                if cursor == 0:
-                    break
+            # Read first so the snapshot is at least as new as the update it names,
+            # letting the dashboard apply the next delta from the updates feed on top
+            seq = ChannelStatus.get_stats_sequence(proxy_server.redis_client)
+
+            # Basic info for all channels in the active channel registry
+            all_channels = ChannelStatus.get_basic_channel_info_bulk(ChannelRegistry.get_channel_ids(proxy_server.redis_client))
 
-            return JsonResponse({'channels': all_channels, 'count': len(all_channels)})
+            return JsonResponse({'channels': all_channels, 'count': len(all_channels), 'seq': seq})
 
     except Exception as e:
         logger.error(f"Error in channel_status: {e}", exc_info=True)
@@ -0,0 +1,340 @@
+"""
+Process-wide upstream HTTP connection pool shared by the TS and HLS proxies.
+
+Providers often serve many channels from one host. Instead of building a
+session per connection attempt, every stream and HLS fetcher in the worker
+borrows a keep-alive session for the provider's host, so a reconnect or
+failover to the same host can reuse an idle connection and skips DNS via a
+short-lived resolver cache. Connect and first-byte timings are kept per host.
+
+A host's session serves every channel and M3U account on it, so it keeps no
+cookies of its own - otherwise one account's provider session would be sent
+with another's requests. Streams that need cookies carried between requests
+pass their own jar.
+"""
+
+import logging
+import socket
+import threading
+import time
+from http.cookiejar import DefaultCookiePolicy
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from apps.proxy.config import BaseConfig as Config
+
+logger = logging.getLogger(__name__)
+
+# Connect time of the last new connection opened by the current thread/greenlet
+_timings = threading.local()
+
+# Shared sessions accept no cookies (an empty allow-list matches no domain)
+_REJECT_ALL_COOKIES = DefaultCookiePolicy(allowed_domains=[])
+
+
+class DNSCache:
+    """Caches getaddrinfo results for a few seconds so reconnects skip resolution"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def resolve(self, host, port):
+        """Get the addresses to try for host, in order, resolving them if the cached ones expired"""
+        if self.ttl <= 0 or _is_ip_address(host):
+            return [host]
+
+        key = (host, port)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[1] > now:
+                return list(entry[0])
+
+        # Resolve outside the lock so one slow lookup doesn't hold up other hosts
+        infos = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        with self.lock:
+            self.entries[key] = (addresses, now + self.ttl)
+        return list(addresses)
+
+    def demote(self, host, port, address):
+        """Move an address that failed to connect to the back, so new connections try the others first"""
+        with self.lock:
+            entry = self.entries.get((host, port))
+            if entry and address in entry[0]:
+                entry[0].remove(address)
+                entry[0].append(address)
+
+    def forget(self, host, port):
+        """Drop cached addresses (after every one failed) so the next attempt resolves again"""
+        with self.lock:
+            self.entries.pop((host, port), None)
+
+
+def _is_ip_address(host):
+    for family in (socket.AF_INET, socket.AF_INET6):
+        try:
+            socket.inet_pton(family, host.strip("[]"))
+            return True
+        except (OSError, ValueError):
+            continue
+    return False
+
+
+class _PooledConnectionMixin:
+    """Connects through the DNS cache and records how long connection setup took"""
+
+    dns_cache = None
+
+    def _new_conn(self):
+        # Only the socket address changes - TLS SNI, certificate checks and Host header still use self.host
+        dns_host = self._dns_host
+        try:
+            addresses = self.dns_cache.resolve(dns_host, self.port)
+        except socket.gaierror:
+            # Let urllib3 resolve and report the failure as usual
+            return super()._new_conn()
+
+        # Like urllib3's own resolution, try every address before giving up
+        try:
+            for attempt, address in enumerate(addresses, 1):
+                self._dns_host = address
+                try:
+                    return super()._new_conn()
+                except Exception:
+                    if attempt == len(addresses):
+                        self.dns_cache.forget(dns_host, self.port)
+                        raise
+                    logger.debug(f"Connect to {dns_host} at {address} failed, trying next address")
+                    self.dns_cache.demote(dns_host, self.port, address)
+        finally:
+            self._dns_host = dns_host
+
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        _timings.connect_time = time.perf_counter() - start
+
+
+class _PooledHTTPConnection(_PooledConnectionMixin, HTTPConnection):
+    pass
+
+
+class _PooledHTTPSConnection(_PooledConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _PooledHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _PooledHTTPConnection
+
+
+class _PooledHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _PooledHTTPSConnection
+
+
+class _PooledAdapter(HTTPAdapter):
+    """HTTPAdapter whose connections go through the pool's DNS cache"""
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _PooledHTTPConnectionPool,
+            "https": _PooledHTTPSConnectionPool,
+        }
+
+
+class HostStats:
+    """Request, connect and first-byte timings for one upstream host"""
+
+    # Weight of the newest sample in the moving averages
+    SMOOTHING = 0.3
+
+    def __init__(self):
+        self.requests = 0
+        self.connects = 0
+        self.errors = 0
+        self.last_connect_time = None
+        self.avg_connect_time = None
+        self.last_first_byte_time = None
+        self.avg_first_byte_time = None
+
+    def record(self, connect_time, first_byte_time):
+        self.requests += 1
+        if connect_time is not None:
+            self.connects += 1
+            self.last_connect_time = connect_time
+            self.avg_connect_time = self._smooth(self.avg_connect_time, connect_time)
+        self.last_first_byte_time = first_byte_time
+        self.avg_first_byte_time = self._smooth(self.avg_first_byte_time, first_byte_time)
+
+    def _smooth(self, average, sample):
+        if average is None:
+            return sample
+        return (1 - self.SMOOTHING) * average + self.SMOOTHING * sample
+
+    def to_dict(self):
+        return {
+            'requests': self.requests,
+            'connects': self.connects,
+            'reused': self.requests - self.connects,
+            'errors': self.errors,
+            'last_connect_time': self.last_connect_time,
+            'avg_connect_time': self.avg_connect_time,
+            'last_first_byte_time': self.last_first_byte_time,
+            'avg_first_byte_time': self.avg_first_byte_time,
+        }
+
+
+class UpstreamPool:
+    """
+    Keep-alive sessions per upstream host, shared by every stream in the process.
+
+    Sessions are never closed by their users - closing a response returns (or
+    discards) its connection and the session stays available for the next
+    request to that host. Sessions no request has borrowed for
+    UPSTREAM_SESSION_IDLE_TIMEOUT are closed by the pool. The User-Agent is
+    sent per request because channels on the same host may use different ones.
+    """
+
+    # Seconds between sweeps for idle sessions
+    EVICTION_INTERVAL = 60
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls):
+        """Get the process-wide pool"""
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
+    def __init__(self):
+        self.pool_maxsize = getattr(Config, 'UPSTREAM_POOL_MAXSIZE', 32)
+        self.max_retries = getattr(Config, 'UPSTREAM_MAX_RETRIES', 3)
+        self.dns_cache = DNSCache(getattr(Config, 'UPSTREAM_DNS_TTL', 60))
+        _PooledConnectionMixin.dns_cache = self.dns_cache
+        self.session_idle_timeout = getattr(Config, 'UPSTREAM_SESSION_IDLE_TIMEOUT', 300)
+        self.sessions = {}
+        self.stats = {}
+        self.last_used = {}
+        self.next_eviction = 0
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def host_key(url):
+        """Get the scheme://host:port a URL's connections are pooled under"""
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        return f"{parts.scheme}://{parts.hostname}:{port}"
+
+    def session_for(self, url):
+        """Get the shared session for a URL's host, creating it on first use"""
+        key = self.host_key(url)
+        now = time.monotonic()
+        with self.lock:
+            session = self.sessions.get(key)
+            if session is None:
+                session = self._create_session()
+                self.sessions[key] = session
+                self.stats[key] = HostStats()
+                logger.debug(f"Created upstream session for {key}")
+            self.last_used[key] = now
+            idle = self._pop_idle_sessions(now) if now >= self.next_eviction else []
+
+        for idle_key, idle_session in idle:
+            logger.debug(f"Closing upstream session for {idle_key} after {self.session_idle_timeout}s idle")
+            idle_session.close()
+        return session
+
+    def _pop_idle_sessions(self, now):
+        """Remove sessions idle past the timeout, returning them for closing. Caller holds self.lock."""
+        self.next_eviction = now + self.EVICTION_INTERVAL
+        idle = [key for key, used in self.last_used.items() if now - used > self.session_idle_timeout]
+
+        # Responses still streaming from an evicted session keep their connection;
+        # it's discarded rather than pooled once they close
+        evicted = []
+        for key in idle:
+            evicted.append((key, self.sessions.pop(key)))
+            self.stats.pop(key, None)
+            del self.last_used[key]
+        return evicted
+
+    def _create_session(self):
+        session = requests.Session()
+        session.headers.update({'Connection': 'keep-alive'})
+        session.cookies.set_policy(_REJECT_ALL_COOKIES)
+
+        adapter = _PooledAdapter(
+            pool_connections=4,             # Host pools per session (redirect targets get their own)
+            pool_maxsize=self.pool_maxsize, # Idle keep-alive connections kept per host
+            max_retries=self.max_retries,   # Auto-retry failed connects
+            pool_block=False                # Open extra connections rather than wait
+        )
+
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def get(self, url, user_agent=None, headers=None, cookies=None, **kwargs):
+        """
+        Send a GET through the host's shared session and record its timings.
+
+        Args:
+            cookies: The caller's own cookie jar, sent with the request and
+                updated with cookies set by the response and its redirects
+
+        Returns:
+            requests.Response: The response; with stream=True the first-byte time
+            covers connection setup and response headers only
+        """
+        key = self.host_key(url)
+        session = self.session_for(url)
+
+        request_headers = dict(headers or {})
+        if user_agent:
+            request_headers['User-Agent'] = user_agent
+
+        _timings.connect_time = None
+        start = time.perf_counter()
+        try:
+            response = session.get(url, headers=request_headers, cookies=cookies, **kwargs)
+        except Exception:
+            with self.lock:
+                if key in self.stats:
+                    self.stats[key].errors += 1
+            raise
+
+        first_byte_time = time.perf_counter() - start
+        connect_time = _timings.connect_time
+        with self.lock:
+            if key in self.stats:
+                self.stats[key].record(connect_time, first_byte_time)
+
+        if cookies is not None:
+            for hop in (*response.history, response):
+                cookies.update(hop.cookies)
+
+        # Let callers report timings for this particular response
+        response.upstream_connect_time = connect_time
+        response.upstream_first_byte_time = first_byte_time
+        return response
+
+    def host_stats(self):
+        """Get timings for every upstream host used by this process"""
+        with self.lock:
+            return {key: stats.to_dict() for key, stats in self.stats.items()}
+
+
+def get_upstream_pool():
+    """Get the process-wide upstream connection pool"""
+    return UpstreamPool.get_instance()
@@ -5,11 +5,12 @@ from asgiref.sync import async_to_sync
 import redis
 import json
 import logging
-import re
 import time
 import os
 from core.utils import RedisClient
 from apps.proxy.ts_proxy.channel_status import ChannelStatus
+from apps.proxy.ts_proxy.channel_registry import ChannelRegistry
+from apps.proxy.ts_proxy.config_helper import ConfigHelper
 from apps.m3u.models import M3UAccount
 from apps.epg.models import EPGSource
 from apps.m3u.tasks import refresh_single_m3u_account
@@ -25,9 +26,6 @@ STARTUP_SKIP_AGE = 30
 REDIS_PREFIX = "processed_file:"
 REDIS_TTL = 60 * 60 * 24 * 3  # expire keys after 3 days (optional)
 
-# Store the last known value to compare with new data
-last_known_data = {}
-
 @shared_task
 def beat_periodic_task():
     fetch_channel_stats()
@@ -144,24 +142,11 @@ def fetch_channel_stats():
     redis_client = RedisClient.get_client()
 
     try:
-        # Basic info for all channels
-        channel_pattern = "ts_proxy:channel:*:metadata"
-        all_channels = []
-
-        # Extract channel IDs from keys
-        cursor = 0
-        while True:
-            cursor, keys = redis_client.scan(cursor, match=channel_pattern)
-            for key in keys:
-                channel_id_match = re.search(r"ts_proxy:channel:(.*):metadata", key.decode('utf-8'))
-                if channel_id_match:
-                    ch_id = channel_id_match.group(1)
-                    channel_info = ChannelStatus.get_basic_channel_info(ch_id)
-                    if channel_info:
-                        all_channels.append(channel_info)
-
-            if cursor == 0:
-                break
+        # Basic info for all channels in the active channel registry
+        all_channels = ChannelStatus.get_basic_channel_info_bulk(ChannelRegistry.get_channel_ids(redis_client))
+
+        # Send only what changed since the last update, with periodic full snapshots
+        stats = ChannelStatus.build_stats_update(all_channels, redis_client, ConfigHelper.stats_full_snapshot_interval())
 
     except Exception as e:
         logger.error(f"Error in channel_status: {e}", exc_info=True)
@@ -173,6 +158,6 @@ def fetch_channel_stats():
         "updates",
         {
             "type": "update",
-            "data": {"success": True, "type": "channel_stats", "stats": json.dumps({'channels': all_channels, 'count': len(all_channels)})}
+            "data": {"success": True, "type": "channel_stats", "stats": json.dumps(stats)}
         },
     )
@@ -18,6 +18,7 @@ from .command_utils import is_management_command
 class RedisClient:
     _client = None
     _pubsub_client = None
+    _async_client = None
 
     @classmethod
     def get_client(cls, max_retries=5, retry_interval=1):
@@ -130,6 +131,43 @@ class RedisClient:
 
         return cls._pubsub_client
 
+    @classmethod
+    def get_async_client(cls):
+        """Get asyncio Redis client for ASGI code paths (bound to the running event loop)"""
+        if cls._async_client is None:
+            try:
+                import redis.asyncio as aioredis
+
+                redis_host = os.environ.get("REDIS_HOST", getattr(settings, 'REDIS_HOST', 'localhost'))
+                redis_port = int(os.environ.get("REDIS_PORT", getattr(settings, 'REDIS_PORT', 6379)))
+                redis_db = int(os.environ.get("REDIS_DB", getattr(settings, 'REDIS_DB', 0)))
+
+                # Use standardized settings
+                socket_timeout = getattr(settings, 'REDIS_SOCKET_TIMEOUT', 5)
+                socket_connect_timeout = getattr(settings, 'REDIS_SOCKET_CONNECT_TIMEOUT', 5)
+                health_check_interval = getattr(settings, 'REDIS_HEALTH_CHECK_INTERVAL', 30)
+                socket_keepalive = getattr(settings, 'REDIS_SOCKET_KEEPALIVE', True)
+                retry_on_timeout = getattr(settings, 'REDIS_RETRY_ON_TIMEOUT', True)
+
+                # Connections are opened lazily on first command, so no ping/flush here
+                cls._async_client = aioredis.Redis(
+                    host=redis_host,
+                    port=redis_port,
+                    db=redis_db,
+                    socket_timeout=socket_timeout,
+                    socket_connect_timeout=socket_connect_timeout,
+                    socket_keepalive=socket_keepalive,
+                    health_check_interval=health_check_interval,
+                    retry_on_timeout=retry_on_timeout
+                )
+                logger.info(f"Created async Redis client for {redis_host}:{redis_port}/{redis_db}")
+
+            except Exception as e:
+                logger.error(f"Unexpected error creating async Redis client: {e}")
+                return None
+
+        return cls._async_client
+
 def acquire_task_lock(task_name, id):
     """Acquire a lock to prevent concurrent task execution."""
     redis_client = RedisClient.get_client()
@@ -4,6 +4,49 @@ import { notifications } from '@mantine/notifications';
 
 const defaultProfiles = { 0: { id: '0', name: 'All', channels: [] } };
 
+// Apply a delta stats update to the last snapshot, which must be the update
+// named by delta.base_seq. Unchanged channels only have their clock-derived
+// fields advanced by the time between updates.
+const mergeChannelStats = (currentStats, delta) => {
+  const elapsed = Math.max(
+    0,
+    delta.timestamp - (currentStats.timestamp || delta.timestamp)
+  );
+  const removed = new Set(delta.removed);
+  const updated = delta.updated.reduce((acc, ch) => {
+    acc[ch.channel_id] = ch;
+    return acc;
+  }, {});
+
+  const channels = currentStats.channels
+    .filter((ch) => !removed.has(ch.channel_id))
+    .map((ch) => {
+      if (updated[ch.channel_id]) {
+        const channel = updated[ch.channel_id];
+        delete updated[ch.channel_id];
+        return channel;
+      }
+
+      return {
+        ...ch,
+        uptime: ch.uptime + elapsed,
+        clients: ch.clients.map((client) =>
+          client.connected_since === undefined
+            ? client
+            : { ...client, connected_since: client.connected_since + elapsed }
+        ),
+      };
+    })
+    .concat(Object.values(updated));
+
+  return {
+    channels,
+    count: delta.count,
+    seq: delta.seq,
+    timestamp: delta.timestamp,
+  };
+};
+
 const useChannelsStore = create((set, get) => ({
   channels: [],
   channelsByUUID: {},
@@ -309,7 +352,25 @@ const useChannelsStore = create((set, get) => ({
       selectedProfileChannels: id == '0' ? [] : state.profiles[id].channels,
     })),
 
+  fetchChannelStats: async () => {
+    const stats = await api.getChannelStats();
+    if (stats) {
+      get().setChannelStats(stats);
+    }
+  },
+
   setChannelStats: (stats) => {
+    // A delta only applies to the update it was built against - after a missed
+    // or out-of-order update (or with no snapshot yet) load a full one instead
+    const currentStats = get().stats;
+    if (
+      stats.delta &&
+      (!currentStats.channels || stats.base_seq !== currentStats.seq)
+    ) {
+      get().fetchChannelStats();
+      return;
+    }
+
     return set((state) => {
       const {
         channels,
@@ -319,6 +380,10 @@ const useChannelsStore = create((set, get) => ({
         channelsByUUID,
       } = state;
 
+      if (stats.delta) {
+        stats = mergeChannelStats(currentStats, stats);
+      }
+
       const newClients = {};
       const newChannels = stats.channels.reduce((acc, ch) => {
         acc[ch.channel_id] = ch;
@@ -0,0 +1,491 @@
+#!/usr/bin/env python
+"""
+Microbenchmarks for the TS proxy hot paths.
+
+Runs without Django or a Redis server - an in-process stand-in replaces Redis
+so the numbers reflect the proxy's own CPU and copy overhead.
+
+Usage:
+    python scripts/ts_proxy_benchmark.py ingest [--bitrate 50] [--seconds 30]
+    python scripts/ts_proxy_benchmark.py telemetry [--bitrate 8] [--seconds 60] [--flush-interval 1.0]
+    python scripts/ts_proxy_benchmark.py reads [--readers 1,10,100] [--calls 2000] [--redis-url redis://localhost:6379/15]
+    python scripts/ts_proxy_benchmark.py inspect [--megabytes 16] [--chunk-size 188000]
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+
+# Allow running from anywhere inside the repo
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from apps.proxy.ts_proxy.stream_buffer import StreamBuffer
+from apps.proxy.ts_proxy.redis_keys import RedisKeys
+from apps.proxy.ts_proxy.constants import TS_PACKET_SIZE, TS_SYNC_BYTE
+from apps.proxy.ts_proxy.ts_packets import (
+    RandomAccessTracker, find_sync, packet_pid, payload_unit_start, random_access_indicator, PAT_PID
+)
+from apps.proxy.ts_inspection import TSInspector, inspect_packets
+
+READ_SIZE = 8192  # Matches TSConfig.CHUNK_SIZE upstream reads
+
+
+class FakeRedis:
+    """Minimal in-memory Redis covering the commands StreamBuffer uses"""
+
+    def __init__(self, keep_values=False):
+        self.data = {}
+        self.keep_values = keep_values
+        self.commands = 0
+        self.round_trips = 0
+        self._pipelined = False
+
+    def _command(self):
+        self.commands += 1
+        if not self._pipelined:
+            self.round_trips += 1
+
+    @staticmethod
+    def _key(key):
+        # Redis treats str and bytes keys alike
+        return key.encode("utf-8") if isinstance(key, str) else key
+
+    def get(self, key):
+        self._command()
+        return self.data.get(self._key(key))
+
+    def mget(self, keys):
+        self._command()
+        return [self.data.get(self._key(key)) for key in keys]
+
+    def set(self, key, value, ex=None):
+        self._command()
+        self.data[self._key(key)] = value
+        return True
+
+    def incr(self, key):
+        self._command()
+        key = self._key(key)
+        value = int(self.data.get(key, 0)) + 1
+        self.data[key] = value
+        return value
+
+    def setex(self, key, ttl, value):
+        # Real Redis copies the value into another process, so only keep the size
+        # unless a benchmark needs to read it back
+        self._command()
+        self.data[self._key(key)] = value if self.keep_values else len(value)
+        return True
+
+    def hset(self, key, field=None, value=None, mapping=None):
+        self._command()
+        return 1
+
+    def hincrby(self, key, field, amount=1):
+        self._command()
+        return amount
+
+    def expire(self, key, ttl):
+        self._command()
+        return True
+
+    def publish(self, channel, message):
+        self._command()
+        return 0
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.queued = []
+
+    def __getattr__(self, name):
+        method = getattr(self.client, name)
+
+        def queue(*args, **kwargs):
+            self.queued.append((method, args, kwargs))
+            return self
+        return queue
+
+    def execute(self):
+        self.client.round_trips += 1
+        self.client._pipelined = True
+        try:
+            results = [method(*args, **kwargs) for method, args, kwargs in self.queued]
+        finally:
+            self.client._pipelined = False
+        self.queued = []
+        return results
+
+
+class FakeClock:
+    """Simulated wall clock so interval-based flushes happen at stream time, not CPU time"""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+class LegacyAccumulator:
+    """Copy of the previous concat/slice add_chunk logic, instrumented for copies"""
+
+    def __init__(self, target_chunk_size):
+        self.target_chunk_size = target_chunk_size
+        self._partial_packet = bytearray()
+        self._write_buffer = bytearray()
+        self.bytes_copied = 0
+        self.chunks = 0
+
+    def add_chunk(self, chunk):
+        combined_data = bytearray(self._partial_packet) + bytearray(chunk)
+        self.bytes_copied += 2 * len(self._partial_packet) + len(chunk) + len(combined_data)
+
+        complete_packets_size = (len(combined_data) // TS_PACKET_SIZE) * TS_PACKET_SIZE
+        if complete_packets_size == 0:
+            self._partial_packet = combined_data
+            return
+
+        complete_packets = combined_data[:complete_packets_size]
+        self._partial_packet = combined_data[complete_packets_size:]
+        self._write_buffer.extend(complete_packets)
+        self.bytes_copied += len(combined_data) + complete_packets_size
+
+        while len(self._write_buffer) >= self.target_chunk_size:
+            chunk_data = self._write_buffer[:self.target_chunk_size]
+            self._write_buffer = self._write_buffer[self.target_chunk_size:]
+            chunk_bytes = bytes(chunk_data)
+            self.bytes_copied += 2 * self.target_chunk_size + len(self._write_buffer)
+            self.chunks += 1
+
+
+class LegacyTelemetry:
+    """Previous StreamManager Redis writes: SET last_data per read, byte totals every 5s"""
+
+    def __init__(self, redis_client, clock):
+        self.redis_client = redis_client
+        self.clock = clock
+        self.bytes_processed = 0
+        self.last_bytes_update = clock.time()
+
+    def on_read(self, byte_count):
+        self.bytes_processed += byte_count
+        now = self.clock.time()
+        if now - self.last_bytes_update >= 5:
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.hincrby("metadata", "total_bytes", self.bytes_processed)
+            pipe.hset("metadata", mapping={"buffer_chunk_size": "0", "ingest_bitrate": "0"})
+            pipe.execute()
+            self.bytes_processed = 0
+            self.last_bytes_update = now
+
+    def on_buffered(self):
+        self.redis_client.set("last_data", str(self.clock.time()), ex=60)
+
+
+def legacy_verify(data):
+    """Previous HLS verify_segment packet walk: slice every packet, check sync and TEI"""
+    valid_packets = 0
+    for i in range(0, len(data), TS_PACKET_SIZE):
+        packet = data[i:i + TS_PACKET_SIZE]
+        if len(packet) != TS_PACKET_SIZE or packet[0] != TS_SYNC_BYTE or packet[1] & 0x80:
+            return None
+        valid_packets += 1
+    return valid_packets
+
+
+class LegacyRandomAccessTracker(RandomAccessTracker):
+    """Previous scan: visit every packet to find payload unit starts"""
+
+    def scan(self, chunk):
+        start = find_sync(chunk)
+        if start < 0:
+            return -1
+
+        found = -1
+        for offset in range(start, len(chunk) - TS_PACKET_SIZE + 1, TS_PACKET_SIZE):
+            if chunk[offset] != TS_SYNC_BYTE or not payload_unit_start(chunk, offset):
+                continue
+            pid = packet_pid(chunk, offset)
+            if pid == PAT_PID:
+                self._update_pat(chunk, offset)
+            elif pid in self.pmt_pids:
+                self.pmts[pid] = bytes(chunk[offset:offset + TS_PACKET_SIZE])
+            elif random_access_indicator(chunk, offset) and (not self.video_pids or pid in self.video_pids):
+                found = offset
+        return found
+
+
+class LegacyReader:
+    """Previous get_chunks_exact: GET the index, then a pipelined GET per formatted chunk key"""
+
+    def __init__(self, buffer):
+        self.buffer = buffer
+
+    def get_chunks_exact(self, start_index, count):
+        buffer = self.buffer
+        current_index = int(buffer.redis_client.get(buffer.buffer_index_key) or 0)
+        read_range = buffer._exact_read_range(start_index, count, current_index)
+        if not read_range:
+            return []
+
+        pipe = buffer.redis_client.pipeline()
+        for idx in range(*read_range):
+            pipe.get(RedisKeys.buffer_chunk(buffer.channel_id, idx))
+        return [result for result in pipe.execute() if result is not None]
+
+
+def synthetic_ts(total_bytes):
+    """Build a reusable block of TS packets with a rolling continuity counter"""
+    packets = []
+    for i in range(total_bytes // TS_PACKET_SIZE):
+        header = bytes([TS_SYNC_BYTE, 0x01, 0x00, 0x10 | (i & 0x0F)])
+        packets.append(header + bytes(TS_PACKET_SIZE - 4))
+    return b''.join(packets)
+
+
+def synthetic_program_ts(total_bytes):
+    """
+    Build a single-program stream: video with a PCR every 40 packets and a keyframe
+    every 400, audio on every fifth packet and null stuffing on every tenth
+    """
+    packets = []
+    counters = {}
+    for i in range(total_bytes // TS_PACKET_SIZE):
+        pid = 0x1FFF if i % 10 == 9 else 0x101 if i % 5 == 4 else 0x100
+        cc = counters.get(pid, 0)
+        counters[pid] = (cc + 1) & 0x0F
+        # A video PES every 100 packets, an audio PES every 50
+        unit_start = 0x40 if i % 100 == 0 or i % 50 == 4 else 0x00
+        header = bytes([TS_SYNC_BYTE, unit_start | (pid >> 8), pid & 0xFF])
+
+        if pid == 0x100 and i % 40 == 0:
+            # Adaptation field with PCR (and random access on keyframes)
+            base = i * 27_000 // 300
+            flags = 0x10 | (0x40 if i % 400 == 0 else 0)
+            adaptation = bytes([7, flags]) + ((base << 15) | 0x7E00).to_bytes(6, 'big')
+            packet = header + bytes([0x30 | cc]) + adaptation
+        else:
+            packet = header + bytes([0x10 | cc])
+        packets.append(packet + bytes(TS_PACKET_SIZE - len(packet)))
+    return b''.join(packets)
+
+
+def upstream_reads(bitrate_mbps, seconds):
+    """Yield READ_SIZE reads totalling bitrate * seconds, deliberately not packet aligned"""
+    total = int(bitrate_mbps * 1_000_000 / 8 * seconds)
+    block = synthetic_ts(READ_SIZE * TS_PACKET_SIZE)
+    view = memoryview(block)
+    offset = 0
+    sent = 0
+    while sent < total:
+        if offset + READ_SIZE > len(block):
+            offset = 0
+        yield view[offset:offset + READ_SIZE].tobytes()
+        offset += READ_SIZE
+        sent += READ_SIZE
+
+
+def bench_ingest(args):
+    """Feed synthetic TS through add_chunk and report copy overhead"""
+    reads = list(upstream_reads(args.bitrate, args.seconds))
+    ingested = sum(len(r) for r in reads)
+
+    buffer = StreamBuffer(channel_id="bench", redis_client=FakeRedis())
+    start = time.perf_counter()
+    for read in reads:
+        buffer.add_chunk(read)
+    elapsed = time.perf_counter() - start
+    stats = buffer.get_write_stats()
+
+    legacy = LegacyAccumulator(buffer.target_chunk_size)
+    legacy_start = time.perf_counter()
+    for read in reads:
+        legacy.add_chunk(read)
+    legacy_elapsed = time.perf_counter() - legacy_start
+
+    print(f"Ingested {ingested / 1_000_000:.1f} MB ({args.seconds}s at {args.bitrate} Mbps) "
+          f"in {len(reads)} reads of {READ_SIZE} bytes, chunk size {buffer.target_chunk_size}")
+    print(f"  current: {stats['copies_per_byte']:.3f} bytes copied per byte ingested, "
+          f"{elapsed * 1000:.1f} ms ({ingested / elapsed / 1_000_000:.0f} MB/s), {buffer.index} chunks")
+    print(f"  legacy:  {legacy.bytes_copied / ingested:.3f} bytes copied per byte ingested, "
+          f"{legacy_elapsed * 1000:.1f} ms ({ingested / legacy_elapsed / 1_000_000:.0f} MB/s), {legacy.chunks} chunks")
+
+
+def bench_telemetry(args):
+    """Count Redis commands and round trips per channel for the ingest path"""
+    from apps.proxy.ts_proxy import telemetry as telemetry_module
+    from apps.proxy.ts_proxy.telemetry import ChannelTelemetryWriter
+
+    reads = list(upstream_reads(args.bitrate, args.seconds))
+    read_interval = args.seconds / len(reads)
+
+    def run(make_telemetry):
+        redis_client = FakeRedis()
+        clock = FakeClock()
+        buffer = StreamBuffer(channel_id="bench", redis_client=redis_client)
+        telemetry = make_telemetry(redis_client, clock)
+        for read in reads:
+            clock.now += read_interval
+            telemetry.on_read(len(read))
+            if buffer.add_chunk(read):
+                telemetry.on_buffered()
+        return redis_client
+
+    def coalesced(redis_client, clock):
+        telemetry_module.time = clock
+        writer = ChannelTelemetryWriter("bench", redis_client, flush_interval=args.flush_interval)
+        writer.on_read = writer.count_bytes
+        writer.on_buffered = writer.mark_data
+        return writer
+
+    results = [("legacy", run(LegacyTelemetry))]
+    try:
+        results.append(("current", run(coalesced)))
+    finally:
+        telemetry_module.time = time
+
+    print(f"{len(reads)} reads of {READ_SIZE} bytes over {args.seconds}s at {args.bitrate} Mbps "
+          f"(telemetry flush every {args.flush_interval}s)")
+    for name, redis_client in results:
+        print(f"  {name:8} {redis_client.commands / args.seconds:8.1f} commands/s, "
+              f"{redis_client.round_trips / args.seconds:8.1f} round trips/s per channel")
+
+
+def bench_reads(args):
+    """Per-call overhead of the non-owner read path with concurrent readers"""
+    if args.redis_url:
+        import redis
+        redis_client = redis.Redis.from_url(args.redis_url)
+    else:
+        redis_client = FakeRedis(keep_values=True)
+
+    # Seed the buffer the way the owning worker would
+    channel_id = "bench_reads"
+    chunk = synthetic_ts(args.chunk_size)
+    pipe = redis_client.pipeline()
+    for idx in range(1, args.chunks + 1):
+        pipe.setex(RedisKeys.buffer_chunk(channel_id, idx), 300, chunk)
+    pipe.set(RedisKeys.buffer_index(channel_id), args.chunks)
+    pipe.execute()
+
+    def run(readers, make_reader):
+        # One StreamBuffer per worker process, shared by all of its clients
+        buffer = StreamBuffer(channel_id=channel_id, redis_client=redis_client)
+        buffer.notify_index(args.chunks)
+        reader = make_reader(buffer)
+        calls_per_reader = max(1, args.calls // readers)
+        round_trips_before = getattr(redis_client, "round_trips", 0)
+
+        def client(seed):
+            rng = random.Random(seed)
+            for _ in range(calls_per_reader):
+                reader.get_chunks_exact(rng.randrange(args.chunks - args.count), args.count)
+
+        threads = [threading.Thread(target=client, args=(i,)) for i in range(readers)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        calls = calls_per_reader * readers
+        round_trips = getattr(redis_client, "round_trips", 0) - round_trips_before
+        return elapsed / calls * 1_000_000, round_trips / calls
+
+    target = args.redis_url or "in-process fake Redis"
+    print(f"{args.count} chunks of {args.chunk_size} bytes per call, ~{args.calls} calls per run, against {target}")
+    for readers in args.readers:
+        for name, make_reader in (("legacy", LegacyReader), ("current", lambda buffer: buffer)):
+            per_call, round_trips = run(readers, make_reader)
+            trips = f", {round_trips:.2f} round trips/call" if not args.redis_url else ""
+            print(f"  {readers:3} readers {name:8} {per_call:8.1f} us/call{trips}")
+
+    if args.redis_url:
+        redis_client.delete(RedisKeys.buffer_index(channel_id),
+                            *(RedisKeys.buffer_chunk(channel_id, idx) for idx in range(1, args.chunks + 1)))
+
+
+def bench_inspect(args):
+    """Per-MB cost of TS packet inspection for HLS segment verification and the ingest path"""
+    data = synthetic_program_ts(int(args.megabytes * 1_000_000))
+    megabytes = len(data) / 1_000_000
+    chunk_size = args.chunk_size // TS_PACKET_SIZE * TS_PACKET_SIZE
+    chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)]
+
+    def run(name, func, repeat=5):
+        elapsed = min(timed(func) for _ in range(repeat))
+        print(f"  {name:36} {elapsed / megabytes * 1000:7.3f} ms/MB ({megabytes / elapsed:7.1f} MB/s)")
+
+    def timed(func):
+        start = time.perf_counter()
+        func()
+        return time.perf_counter() - start
+
+    def inspect_chunks():
+        inspector = TSInspector()
+        for chunk in chunks:
+            inspector.inspect(chunk)
+        return inspector
+
+    def scan_chunks(tracker):
+        for chunk in chunks:
+            tracker.scan(chunk)
+
+    print(f"{megabytes:.1f} MB of synthetic TS, {len(chunks)} chunks of {chunk_size} bytes")
+    print("Segment verification")
+    run("legacy packet walk (sync, TEI)", lambda: legacy_verify(data))
+    run("inspect_packets (sync, TEI, CC, PCR)", lambda: inspect_packets(data))
+    print("Ingest path")
+    run("TSInspector.inspect per chunk", inspect_chunks)
+    run("legacy RandomAccessTracker.scan", lambda: scan_chunks(LegacyRandomAccessTracker()))
+    run("RandomAccessTracker.scan", lambda: scan_chunks(RandomAccessTracker()))
+
+    stats = inspect_chunks().totals.to_dict()
+    print(f"Counters: {stats['packets']} packets, {stats['cc_errors']} CC errors, "
+          f"null ratio {stats['null_ratio']}, {stats['pcr_count']} PCRs, max PCR interval {stats['pcr_interval_max']}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TS proxy microbenchmarks")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    ingest = subparsers.add_parser("ingest", help="StreamBuffer.add_chunk copy overhead")
+    ingest.add_argument("--bitrate", type=float, default=50, help="Synthetic stream bitrate in Mbps")
+    ingest.add_argument("--seconds", type=float, default=30, help="Seconds of stream to feed")
+    ingest.set_defaults(func=bench_ingest)
+
+    telemetry = subparsers.add_parser("telemetry", help="Redis commands per channel on the ingest path")
+    telemetry.add_argument("--bitrate", type=float, default=8, help="Synthetic stream bitrate in Mbps")
+    telemetry.add_argument("--seconds", type=float, default=60, help="Seconds of stream to feed")
+    telemetry.add_argument("--flush-interval", type=float, default=1.0, help="Telemetry flush interval in seconds")
+    telemetry.set_defaults(func=bench_telemetry)
+
+    reads = subparsers.add_parser("reads", help="StreamBuffer.get_chunks_exact per-call overhead")
+    reads.add_argument("--readers", type=lambda value: [int(n) for n in value.split(",")], default=[1, 10, 100],
+                       help="Comma separated concurrent reader counts")
+    reads.add_argument("--calls", type=int, default=2000, help="Total reads per run, split across readers")
+    reads.add_argument("--count", type=int, default=3, help="Chunks per read")
+    reads.add_argument("--chunks", type=int, default=64, help="Chunks in the seeded buffer")
+    reads.add_argument("--chunk-size", type=int, default=TS_PACKET_SIZE * 348, help="Bytes per chunk")
+    reads.add_argument("--redis-url", help="Benchmark against a real Redis instead of the in-process stand-in")
+    reads.set_defaults(func=bench_reads)
+
+    inspect = subparsers.add_parser("inspect", help="TS packet inspection cost per MB")
+    inspect.add_argument("--megabytes", type=float, default=16, help="Megabytes of synthetic TS to inspect")
+    inspect.add_argument("--chunk-size", type=int, default=TS_PACKET_SIZE * 1000, help="Bytes per ingest chunk")
+    inspect.set_defaults(func=bench_inspect)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()